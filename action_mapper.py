@@ -1,3 +1,36 @@
+# Namespace values that mean "every namespace in the cluster"
+ALL_NAMESPACES_ALIASES = {'all', '*', 'cluster', 'all namespaces', 'all-namespaces'}
+
+# Parsed fields answered by the query engine (see query_engine.py), per
+# resource type: the metric computed over the matching objects and the
+# column it reads. Other fields list the matching names.
+QUERY_FIELDS = {
+    'pods': {'count': ('count', None), 'status': ('count', None), 'restart_count': ('sum', 'restarts'),
+             'container_count': ('sum', 'containers')},
+    'deployments': {'count': ('count', None), 'status': ('count', None), 'replicas': ('sum', 'available_replicas')},
+    'nodes': {'count': ('count', None), 'status': ('count', None)}
+}
+
+# Column a status question groups the matching objects by, per resource type
+STATUS_COLUMNS = {'pods': 'phase', 'deployments': 'available', 'nodes': 'ready'}
+
+
+def map_query(resource, field, filters, group_by, limit):
+    """
+    Maps a filtered, grouped or top-k list question to a query engine query:
+    {'metric', 'column', 'group_by', 'where', 'limit'}. A limit without a
+    grouping ranks the objects themselves by the field's column.
+    """
+    metric, column = QUERY_FIELDS[resource].get(field, ('list', None))
+    if field == 'status' and not group_by:
+        group_by = STATUS_COLUMNS[resource]
+    if limit and not group_by and column:
+        metric = 'list'
+    elif group_by and metric == 'list':
+        metric = 'count'
+    return {'metric': metric, 'column': column, 'group_by': group_by,
+            'where': (filters or {}).get('where'), 'limit': limit}
+
 def map_action(parsed_query: dict) -> dict:
     """
     Maps the parsed query to an executable action.
@@ -9,6 +42,13 @@ def map_action(parsed_query: dict) -> dict:
     namespace = parsed_query.get('namespace')
     field = parsed_query.get('field')
     related_to = parsed_query.get('related_to', {'resource': None, 'name': None})
+    log_options = parsed_query.get('log_options')
+    filters = parsed_query.get('filters')
+    group_by = parsed_query.get('group_by')
+    limit = parsed_query.get('limit')
+
+    if isinstance(namespace, str) and namespace.lower() in ALL_NAMESPACES_ALIASES:
+        namespace = '*'
 
     # Adjust action type based on the field or action
     if field == 'logs':
@@ -33,5 +73,15 @@ def map_action(parsed_query: dict) -> dict:
         'field': field,
         'related_to': related_to
     }
+    if log_options:
+        mapped_action['log_options'] = log_options
+    if filters:
+        mapped_action['filters'] = filters
+    if group_by:
+        mapped_action['group_by'] = group_by
+    # Column filters, top-k and grouped totals run on the query engine
+    if (action_type == 'list' and resource in QUERY_FIELDS and
+            ((filters or {}).get('where') or limit or group_by)):
+        mapped_action['query'] = map_query(resource, field, filters, group_by, limit)
 
     return mapped_action
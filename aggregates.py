@@ -0,0 +1,230 @@
+import logging
+import threading
+import time
+from collections import Counter
+
+# Namespace key under which cluster-wide totals are kept
+ALL_NAMESPACES = '*'
+
+# Seconds to wait before retrying after a failed periodic refresh
+RETRY_BACKOFF_SECONDS = 5
+
+# Registry of aggregate indexes, keyed by pluralized resource name
+_indexes = {}
+
+
+def condition_true(conditions, condition_type):
+    return any(c.type == condition_type and c.status == 'True' for c in conditions or [])
+
+
+def pod_contribution(pod):
+    status = pod.status
+    values = {'count': 1, f"phase:{(status.phase if status else None) or 'Unknown'}": 1}
+    if status and status.container_statuses:
+        values['restarts'] = sum(cs.restart_count or 0 for cs in status.container_statuses)
+    return values
+
+
+def deployment_contribution(deployment):
+    status = deployment.status
+    return {
+        'count': 1,
+        'available': 1 if status and condition_true(status.conditions, 'Available') else 0,
+        'desired_replicas': (deployment.spec.replicas or 0) if deployment.spec else 0,
+        'available_replicas': (status.available_replicas or 0) if status else 0
+    }
+
+
+def node_contribution(node):
+    return {'count': 1, 'ready': 1 if node.status and condition_true(node.status.conditions, 'Ready') else 0}
+
+
+def default_contribution(obj):
+    return {'count': 1}
+
+
+# What each object adds to the totals of its namespace, per resource type
+CONTRIBUTIONS = {
+    'pods': pod_contribution,
+    'deployments': deployment_contribution,
+    'nodes': node_contribution
+}
+
+
+class AggregateIndex:
+    """
+    Materialized totals for one resource type, per namespace and cluster-wide.
+    Each object contributes a few counters (count, phases, restarts, ready or
+    available flags); updates subtract the old contribution and add the new
+    one, so reads and updates are O(1) regardless of the number of objects.
+    """
+
+    def __init__(self, resource, contribution=None):
+        self.resource = resource
+        self.contribution = contribution or CONTRIBUTIONS.get(resource, default_contribution)
+        self._lock = threading.Lock()
+        self._totals = {}
+        self.resource_version = None
+        self.synced = False
+        self.last_update = None
+        # Set when the index follows an informer store, which knows best how current it is
+        self.staleness_source = None
+
+    def _apply(self, obj, sign):
+        namespace = obj.metadata.namespace
+        for name, value in self.contribution(obj).items():
+            for key in {namespace, ALL_NAMESPACES}:
+                self._totals.setdefault(key, Counter())[name] += sign * value
+
+    def replace(self, items, resource_version=None):
+        """
+        Rebuilds the totals from a full list of objects.
+        """
+        with self._lock:
+            self._totals = {ALL_NAMESPACES: Counter()}
+            for obj in items:
+                self._apply(obj, 1)
+            self.resource_version = resource_version
+            self.synced = True
+            self.last_update = time.monotonic()
+
+    def update(self, old, new):
+        """
+        Applies one change: old is None for an added object, new is None for a deleted one.
+        """
+        with self._lock:
+            if old is not None:
+                self._apply(old, -1)
+            if new is not None:
+                self._apply(new, 1)
+                self.resource_version = new.metadata.resource_version
+            self.last_update = time.monotonic()
+
+    def value(self, name, namespace=ALL_NAMESPACES):
+        """
+        Returns one total, e.g. value('count', 'default') or value('phase:Running').
+        """
+        with self._lock:
+            return self._totals.get(namespace or ALL_NAMESPACES, Counter())[name]
+
+    def totals(self, namespace=ALL_NAMESPACES):
+        """
+        Returns a copy of all totals of a namespace, or of the cluster.
+        """
+        with self._lock:
+            return dict(self._totals.get(namespace or ALL_NAMESPACES, Counter()))
+
+    def groups(self, prefix, namespace=ALL_NAMESPACES):
+        """
+        Returns the non-zero totals named '<prefix>:<key>' as {key: total},
+        e.g. groups('phase') gives {'Running': 90, 'Pending': 10}.
+        """
+        start = prefix + ':'
+        return {name[len(start):]: value for name, value in self.totals(namespace).items()
+                if name.startswith(start) and value > 0}
+
+    def counts_by_namespace(self):
+        """
+        Returns the number of objects in each namespace that has any.
+        """
+        with self._lock:
+            return {namespace: totals['count'] for namespace, totals in self._totals.items()
+                    if namespace != ALL_NAMESPACES and totals['count'] > 0}
+
+    def staleness(self):
+        """
+        Returns the number of seconds since the totals were last known to be current.
+        """
+        if self.staleness_source is not None:
+            return self.staleness_source()
+        if self.last_update is None:
+            return None
+        return time.monotonic() - self.last_update
+
+
+class StoreListener:
+    """
+    Forwards informer store changes to an aggregate index.
+    """
+
+    def __init__(self, index):
+        self.index = index
+
+    def on_replace(self, items, resource_version):
+        self.index.replace(items, resource_version)
+
+    def on_update(self, old, new):
+        self.index.update(old, new)
+
+
+def summarize(resource, items):
+    """
+    Computes the totals of a list of objects without keeping an index, for
+    resources that have neither an informer nor a periodic refresh.
+    """
+    index = AggregateIndex(resource)
+    index.replace(items)
+    return index
+
+
+def attach(resource, store):
+    """
+    Creates and registers an index that is kept up to date from an informer store's events.
+    """
+    index = AggregateIndex(resource)
+    index.staleness_source = store.staleness
+    store.add_listener(StoreListener(index))
+    _indexes[resource] = index
+    return index
+
+
+def start_refresh(resource, list_func, interval):
+    """
+    Creates and registers an index rebuilt from a full list every `interval`
+    seconds, for resources that do not run an informer.
+    """
+    index = AggregateIndex(resource)
+    _indexes[resource] = index
+
+    def run():
+        while True:
+            try:
+                result = list_func()
+                index.replace(result.items, result.metadata.resource_version)
+                time.sleep(interval)
+            except Exception as e:
+                logging.error("Aggregate refresh for %s failed: %s", resource, e)
+                time.sleep(RETRY_BACKOFF_SECONDS)
+
+    threading.Thread(target=run, name=f"aggregates-{resource}", daemon=True).start()
+    return index
+
+
+def get_index(resource, max_staleness=None):
+    """
+    Returns the synced index for a resource, or None if there is none or it
+    is older than `max_staleness` seconds.
+    """
+    index = _indexes.get(resource)
+    if index is None or not index.synced:
+        return None
+    staleness = index.staleness()
+    if staleness is None or (max_staleness is not None and staleness > max_staleness):
+        return None
+    return index
+
+
+def aggregates_status():
+    """
+    Reports freshness and cluster-wide totals of every registered index.
+    """
+    status = {}
+    for resource, index in _indexes.items():
+        staleness = index.staleness()
+        status[resource] = {
+            'synced': index.synced,
+            'resource_version': index.resource_version,
+            'staleness_seconds': round(staleness, 3) if staleness is not None else None,
+            'totals': index.totals()
+        }
+    return status
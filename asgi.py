@@ -0,0 +1,205 @@
+import logging
+import uvicorn
+from pydantic import ValidationError
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from nlp_parser import parse_cache
+from schemas import QueryRequest, QueryResponse, BatchQueryRequest, BatchQueryResponse, SubscriptionRequest
+from k8s_executor import result_cache, start_configured_informers
+from pipeline import (answer_query_async, answer_batch_async, stream_query_async, format_chunks,
+                      subscribe_query_async, format_subscription_async, BATCH_MAX_QUERIES)
+import aggregates
+import event_buffer
+import informer
+import k8s_client
+import metrics
+import startup
+from log_setup import configure_logging
+
+# Configure logging
+configure_logging()
+metrics.configure_multiprocess()
+
+async def create_query(request):
+    """
+    Async counterpart of main.create_query. The GPT-4 call is awaited on the
+    async OpenAI client and Kubernetes calls run on a bounded thread pool, so
+    one process can hold many queries in flight.
+    """
+    try:
+        try:
+            request_data = await request.json()
+        except ValueError:
+            request_data = None
+        if not isinstance(request_data, dict) or 'query' not in request_data:
+            logging.error("Invalid request: 'query' field is missing.")
+            return JSONResponse({"error": "Invalid request, 'query' field is required."}, status_code=400)
+        query_request = QueryRequest(**request_data)
+        query = query_request.query
+        logging.info("Received query: %s", query)
+        log_options = query_request.log_options.model_dump(exclude_none=True) if query_request.log_options else None
+
+        # Stream the answer chunk by chunk when requested.
+        # Starlette consumes the synchronous iterator on a worker thread.
+        if query_request.stream:
+            event_stream = 'text/event-stream' in request.headers.get('accept', '')
+            chunks = format_chunks(await stream_query_async(query, log_options), event_stream)
+            return StreamingResponse(chunks, media_type='text/event-stream' if event_stream else 'text/plain')
+
+        # Parse, map and execute the query
+        cache_control = query_request.cache_control or request.headers.get('cache-control')
+        answer = await answer_query_async(query, log_options, cache_control)
+        startup.mark('first_request')
+
+        # Create and return the response model
+        response = QueryResponse(query=query, answer=answer)
+        return JSONResponse(response.model_dump())
+
+    except ValidationError as e:
+        logging.error("Validation error: %s", e)
+        return JSONResponse({"error": e.errors(include_url=False)}, status_code=400)
+    except Exception as e:
+        logging.error("Unexpected error: %s", e)
+        return JSONResponse({"error": "Internal server error."}, status_code=500)
+
+async def create_batch_query(request):
+    """
+    Answers a list of queries in one request, sharing parses and list calls.
+    """
+    try:
+        try:
+            request_data = await request.json()
+        except ValueError:
+            request_data = None
+        if not isinstance(request_data, dict) or 'queries' not in request_data:
+            logging.error("Invalid batch request: 'queries' field is missing.")
+            return JSONResponse({"error": "Invalid request, 'queries' field is required."}, status_code=400)
+        batch_request = BatchQueryRequest(**request_data)
+        queries = batch_request.queries
+        cache_control = batch_request.cache_control or request.headers.get('cache-control')
+        if len(queries) > BATCH_MAX_QUERIES:
+            return JSONResponse({"error": f"At most {BATCH_MAX_QUERIES} queries are allowed per batch."},
+                                status_code=400)
+        logging.info("Received batch of %d queries", len(queries))
+
+        response = BatchQueryResponse(results=await answer_batch_async(queries, cache_control))
+        startup.mark('first_request')
+        return JSONResponse(response.model_dump())
+
+    except ValidationError as e:
+        logging.error("Validation error: %s", e)
+        return JSONResponse({"error": e.errors(include_url=False)}, status_code=400)
+    except Exception as e:
+        logging.error("Unexpected error: %s", e)
+        return JSONResponse({"error": "Internal server error."}, status_code=500)
+
+async def create_subscription(request):
+    """
+    Async counterpart of main.create_subscription. Events reach the stream
+    through the event loop, so an open subscription holds no thread.
+    """
+    try:
+        try:
+            request_data = await request.json()
+        except ValueError:
+            request_data = None
+        if not isinstance(request_data, dict) or 'query' not in request_data:
+            logging.error("Invalid subscription request: 'query' field is missing.")
+            return JSONResponse({"error": "Invalid request, 'query' field is required."}, status_code=400)
+        subscription_request = SubscriptionRequest(**request_data)
+        logging.info("Received subscription: %s", subscription_request.query)
+        subscription = await subscribe_query_async(subscription_request.query)
+        return StreamingResponse(format_subscription_async(subscription), media_type='text/event-stream',
+                                 headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    except ValidationError as e:
+        logging.error("Validation error: %s", e)
+        return JSONResponse({"error": e.errors(include_url=False)}, status_code=400)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except (RuntimeError, TimeoutError) as e:
+        logging.warning("Subscription refused: %s", e)
+        return JSONResponse({"error": str(e)}, status_code=503)
+    except Exception as e:
+        logging.error("Unexpected error: %s", e)
+        return JSONResponse({"error": "Internal server error."}, status_code=500)
+
+async def healthz(request):
+    """
+    Liveness probe: the process is up and serving requests.
+    """
+    return JSONResponse({'status': 'ok'})
+
+async def readyz(request):
+    """
+    Readiness probe: fails until the clients are warmed up and the configured
+    informers have completed their first list, so a worker only receives
+    traffic once it can answer from its caches. Later watch errors do not
+    fail it: reads fall back to the API server while an informer recovers.
+    """
+    if not (startup.is_warm() and informer.informers_synced()):
+        return JSONResponse({'status': 'not ready', 'startup': startup.startup_status(),
+                             'informers': informer.informer_status()}, status_code=503)
+    return JSONResponse({'status': 'ready', 'startup': startup.startup_status()})
+
+async def informers_status(request):
+    """
+    Reports sync state and staleness of the informer stores.
+    """
+    return JSONResponse(informer.informer_status())
+
+async def aggregates_status(request):
+    """
+    Reports freshness and cluster-wide totals of the aggregate indexes.
+    """
+    return JSONResponse(aggregates.aggregates_status())
+
+async def event_buffer_status(request):
+    """
+    Reports size, limits, evictions and freshness of the event buffer.
+    """
+    status = event_buffer.buffer_status()
+    if status is None:
+        return JSONResponse({"error": "The event buffer is not enabled."}, status_code=404)
+    return JSONResponse(status)
+
+async def cache_stats(request):
+    """
+    Reports hit/miss counters of the query caches.
+    """
+    return JSONResponse({'parse': parse_cache.stats(), 'results': result_cache.stats()})
+
+async def k8s_pool_stats(request):
+    """
+    Reports utilization of the Kubernetes API connection pool.
+    """
+    return JSONResponse(k8s_client.pool_stats(k8s_client.get_api_client()))
+
+async def metrics_endpoint(request):
+    """
+    Exports latency histograms and counters in the Prometheus text format.
+    """
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+app = Starlette(
+    routes=[
+        Route('/query', create_query, methods=['POST']),
+        Route('/query/batch', create_batch_query, methods=['POST']),
+        Route('/query/subscribe', create_subscription, methods=['POST']),
+        Route('/healthz', healthz, methods=['GET']),
+        Route('/readyz', readyz, methods=['GET']),
+        Route('/informers', informers_status, methods=['GET']),
+        Route('/aggregates', aggregates_status, methods=['GET']),
+        Route('/events/buffer', event_buffer_status, methods=['GET']),
+        Route('/cache/stats', cache_stats, methods=['GET']),
+        Route('/k8s/pool', k8s_pool_stats, methods=['GET']),
+        Route('/metrics', metrics_endpoint, methods=['GET']),
+    ],
+    on_startup=[start_configured_informers, startup.start_warm_up]
+)
+
+startup.mark('app_imported')
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=8000)
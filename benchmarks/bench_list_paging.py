@@ -0,0 +1,96 @@
+"""
+Compares a full list_namespaced_pod call with paged, metadata-only listing
+for count and name queries over a synthetic namespace.
+
+Usage: python benchmarks/bench_list_paging.py [--pods 50000] [--page-size 500]
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from kubernetes import client  # noqa: E402
+import paging  # noqa: E402
+
+
+def wait_for_server(url, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url + '/api/v1/namespaces/bench/pods?limit=1')
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("fake API server did not start")
+
+
+def _peak_rss_kib():
+    """
+    Returns the peak resident set size of this process in KiB (Linux VmHWM).
+    """
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+    return 0
+
+
+def _run_measurement(fn, conn):
+    baseline = _peak_rss_kib()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    conn.send((elapsed, _peak_rss_kib() - baseline, result))
+    conn.close()
+
+
+def measure(label, fn):
+    """
+    Runs fn in a forked child so that each measurement starts from the same
+    memory baseline, and prints its latency and peak RSS growth.
+    """
+    parent_conn, child_conn = multiprocessing.Pipe()
+    process = multiprocessing.get_context('fork').Process(target=_run_measurement, args=(fn, child_conn))
+    process.start()
+    elapsed, peak_kib, result = parent_conn.recv()
+    process.join()
+    print(f"{label:<30} {elapsed * 1000:>10.1f} ms  {peak_kib / 1024:>8.1f} MiB peak  result={result}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pods', type=int, default=50000)
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--port', type=int, default=18080)
+    args = parser.parse_args()
+
+    server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(__file__), 'fake_apiserver.py'),
+                               '--pods', str(args.pods), '--namespace', 'bench', '--port', str(args.port)])
+    try:
+        host = f"http://127.0.0.1:{args.port}"
+        wait_for_server(host)
+        configuration = client.Configuration()
+        configuration.host = host
+        api_client = client.ApiClient(configuration)
+        v1 = client.CoreV1Api(api_client)
+        path = '/api/v1/namespaces/bench/pods'
+
+        print(f"{args.pods} pods, page size {args.page_size}")
+        measure("count: full list", lambda: len(v1.list_namespaced_pod('bench').items))
+        measure("count: paged metadata-only", lambda: paging.count_objects(api_client, path, page_size=args.page_size))
+        measure("names: full list",
+                lambda: len([p.metadata.name for p in v1.list_namespaced_pod('bench').items]))
+        measure("names: paged metadata-only",
+                lambda: sum(1 for _ in paging.iter_names(api_client, path, page_size=args.page_size)))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
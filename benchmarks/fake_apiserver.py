@@ -0,0 +1,267 @@
+"""
+Local stand-in for the Kubernetes API server used by the benchmarks.
+
+Serves synthetic pods, deployments, services, nodes and namespaces from memory:
+lists with `limit`/`continue` paging, `remainingItemCount`,
+PartialObjectMetadataList responses and simple equality-based label and field
+selectors, single-object reads, pod logs and /version.
+
+Usage: python benchmarks/fake_apiserver.py --pods 50000 --namespace bench --port 18080
+"""
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def make_pod(index, namespace):
+    """
+    Builds a pod dict shaped like a real API server response.
+    """
+    name = f"web-{index // 1000:04d}-{index:08x}"
+    return {
+        'apiVersion': 'v1',
+        'kind': 'Pod',
+        'metadata': {
+            'name': name,
+            'namespace': namespace,
+            'uid': f"00000000-0000-0000-0000-{index:012d}",
+            'resourceVersion': str(1000 + index),
+            'creationTimestamp': '2024-10-25T15:25:02Z',
+            'labels': {'app': 'web', 'pod-template-hash': f"{index // 1000:04d}", 'tier': 'frontend'},
+            'annotations': {'kubectl.kubernetes.io/restartedAt': '2024-10-25T15:25:02Z'},
+            'ownerReferences': [{
+                'apiVersion': 'apps/v1', 'kind': 'ReplicaSet', 'name': f"web-{index // 1000:04d}",
+                'uid': f"11111111-0000-0000-0000-{index // 1000:012d}", 'controller': True,
+                'blockOwnerDeletion': True
+            }]
+        },
+        'spec': {
+            'nodeName': f"node-{index % 100:03d}",
+            'restartPolicy': 'Always',
+            'serviceAccountName': 'default',
+            'containers': [{
+                'name': container,
+                'image': f"registry.example.com/{container}:1.2.3",
+                'ports': [{'containerPort': 8080, 'protocol': 'TCP'}],
+                'env': [{'name': f"VAR_{i}", 'value': f"value-{i}"} for i in range(5)],
+                'resources': {'limits': {'cpu': '500m', 'memory': '256Mi'},
+                              'requests': {'cpu': '100m', 'memory': '128Mi'}},
+                'volumeMounts': [{'name': 'kube-api-access', 'mountPath': '/var/run/secrets/kubernetes.io',
+                                  'readOnly': True}]
+            } for container in ('app', 'sidecar')]
+        },
+        'status': {
+            'phase': 'Running' if index % 10 else 'Pending',
+            'hostIP': f"10.0.{index % 100}.1",
+            'podIP': f"10.244.{(index // 250) % 250}.{index % 250}",
+            'startTime': '2024-10-25T15:25:02Z',
+            'conditions': [{'type': t, 'status': 'True', 'lastTransitionTime': '2024-10-25T15:25:02Z'}
+                           for t in ('Initialized', 'Ready', 'ContainersReady', 'PodScheduled')],
+            'containerStatuses': [{
+                'name': container, 'ready': True, 'restartCount': index % 3,
+                'image': f"registry.example.com/{container}:1.2.3",
+                'imageID': f"registry.example.com/{container}@sha256:{'0' * 64}",
+                'containerID': f"containerd://{index:064x}",
+                'state': {'running': {'startedAt': '2024-10-25T15:25:02Z'}}
+            } for container in ('app', 'sidecar')]
+        }
+    }
+
+
+def make_deployment(index, namespace):
+    name = f"web-{index:04d}"
+    return {
+        'apiVersion': 'apps/v1',
+        'kind': 'Deployment',
+        'metadata': {'name': name, 'namespace': namespace, 'uid': f"22222222-0000-0000-0000-{index:012d}",
+                     'resourceVersion': str(500000 + index), 'creationTimestamp': '2024-10-25T15:25:02Z',
+                     'labels': {'app': 'web', 'tier': 'frontend'}},
+        'spec': {
+            'replicas': 3,
+            'selector': {'matchLabels': {'app': 'web'}},
+            'template': {
+                'metadata': {'labels': {'app': 'web'}},
+                'spec': {'containers': [{'name': container, 'image': f"registry.example.com/{container}:1.2.3"}
+                                        for container in ('app', 'sidecar')]}
+            }
+        },
+        'status': {'replicas': 3, 'readyReplicas': 3, 'availableReplicas': 3, 'updatedReplicas': 3}
+    }
+
+
+def make_service(index, namespace):
+    return {
+        'apiVersion': 'v1',
+        'kind': 'Service',
+        'metadata': {'name': f"web-{index:04d}", 'namespace': namespace,
+                     'uid': f"33333333-0000-0000-0000-{index:012d}", 'resourceVersion': str(600000 + index),
+                     'creationTimestamp': '2024-10-25T15:25:02Z', 'labels': {'app': 'web'}},
+        'spec': {'type': 'ClusterIP', 'clusterIP': f"10.96.{index // 250 % 250}.{index % 250}",
+                 'selector': {'app': 'web'}, 'ports': [{'port': 80, 'targetPort': 8080, 'protocol': 'TCP'}]},
+        'status': {'loadBalancer': {}}
+    }
+
+
+def make_node(index):
+    return {
+        'apiVersion': 'v1',
+        'kind': 'Node',
+        'metadata': {'name': f"node-{index:03d}", 'uid': f"44444444-0000-0000-0000-{index:012d}",
+                     'resourceVersion': str(700000 + index), 'creationTimestamp': '2024-10-25T15:25:02Z',
+                     'labels': {'kubernetes.io/os': 'linux'}},
+        'spec': {'podCIDR': f"10.244.{index}.0/24"},
+        'status': {'conditions': [{'type': 'Ready', 'status': 'True'}],
+                   'nodeInfo': {'kubeletVersion': 'v1.31.0', 'osImage': 'Ubuntu 22.04', 'architecture': 'amd64',
+                                'containerRuntimeVersion': 'containerd://1.7.0', 'kernelVersion': '6.1.0',
+                                'operatingSystem': 'linux', 'kubeProxyVersion': 'v1.31.0', 'bootID': '',
+                                'machineID': '', 'systemUUID': ''}}
+    }
+
+
+def make_namespace(name):
+    return {'apiVersion': 'v1', 'kind': 'Namespace',
+            'metadata': {'name': name, 'uid': f"55555555-{name}", 'resourceVersion': '1',
+                         'creationTimestamp': '2024-10-25T15:25:02Z', 'labels': {}},
+            'spec': {'finalizers': ['kubernetes']}, 'status': {'phase': 'Active'}}
+
+
+def _lookup(obj, path):
+    for key in path.split('.'):
+        obj = (obj or {}).get(key)
+    return obj
+
+
+def matches_selectors(obj, label_selector=None, field_selector=None):
+    """
+    Applies comma-separated `key=value` / `key!=value` selectors, the subset the benchmarks use.
+    """
+    for selector, value_of in ((label_selector, lambda key: (obj['metadata'].get('labels') or {}).get(key)),
+                               (field_selector, lambda key: _lookup(obj, key))):
+        for requirement in filter(None, (selector or '').split(',')):
+            negate = '!=' in requirement
+            key, _, value = requirement.partition('!=' if negate else '=')
+            if (value_of(key.strip()) == value.strip()) == negate:
+                return False
+    return True
+
+
+def metadata_only(obj):
+    return {'apiVersion': 'meta.k8s.io/v1', 'kind': 'PartialObjectMetadata', 'metadata': obj['metadata']}
+
+
+class FakeCluster:
+    """
+    In-memory objects served by the fake API server, keyed by resource and namespace.
+    """
+
+    def __init__(self, pods=0, namespace='default', namespaces=1, deployments=0, services=0, nodes=0):
+        # With several namespaces, objects are spread round-robin over namespace-0, namespace-1, ...
+        names = [namespace] if namespaces == 1 else [f"{namespace}-{n}" for n in range(namespaces)]
+        self.objects = {('namespaces', None): [make_namespace(name) for name in names]}
+        self.objects[('nodes', None)] = [make_node(i) for i in range(nodes)]
+        for resource, count, make in (('pods', pods, make_pod), ('deployments', deployments, make_deployment),
+                                      ('services', services, make_service)):
+            for name in names:
+                self.objects[(resource, name)] = []
+            for i in range(count):
+                name = names[i % len(names)]
+                self.objects[(resource, name)].append(make(i, name))
+        self._by_name = {(resource, ns, obj['metadata']['name']): obj
+                         for (resource, ns), objs in self.objects.items() for obj in objs}
+
+    def list(self, resource, namespace=None):
+        if namespace is not None:
+            return self.objects.get((resource, namespace), [])
+        return [obj for (res, _), objs in self.objects.items() if res == resource for obj in objs]
+
+    def get(self, resource, namespace, name):
+        return self._by_name.get((resource, namespace, name))
+
+
+def make_handler(cluster):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path == '/version':
+                return self.send_json(200, {'major': '1', 'minor': '31', 'gitVersion': 'v1.31.0-fake'})
+            parts = url.path.strip('/').split('/')
+            # /api/v1/[namespaces/{ns}/]{resource}[/{name}[/{subresource}]], same under /apis/{group}/{version}
+            rest = parts[2:] if parts[0] == 'api' else parts[3:]
+            namespace = None
+            if len(rest) > 2 and rest[0] == 'namespaces':
+                namespace, rest = rest[1], rest[2:]
+            resource = rest[0]
+            name = rest[1] if len(rest) > 1 else None
+            subresource = rest[2] if len(rest) > 2 else None
+
+            if name is None:
+                items = cluster.list(resource, namespace)
+                if params.get('labelSelector') or params.get('fieldSelector'):
+                    items = [obj for obj in items
+                             if matches_selectors(obj, params.get('labelSelector'), params.get('fieldSelector'))]
+                return self.send_list(items, params)
+
+            obj = cluster.get(resource, namespace, name)
+            if obj is None:
+                return self.send_json(404, {'kind': 'Status', 'apiVersion': 'v1', 'status': 'Failure',
+                                            'reason': 'NotFound', 'code': 404,
+                                            'message': f'{resource} "{name}" not found'})
+            if subresource == 'log':
+                lines = int(params.get('tailLines') or 100)
+                body = ''.join(f"2024-10-25T15:25:02Z INFO request {i} served in 3ms\n" for i in range(lines))
+                return self.send_body(200, 'text/plain', body.encode())
+            self.send_json(200, obj)
+
+        def send_json(self, status, payload):
+            self.send_body(status, 'application/json', json.dumps(payload).encode())
+
+        def send_body(self, status, content_type, body):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_list(self, items, params):
+            start = int(params.get('continue') or 0)
+            limit = int(params.get('limit') or 0)
+            end = start + limit if limit else len(items)
+            page = items[start:end]
+            metadata = {'resourceVersion': '999999'}
+            if end < len(items):
+                metadata['continue'] = str(end)
+                metadata['remainingItemCount'] = len(items) - end
+
+            as_metadata = 'as=PartialObjectMetadataList' in self.headers.get('Accept', '')
+            self.send_json(200, {
+                'apiVersion': 'meta.k8s.io/v1' if as_metadata else 'v1',
+                'kind': 'PartialObjectMetadataList' if as_metadata else 'List',
+                'metadata': metadata,
+                'items': [metadata_only(obj) for obj in page] if as_metadata else page
+            })
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(cluster, port):
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(cluster))
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pods', type=int, default=50000)
+    parser.add_argument('--namespace', default='bench')
+    parser.add_argument('--namespaces', type=int, default=1)
+    parser.add_argument('--deployments', type=int, default=0)
+    parser.add_argument('--services', type=int, default=0)
+    parser.add_argument('--nodes', type=int, default=0)
+    parser.add_argument('--port', type=int, default=18080)
+    args = parser.parse_args()
+    serve(FakeCluster(pods=args.pods, namespace=args.namespace, namespaces=args.namespaces,
+                      deployments=args.deployments, services=args.services, nodes=args.nodes), args.port)
@@ -0,0 +1,105 @@
+"""
+Evaluates LLM parser configurations on the labelled corpus: accuracy of the
+parse, latency and prompt/completion tokens per call, for each prompt style
+and model. Calls the OpenAI API (or OPENAI_BASE_URL), bypassing the rule
+parser and the parse cache; --stub runs against benchmarks/stub_llm.py to
+check the harness offline.
+
+Usage: python benchmarks/llm_eval.py [--styles full,compact,structured] [--models gpt-4,gpt-4o-mini]
+                                     [--limit 20] [--stub] [--json out.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from load_test import ROOT, percentile, wait_for
+
+
+def load_entries(path, limit=None):
+    with open(path) as corpus:
+        entries = [json.loads(line) for line in corpus if line.strip()]
+    return entries[:limit] if limit else entries
+
+
+def comparable(parse, keys):
+    """
+    Projects a parse onto the keys the LLM produces, with absent optional keys as None.
+    """
+    return {key: parse.get(key) for key in keys}
+
+
+def evaluate(nlp_parser, entries, style, model):
+    """
+    Parses every corpus query with one style and model and returns the
+    accuracy, latency percentiles and mean tokens per call.
+    """
+    correct, calls = 0, []
+    for entry in entries:
+        stats = {}
+        parsed = nlp_parser.parse_query_with_llm(entry['query'], style=style, model=model, stats=stats)
+        if comparable(parsed, nlp_parser.PARSE_KEYS) == comparable(entry['expected'], nlp_parser.PARSE_KEYS):
+            correct += 1
+        else:
+            print(f"MISMATCH [{style} {model or 'per-class'}] {entry['query']!r}: got {parsed}")
+        calls.append(stats)
+    seconds = [call['seconds'] for call in calls if 'seconds' in call]
+    return {
+        'style': style,
+        'model': model or 'per-class',
+        'accuracy': correct / len(entries),
+        'correct': correct,
+        'queries': len(entries),
+        'p50_ms': percentile(seconds, 50) * 1000,
+        'p95_ms': percentile(seconds, 95) * 1000,
+        'prompt_tokens': statistics.mean(call.get('prompt_tokens', 0) for call in calls),
+        'completion_tokens': statistics.mean(call.get('completion_tokens', 0) for call in calls)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--corpus', default=os.path.join(ROOT, 'corpus', 'queries.jsonl'))
+    parser.add_argument('--styles', default='full,compact,structured')
+    parser.add_argument('--models', default='', help="comma-separated models; default: the per-class models")
+    parser.add_argument('--limit', type=int, help="evaluate only the first N queries")
+    parser.add_argument('--stub', action='store_true', help="answer from benchmarks/stub_llm.py")
+    parser.add_argument('--llm-port', type=int, default=18090)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    stub = None
+    if args.stub:
+        stub = subprocess.Popen([sys.executable, os.path.join(ROOT, 'benchmarks', 'stub_llm.py'),
+                                 '--corpus', args.corpus, '--delay', '0', '--port', str(args.llm_port)])
+        wait_for(f"http://127.0.0.1:{args.llm_port}/v1/chat/completions")
+        os.environ.update({'OPENAI_API_KEY': 'stub', 'OPENAI_BASE_URL': f"http://127.0.0.1:{args.llm_port}/v1"})
+    try:
+        # Imported only now: the module reads its configuration at import time
+        import nlp_parser
+        entries = load_entries(args.corpus, args.limit)
+        models = [model for model in args.models.split(',') if model] or [None]
+        results = [evaluate(nlp_parser, entries, style, model)
+                   for style in args.styles.split(',') for model in models]
+    finally:
+        if stub is not None:
+            stub.terminate()
+            stub.wait()
+
+    print(f"{'style':<11} {'model':<16} {'accuracy':>12} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'prompt tok':>11} {'compl. tok':>11}")
+    for result in results:
+        print(f"{result['style']:<11} {result['model']:<16} "
+              f"{result['correct']:>4}/{result['queries']:<3} {result['accuracy']:>4.0%} "
+              f"{result['p50_ms']:>9.0f} {result['p95_ms']:>9.0f} "
+              f"{result['prompt_tokens']:>11.0f} {result['completion_tokens']:>11.0f}")
+
+    if args.json:
+        with open(args.json, 'w') as out:
+            json.dump(results, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
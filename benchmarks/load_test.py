@@ -0,0 +1,213 @@
+"""
+Replays a query corpus through parse_query, map_action and the executor
+against the fake API server and the stub LLM, and reports throughput plus
+per-stage latency percentiles and memory.
+
+Usage: python benchmarks/load_test.py [--pods 5000] [--concurrency 16] [--repeat 20]
+                                      [--llm-delay 0.8] [--no-rules] [--no-parse-cache] [--json out.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+STAGES = ('parse', 'map', 'execute', 'total')
+
+KUBECONFIG_TEMPLATE = """apiVersion: v1
+kind: Config
+clusters:
+- cluster: {{server: "http://127.0.0.1:{port}"}}
+  name: fake
+contexts:
+- context: {{cluster: fake, user: fake}}
+  name: fake
+current-context: fake
+users:
+- name: fake
+  user: {{token: fake}}
+"""
+
+
+def wait_for(url, timeout=120):
+    """
+    Waits until a server answers on url, with any HTTP status.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url)
+            return
+        except urllib.error.HTTPError:
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not start")
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of values.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+def peak_rss_mib():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def load_corpus(path):
+    with open(path) as corpus:
+        return [json.loads(line)['query'] for line in corpus if line.strip()]
+
+
+def run_query(query, pipeline):
+    """
+    Answers one query and returns the duration of each stage in seconds.
+    """
+    parse_query, map_action, execute = pipeline
+    start = time.perf_counter()
+    parsed = parse_query(query)
+    parsed_at = time.perf_counter()
+    mapped = map_action(parsed)
+    mapped_at = time.perf_counter()
+    execute(mapped)
+    done = time.perf_counter()
+    return {'parse': parsed_at - start, 'map': mapped_at - parsed_at, 'execute': done - mapped_at,
+            'total': done - start}
+
+
+def measure_memory(queries, pipeline):
+    """
+    Runs each query once, sequentially, and returns the peak Python memory
+    allocated by each stage in KiB (mean and max over the queries).
+    """
+    parse_query, map_action, execute = pipeline
+    peaks = {stage: [] for stage in STAGES[:3]}
+    tracemalloc.start()
+    try:
+        for query in queries:
+            value = query
+            for stage, fn in zip(STAGES[:3], (parse_query, map_action, execute)):
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                value = fn(value)
+                peaks[stage].append((tracemalloc.get_traced_memory()[1] - baseline) / 1024)
+    finally:
+        tracemalloc.stop()
+    return {stage: {'mean_kib': sum(values) / len(values), 'max_kib': max(values)}
+            for stage, values in peaks.items() if values}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--corpus', default=os.path.join(ROOT, 'corpus', 'queries.jsonl'))
+    parser.add_argument('--pods', type=int, default=5000)
+    parser.add_argument('--deployments', type=int, default=500)
+    parser.add_argument('--services', type=int, default=500)
+    parser.add_argument('--nodes', type=int, default=50)
+    parser.add_argument('--namespace', default='default')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--repeat', type=int, default=20, help="times the corpus is replayed")
+    parser.add_argument('--llm-delay', type=float, default=0.8, help="stub LLM reply delay in seconds")
+    parser.add_argument('--no-rules', action='store_true', help="disable the rule-based fast path")
+    parser.add_argument('--no-parse-cache', action='store_true', help="disable the parse cache")
+    parser.add_argument('--api-port', type=int, default=18080)
+    parser.add_argument('--llm-port', type=int, default=18090)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    servers = [
+        subprocess.Popen([sys.executable, os.path.join(here, 'fake_apiserver.py'), '--pods', str(args.pods),
+                          '--deployments', str(args.deployments), '--services', str(args.services),
+                          '--nodes', str(args.nodes), '--namespace', args.namespace, '--port', str(args.api_port)]),
+        subprocess.Popen([sys.executable, os.path.join(here, 'stub_llm.py'), '--corpus', args.corpus,
+                          '--delay', str(args.llm_delay), '--port', str(args.llm_port)])
+    ]
+    kubeconfig = tempfile.NamedTemporaryFile('w', suffix='.yaml', delete=False)
+    try:
+        wait_for(f"http://127.0.0.1:{args.api_port}/api/v1/namespaces")
+        wait_for(f"http://127.0.0.1:{args.llm_port}/v1/chat/completions")
+
+        kubeconfig.write(KUBECONFIG_TEMPLATE.format(port=args.api_port))
+        kubeconfig.close()
+        os.environ.update({
+            'KUBECONFIG': kubeconfig.name,
+            'OPENAI_API_KEY': 'stub',
+            'OPENAI_BASE_URL': f"http://127.0.0.1:{args.llm_port}/v1",
+            'RULE_PARSER_ENABLED': '0' if args.no_rules else '1',
+            'PARSE_CACHE_SIZE': '0' if args.no_parse_cache else os.getenv('PARSE_CACHE_SIZE', '1024'),
+            'PARSE_CACHE_PATH': ''
+        })
+        # Imported only now: these modules read their configuration at import time
+        from nlp_parser import parse_query
+        from action_mapper import map_action
+        from k8s_executor import execute_with_prefetched
+        pipeline = (parse_query, map_action, execute_with_prefetched)
+
+        queries = load_corpus(args.corpus)
+        workload = queries * args.repeat
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            timings = list(pool.map(lambda query: run_query(query, pipeline), workload))
+        elapsed = time.perf_counter() - start
+
+        results = {
+            'revision': git_revision(),
+            'settings': vars(args),
+            'queries': len(workload),
+            'seconds': elapsed,
+            'qps': len(workload) / elapsed,
+            'latency_ms': {stage: {f"p{pct}": percentile([t[stage] for t in timings], pct) * 1000
+                                   for pct in (50, 95, 99)} for stage in STAGES},
+            'memory': measure_memory(queries, pipeline),
+            'peak_rss_mib': peak_rss_mib()
+        }
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+        os.unlink(kubeconfig.name)
+
+    print(f"{results['queries']} queries in {results['seconds']:.2f} s, {results['qps']:.1f} QPS "
+          f"(concurrency {args.concurrency}), revision {results['revision']}")
+    print(f"{'stage':<8} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'mem mean KiB':>14} {'mem max KiB':>12}")
+    for stage in STAGES:
+        latency = results['latency_ms'][stage]
+        memory = results['memory'].get(stage)
+        mean_kib, max_kib = (f"{memory['mean_kib']:.1f}", f"{memory['max_kib']:.1f}") if memory else ('-', '-')
+        print(f"{stage:<8} {latency['p50']:>10.2f} {latency['p95']:>10.2f} {latency['p99']:>10.2f} "
+              f"{mean_kib:>14} {max_kib:>12}")
+    print(f"peak RSS {results['peak_rss_mib']:.1f} MiB")
+
+    if args.json:
+        with open(args.json, 'w') as out:
+            json.dump(results, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Compares the informer store's compact snapshot records with full client
+model objects: bytes held per object, time to build them from a list
+response, and the speed of store lookups answering get queries
+(status, restart count, node of a pod; replicas and image of a deployment).
+Runs in-process on synthetic objects from the fake API server.
+
+Usage: python benchmarks/snapshot_store.py [--pods 20000] [--deployments 2000] [--namespaces 20]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_apiserver import FakeCluster  # noqa: E402
+import informer  # noqa: E402
+import k8s_executor  # noqa: E402
+import snapshot  # noqa: E402
+
+# Field extractor and the fields queried, per resource type
+QUERIES = {
+    'pods': (k8s_executor.get_pod_info, ('status', 'restart_count', 'node', 'labels')),
+    'deployments': (k8s_executor.get_deployment_info, ('replicas', 'image', 'status', 'labels'))
+}
+
+MODEL_LISTS = {'pods': 'V1PodList', 'deployments': 'V1DeploymentList'}
+
+
+def build(body, make):
+    """
+    Builds the objects of a list response body with make(body) and returns
+    them with the bytes held per object and the build time per object. The
+    build is timed separately, as tracing allocations slows it down.
+    """
+    start = time.perf_counter()
+    make(body)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = make(body)
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return items, held / len(items), elapsed / len(items)
+
+
+def lookups(resource, items, rounds):
+    """
+    Returns the mean seconds of one store lookup plus field extraction.
+    """
+    store = informer.Store()
+    store.replace(items, '1')
+    describe, fields = QUERIES[resource]
+    keys = [(obj.metadata.name, obj.metadata.namespace) for obj in items]
+    sample = [random.choice(keys) for _ in range(rounds)]
+    start = time.perf_counter()
+    for name, namespace in sample:
+        obj = store.get(name, namespace)
+        for field in fields:
+            describe(obj, field)
+    return (time.perf_counter() - start) / (rounds * len(fields))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pods', type=int, default=20000)
+    parser.add_argument('--deployments', type=int, default=2000)
+    parser.add_argument('--namespaces', type=int, default=20)
+    parser.add_argument('--lookups', type=int, default=20000)
+    args = parser.parse_args()
+
+    from kubernetes import client
+    api_client = client.ApiClient()
+    cluster = FakeCluster(pods=args.pods, deployments=args.deployments, namespace='bench',
+                          namespaces=args.namespaces)
+
+    print(f"{'objects':<30} {'bytes/object':>13} {'build µs/object':>16} {'lookup µs':>10}")
+    for resource in QUERIES:
+        body = json.dumps({'kind': 'List', 'metadata': {'resourceVersion': '1'}, 'items': cluster.list(resource)})
+        record_type = snapshot.RECORD_TYPES[resource]
+        makers = {
+            'client models': lambda body: api_client.deserialize(SimpleNamespace(data=body),
+                                                                 MODEL_LISTS[resource]).items,
+            'snapshot records': lambda body: [record_type(item) for item in json.loads(body)['items']]
+        }
+        for label, make in makers.items():
+            items, per_object, build_seconds = build(body, make)
+            lookup_seconds = lookups(resource, items, args.lookups)
+            print(f"{resource + ': ' + label:<30} {per_object:>13,.0f} {build_seconds * 1e6:>16.1f} "
+                  f"{lookup_seconds * 1e6:>10.2f}")
+            del items
+
+
+if __name__ == "__main__":
+    main()
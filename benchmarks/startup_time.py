@@ -0,0 +1,84 @@
+"""
+Measures cold-start cost of the Flask app in fresh processes: time to import
+it, time to warm up its clients, and latency of the first query, with and
+without warm-up before the first request, against the fake API server and
+the stub LLM.
+
+Usage: python benchmarks/startup_time.py [--runs 5] [--query "how many pods in namespace bench"]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from load_test import KUBECONFIG_TEMPLATE, ROOT, wait_for
+
+# Runs in each child process; prints one JSON line of timings
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+if sys.argv[1] == 'warm':
+    main.startup.warm_up()
+warmed = time.perf_counter()
+with main.app.test_client() as http:
+    http.post('/query', json={'query': sys.argv[2]})
+done = time.perf_counter()
+print(json.dumps({'import': imported - start, 'warm_up': warmed - imported, 'first_request': done - warmed,
+                  'process_to_first_request': main.startup.startup_status()['milestones_seconds']['first_request']}))
+"""
+
+TIMINGS = ('import', 'warm_up', 'first_request', 'process_to_first_request')
+
+
+def run_child(mode, query, env):
+    output = subprocess.check_output([sys.executable, '-c', CHILD, mode, query], cwd=ROOT, env=env, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5, help="fresh processes per mode")
+    parser.add_argument('--query', default="how many pods in namespace bench")
+    parser.add_argument('--pods', type=int, default=1000)
+    parser.add_argument('--api-port', type=int, default=18080)
+    parser.add_argument('--llm-port', type=int, default=18090)
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    servers = [
+        subprocess.Popen([sys.executable, os.path.join(here, 'fake_apiserver.py'), '--pods', str(args.pods),
+                          '--port', str(args.api_port)]),
+        subprocess.Popen([sys.executable, os.path.join(here, 'stub_llm.py'), '--corpus',
+                          os.path.join(ROOT, 'corpus', 'queries.jsonl'), '--delay', '0', '--port', str(args.llm_port)])
+    ]
+    kubeconfig = tempfile.NamedTemporaryFile('w', suffix='.yaml', delete=False)
+    log_dir = tempfile.mkdtemp()
+    try:
+        wait_for(f"http://127.0.0.1:{args.api_port}/api/v1/namespaces")
+        wait_for(f"http://127.0.0.1:{args.llm_port}/v1/chat/completions")
+        kubeconfig.write(KUBECONFIG_TEMPLATE.format(port=args.api_port))
+        kubeconfig.close()
+        env = dict(os.environ, KUBECONFIG=kubeconfig.name, OPENAI_API_KEY='stub',
+                   OPENAI_BASE_URL=f"http://127.0.0.1:{args.llm_port}/v1", PARSE_CACHE_PATH='',
+                   RESULT_CACHE_PATH='', LOG_FILE=os.path.join(log_dir, 'agent.log'))
+        results = {mode: [run_child(mode, args.query, env) for _ in range(args.runs)] for mode in ('cold', 'warm')}
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+        os.unlink(kubeconfig.name)
+
+    print(f"median of {args.runs} fresh processes, seconds")
+    print(f"{'mode':<6} " + ' '.join(f"{timing:>26}" for timing in TIMINGS))
+    for mode, runs in results.items():
+        print(f"{mode:<6} " + ' '.join(f"{statistics.median(run[timing] for run in runs):>26.3f}"
+                                       for timing in TIMINGS))
+
+
+if __name__ == "__main__":
+    main()
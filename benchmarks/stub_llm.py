@@ -0,0 +1,87 @@
+"""
+OpenAI-compatible stand-in for the LLM used by the benchmarks.
+
+Answers POST /v1/chat/completions with the expected parse of the query from a
+labelled corpus, after a configurable delay, so the LLM path of parse_query can
+be load-tested without calling OpenAI. Point the agent at it with
+OPENAI_BASE_URL=http://127.0.0.1:18090/v1.
+
+Usage: python benchmarks/stub_llm.py --corpus corpus/queries.jsonl --delay 0.8 --port 18090
+"""
+import argparse
+import json
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# The query is quoted after this heading in the full parser prompt; the
+# compact and structured prompts send it alone as the user message
+QUERY_PATTERN = re.compile(r'\*\*User\'s Query:\*\*\s*"(.*)"', re.DOTALL)
+
+EMPTY_PARSE = {'action': None, 'resource': None, 'target_name': None, 'namespace': None, 'field': None,
+               'related_to': {'resource': None, 'name': None}}
+
+
+def load_answers(path):
+    """
+    Maps each corpus query to the JSON reply the stub returns for it.
+    """
+    answers = {}
+    with open(path) as corpus:
+        for line in corpus:
+            if line.strip():
+                entry = json.loads(line)
+                answers[entry['query']] = json.dumps(entry['expected'])
+    return answers
+
+
+def completion(content, model, prompt_tokens):
+    return {
+        'id': 'chatcmpl-stub',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{'index': 0, 'finish_reason': 'stop',
+                     'message': {'role': 'assistant', 'content': content}}],
+        # Rough token counts (about four characters per token) for the token metrics
+        'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(content) // 4,
+                  'total_tokens': prompt_tokens + len(content) // 4}
+    }
+
+
+def make_handler(answers, delay):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)))
+            prompt = request['messages'][-1]['content']
+            match = QUERY_PATTERN.search(prompt)
+            query = match.group(1) if match else prompt.strip()
+            content = answers.get(query, json.dumps(EMPTY_PARSE))
+
+            time.sleep(delay)
+            body = json.dumps(completion(content, request.get('model', 'stub'),
+                                         sum(len(m['content']) for m in request['messages']) // 4)).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(answers, delay, port):
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(answers, delay))
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--corpus', default='corpus/queries.jsonl')
+    parser.add_argument('--delay', type=float, default=0.8, help="seconds before each reply")
+    parser.add_argument('--port', type=int, default=18090)
+    args = parser.parse_args()
+    serve(load_answers(args.corpus), args.delay, args.port)
@@ -0,0 +1,262 @@
+import threading
+import time
+from collections import Counter, deque
+import metrics
+
+# Field selector keys the buffer evaluates, and the event record attribute each reads
+SELECTOR_FIELDS = {
+    'type': 'type',
+    'reason': 'reason',
+    'involvedObject.kind': 'involved_kind',
+    'involvedObject.name': 'involved_name'
+}
+
+_buffer = None
+
+
+def parse_field_selector(selector: str) -> list:
+    """
+    Parses an event field selector such as "type=Warning,reason!=Pulled"
+    into (attribute, equal, value) triples. Raises ValueError for keys or
+    operators the buffer cannot evaluate.
+    """
+    terms = []
+    for term in filter(None, (part.strip() for part in (selector or '').split(','))):
+        key, operator, value = term.partition('!=') if '!=' in term else term.partition('=')
+        if not operator or key.strip() not in SELECTOR_FIELDS:
+            raise ValueError(f"Unsupported event field selector: {term}")
+        terms.append((SELECTOR_FIELDS[key.strip()], operator == '=', value.lstrip('=').strip()))
+    return terms
+
+
+def select(events, involved=None, selector=(), since_seconds=None):
+    """
+    Returns the current (not superseded) events that concern one of the
+    `involved` (kind, name) pairs, match every selector term and occurred
+    within the last `since_seconds`, newest first.
+    """
+    cutoff = time.time() - since_seconds if since_seconds else None
+    involved = set(involved) if involved is not None else None
+    selected = []
+    for event in events:
+        if event.superseded:
+            continue
+        if involved is not None and (event.involved_kind, event.involved_name) not in involved:
+            continue
+        if cutoff is not None and (event.timestamp or 0) < cutoff:
+            continue
+        if all((getattr(event, attribute) == value) == equal for attribute, equal, value in selector):
+            selected.append(event)
+    selected.sort(key=lambda event: event.timestamp or 0, reverse=True)
+    return selected
+
+
+class EventBuffer:
+    """
+    Bounded, in-memory history of cluster events fed by an events informer:
+    one ring per namespace, oldest first, with indexes by involved object and
+    by reason. It implements the informer Store interface, so the informer
+    lists and watches into it. A namespace keeps at most `per_namespace`
+    events, and the buffer at most `max_events`; past that the busiest
+    namespace gives up its oldest event, so a noisy namespace cannot flush
+    the history of quiet ones. Events deleted by the API server (after their
+    TTL) stay until evicted. Every version of an updated event takes a slot
+    until it is evicted; only the newest is returned.
+    """
+
+    def __init__(self, per_namespace=1000, max_events=50000):
+        self.per_namespace = per_namespace
+        self.max_events = max_events
+        self._lock = threading.RLock()
+        self._rings = {}      # namespace -> events, oldest first
+        self._by_object = {}  # (namespace, kind, name) -> events, oldest first
+        self._by_reason = {}  # (namespace, reason) -> events, oldest first
+        self._latest = {}     # (namespace, event name) -> newest version of the event
+        self.size = 0
+        self.evictions = Counter()
+        self.resource_version = None
+        self.synced = False
+        self.last_sync = None
+        self.watching = False
+
+    def _add(self, event):
+        namespace = event.namespace
+        previous = self._latest.get((namespace, event.name))
+        if previous is not None:
+            if previous.resource_version == event.resource_version:
+                return
+            previous.superseded = True
+        self._latest[(namespace, event.name)] = event
+        self._rings.setdefault(namespace, deque()).append(event)
+        self._by_object.setdefault((namespace, event.involved_kind, event.involved_name), deque()).append(event)
+        self._by_reason.setdefault((namespace, event.reason), deque()).append(event)
+        self.size += 1
+        if len(self._rings[namespace]) > self.per_namespace:
+            self._evict(namespace, 'namespace_full')
+        if self.size > self.max_events:
+            self._evict(max(self._rings, key=lambda name: len(self._rings[name])), 'buffer_full')
+
+    def _evict(self, namespace, reason):
+        ring = self._rings[namespace]
+        event = ring.popleft()
+        if not ring:
+            del self._rings[namespace]
+        # Events enter every index in ring order, so the evicted one is first in each
+        for index, key in ((self._by_object, (namespace, event.involved_kind, event.involved_name)),
+                           (self._by_reason, (namespace, event.reason))):
+            entries = index.get(key)
+            if entries and entries[0] is event:
+                entries.popleft()
+                if not entries:
+                    del index[key]
+        if self._latest.get((namespace, event.name)) is event:
+            del self._latest[(namespace, event.name)]
+        self.size -= 1
+        self.evictions[reason] += 1
+        metrics.EVENTS_EVICTED_TOTAL.inc(reason=reason)
+
+    def replace(self, items, resource_version):
+        """
+        Adds the events of a full list, oldest first. History already held
+        is kept; events the buffer holds at the same version are skipped.
+        """
+        with self._lock:
+            for event in sorted(items, key=lambda event: event.timestamp or 0):
+                self._add(event)
+            self.resource_version = resource_version
+            self.synced = True
+            self.last_sync = time.monotonic()
+
+    def upsert(self, event):
+        """
+        Adds an event received from a watch event.
+        """
+        with self._lock:
+            self._add(event)
+            self.resource_version = event.metadata.resource_version
+            self.last_sync = time.monotonic()
+
+    def delete(self, event):
+        """
+        Records a watch DELETED event. The event stays in the history.
+        """
+        with self._lock:
+            self.resource_version = event.metadata.resource_version
+            self.last_sync = time.monotonic()
+
+    def bookmark(self, resource_version):
+        """
+        Records a watch BOOKMARK: nothing changed, but the buffer is current.
+        """
+        with self._lock:
+            self.resource_version = resource_version
+            self.last_sync = time.monotonic()
+
+    def watch_opened(self):
+        """
+        Records that the watch delivered its first event or bookmark, so it
+        is connected.
+        """
+        with self._lock:
+            self.watching = True
+
+    def watch_closed(self):
+        """
+        Records that the watch closed.
+        """
+        with self._lock:
+            self.watching = False
+
+    def get(self, name, namespace=None):
+        """
+        Returns the newest version of the named event, or None if it is not held.
+        """
+        with self._lock:
+            return self._latest.get((namespace, name))
+
+    def list(self, namespace=None):
+        """
+        Returns the newest version of every event held in a namespace, or in every namespace if None.
+        """
+        with self._lock:
+            return [event for key, event in self._latest.items() if namespace is None or key[0] == namespace]
+
+    def query(self, namespace=None, involved=None, selector=(), since_seconds=None):
+        """
+        Returns the events of a namespace (every namespace if None) that
+        concern one of the `involved` (kind, name) pairs, match the parsed
+        field `selector` and occurred within the last `since_seconds`,
+        newest first. Only the index entries that can match are scanned.
+        """
+        reasons = [value for attribute, equal, value in selector if attribute == 'reason' and equal]
+        with self._lock:
+            namespaces = list(self._rings) if namespace is None else [namespace]
+            if involved is not None:
+                candidates = [self._by_object.get((ns, kind, name), ()) for ns in namespaces for kind, name in involved]
+            elif reasons:
+                candidates = [self._by_reason.get((ns, reasons[0]), ()) for ns in namespaces]
+            else:
+                candidates = [self._rings.get(ns, ()) for ns in namespaces]
+            events = [event for entries in candidates for event in entries]
+        return select(events, involved, selector, since_seconds)
+
+    def staleness(self):
+        """
+        Returns the number of seconds since the buffer was last known to be
+        current, or None if it has never synced. Lists, watch events and
+        bookmarks each make it current; the API server sends a bookmark about
+        once a minute on a quiet watch, so a connected watch stays fresh and
+        one that hangs or never connects goes stale.
+        """
+        if self.last_sync is None:
+            return None
+        return time.monotonic() - self.last_sync
+
+    def status(self):
+        """
+        Reports size, limits, evictions and freshness of the buffer.
+        """
+        with self._lock:
+            staleness = self.staleness()
+            busiest = sorted(self._rings.items(), key=lambda item: len(item[1]), reverse=True)[:10]
+            return {
+                'synced': self.synced,
+                'watching': self.watching,
+                'resource_version': self.resource_version,
+                'staleness_seconds': round(staleness, 3) if staleness is not None else None,
+                'events': self.size,
+                'namespaces': len(self._rings),
+                'per_namespace_limit': self.per_namespace,
+                'max_events': self.max_events,
+                'busiest_namespaces': {namespace: len(ring) for namespace, ring in busiest},
+                'evictions': dict(self.evictions)
+            }
+
+
+def attach(buffer):
+    """
+    Registers the event buffer served to event queries.
+    """
+    global _buffer
+    _buffer = buffer
+    return buffer
+
+
+def get_buffer(max_staleness=None):
+    """
+    Returns the event buffer if it has synced and is at most `max_staleness`
+    seconds old, otherwise None.
+    """
+    buffer = _buffer
+    if buffer is None or not buffer.synced:
+        return None
+    if max_staleness is not None and buffer.staleness() > max_staleness:
+        return None
+    return buffer
+
+
+def buffer_status():
+    """
+    Reports the state of the event buffer, or None if it is not running.
+    """
+    return _buffer.status() if _buffer is not None else None
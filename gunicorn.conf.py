@@ -0,0 +1,83 @@
+"""
+Production serving: gunicorn pre-forks worker processes that each run the agent.
+
+    gunicorn -c gunicorn.conf.py
+
+SERVER_MODE=wsgi (default) serves the Flask app with threaded workers;
+SERVER_MODE=asgi serves the Starlette app with uvicorn workers. Send SIGHUP
+to the master for a graceful reload: new workers start before old ones finish
+their in-flight requests and exit.
+"""
+import glob
+import multiprocessing
+import os
+import tempfile
+
+# Address, worker processes and threads per (WSGI) worker
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+threads = int(os.getenv("WORKER_THREADS", "8"))
+
+# "wsgi" for main:app on gthread workers, "asgi" for asgi:app on uvicorn workers
+SERVER_MODE = os.getenv("SERVER_MODE", "wsgi")
+if SERVER_MODE == 'asgi':
+    wsgi_app = "asgi:app"
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    wsgi_app = "main:app"
+    worker_class = "gthread"
+
+# Seconds a worker may be silent before it is restarted, and seconds it gets
+# to finish in-flight requests on reload or shutdown
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+
+# Recycle workers after this many requests (0 disables), staggered by the jitter
+max_requests = int(os.getenv("MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "100"))
+
+# The app is imported in each worker, not in the master: informer threads and
+# the Kubernetes connection pool do not survive fork.
+preload_app = False
+
+# Parse and result caches get a SQLite tier in a directory shared by all
+# workers, so adding workers does not split the hit rate
+CACHE_DIR = os.getenv("CACHE_DIR") or os.path.join(tempfile.gettempdir(), "k8s-agent-cache")
+os.makedirs(CACHE_DIR, exist_ok=True)
+os.environ.setdefault("PARSE_CACHE_PATH", os.path.join(CACHE_DIR, "parse_cache.sqlite"))
+os.environ.setdefault("RESULT_CACHE_PATH", os.path.join(CACHE_DIR, "result_cache.sqlite"))
+
+# Metrics live in each worker's memory and a scrape reaches one worker, so
+# workers write them to a shared directory and /metrics sums them
+os.environ.setdefault("METRICS_DIR", os.path.join(CACHE_DIR, "metrics"))
+
+# Note that each worker runs its own informers: every K8S_INFORMERS resource
+# (and the event buffer) is listed and watched once per worker, so the
+# API-server load and memory of the caches grow with WEB_CONCURRENCY. Prefer
+# fewer workers with more threads when informers are enabled.
+
+
+def on_starting(server):
+    # Counters restart with the server, not with each worker
+    os.makedirs(os.environ["METRICS_DIR"], exist_ok=True)
+    for path in glob.glob(os.path.join(os.environ["METRICS_DIR"], "metrics.*.json")):
+        os.remove(path)
+
+
+def post_fork(server, worker):
+    # Each worker rotates its own log file; rotating a shared file from
+    # several processes would lose records
+    log_file = os.getenv("LOG_FILE", "agent.log")
+    root, ext = os.path.splitext(log_file)
+    os.environ["LOG_FILE"] = f"{root}.{worker.pid}{ext}"
+
+
+def post_worker_init(worker):
+    # The Starlette app starts its informers and warm-up on startup; the Flask
+    # app is not run through its __main__ block here, so start them for it
+    if SERVER_MODE != 'asgi':
+        import startup
+        from k8s_executor import start_configured_informers
+        start_configured_informers()
+        startup.start_warm_up()
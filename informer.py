@@ -0,0 +1,351 @@
+import functools
+import logging
+import threading
+import time
+import k8s_client
+
+# Seconds a single watch request stays open before it is re-established
+# from the last seen resourceVersion.
+WATCH_TIMEOUT_SECONDS = 300
+
+# Seconds to wait before retrying after an unexpected list/watch failure
+RETRY_BACKOFF_SECONDS = 5
+
+# Seconds past WATCH_TIMEOUT_SECONDS a watch may go without any data before
+# its connection is considered dead and re-established
+WATCH_READ_SLACK_SECONDS = 30
+
+# Registry of running informers, keyed by pluralized resource name
+_informers = {}
+
+
+class Store:
+    """
+    Thread-safe local store of Kubernetes objects for one resource type.
+    Objects are indexed by namespace and name so that list and get lookups
+    never touch the API server.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._by_namespace = {}
+        self.resource_version = None
+        self.synced = False
+        self.last_sync = None
+        self.watching = False
+        self._listeners = []
+
+    def add_listener(self, listener):
+        """
+        Registers a listener notified of every change: on_replace(items, resource_version)
+        after a full list and on_update(old, new) after a watch event. A synced
+        store replays its current contents to the new listener first.
+        """
+        with self._lock:
+            if self.synced:
+                listener.on_replace(self.list(), self.resource_version)
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """
+        Unregisters a listener; it is not notified of later changes.
+        """
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def replace(self, items, resource_version):
+        """
+        Replaces the store contents with the result of a full list.
+        """
+        by_namespace = {}
+        for obj in items:
+            by_namespace.setdefault(obj.metadata.namespace, {})[obj.metadata.name] = obj
+        with self._lock:
+            self._by_namespace = by_namespace
+            self.resource_version = resource_version
+            self.synced = True
+            self.last_sync = time.monotonic()
+            for listener in self._listeners:
+                listener.on_replace(items, resource_version)
+
+    def upsert(self, obj):
+        """
+        Adds or replaces a single object received from a watch event.
+        """
+        with self._lock:
+            namespaced = self._by_namespace.setdefault(obj.metadata.namespace, {})
+            old = namespaced.get(obj.metadata.name)
+            namespaced[obj.metadata.name] = obj
+            self.resource_version = obj.metadata.resource_version
+            self.last_sync = time.monotonic()
+            for listener in self._listeners:
+                listener.on_update(old, obj)
+
+    def delete(self, obj):
+        """
+        Removes a single object received from a watch DELETED event.
+        """
+        with self._lock:
+            namespaced = self._by_namespace.get(obj.metadata.namespace, {})
+            old = namespaced.pop(obj.metadata.name, None)
+            self.resource_version = obj.metadata.resource_version
+            self.last_sync = time.monotonic()
+            if old is not None:
+                for listener in self._listeners:
+                    listener.on_update(old, None)
+
+    def bookmark(self, resource_version):
+        """
+        Records a watch BOOKMARK: nothing changed, but the store is current.
+        """
+        with self._lock:
+            self.resource_version = resource_version
+            self.last_sync = time.monotonic()
+
+    def watch_opened(self):
+        """
+        Records that the watch delivered its first event or bookmark, so it
+        is connected.
+        """
+        with self._lock:
+            self.watching = True
+
+    def watch_closed(self):
+        """
+        Records that the watch closed.
+        """
+        with self._lock:
+            self.watching = False
+
+    def get(self, name, namespace=None):
+        """
+        Returns the object with the given name, or None if it is not stored.
+        """
+        with self._lock:
+            return self._by_namespace.get(namespace, {}).get(name)
+
+    def list(self, namespace=None):
+        """
+        Returns the objects in a namespace, or in every namespace if None.
+        """
+        with self._lock:
+            if namespace is None:
+                return [obj for objs in self._by_namespace.values() for obj in objs.values()]
+            return list(self._by_namespace.get(namespace, {}).values())
+
+    def staleness(self):
+        """
+        Returns the number of seconds since the store was last known to be
+        current, or None if it has never synced. Lists, watch events and
+        bookmarks each make it current; the API server sends a bookmark about
+        once a minute on a quiet watch, so a connected watch stays fresh and
+        one that hangs or never connects goes stale.
+        """
+        if self.last_sync is None:
+            return None
+        return time.monotonic() - self.last_sync
+
+
+class Informer:
+    """
+    Keeps a Store in sync with the API server using one list followed by a
+    watch that resumes from the last seen resourceVersion.
+
+    `list_func` is a cluster-wide list callable such as
+    `CoreV1Api.list_pod_for_all_namespaces`. `watch_factory` builds the
+    watcher and can be replaced with a fake stream in tests. `decode`, if
+    given, builds the stored object from the raw JSON of a watch event, in
+    place of the client model, and `load` replaces the full list with a
+    callable returning (objects, resourceVersion). `store` replaces the
+    default Store with another object implementing its interface.
+    """
+
+    def __init__(self, resource, list_func, watch_factory=None,
+                 timeout_seconds=WATCH_TIMEOUT_SECONDS, decode=None, load=None, store=None):
+        if watch_factory is None:
+            from kubernetes.watch import Watch as watch_factory
+        self.resource = resource
+        self.list_func = list_func
+        self.watch_factory = watch_factory
+        self.timeout_seconds = timeout_seconds
+        self.decode = decode
+        self.load = load
+        self.store = store if store is not None else Store()
+        # Set once the first list completes; unlike store.synced it stays set
+        # while the informer recovers from watch errors
+        self.initial_sync_done = False
+        self._stop = threading.Event()
+        self._watcher = None
+        self._thread = None
+
+    def list_and_replace(self):
+        """
+        Performs a full list and replaces the store contents.
+        """
+        if self.load is not None:
+            items, resource_version = self.load()
+        else:
+            result = self.list_func()
+            items, resource_version = result.items, result.metadata.resource_version
+        self.store.replace(items, resource_version)
+        self.initial_sync_done = True
+        logging.info("Informer for %s synced %d objects at resourceVersion %s",
+                     self.resource, len(items), self.store.resource_version)
+
+    def handle_event(self, event):
+        """
+        Applies a single watch event to the store.
+        """
+        event_type = event['type']
+        obj = event['object']
+        if self.decode is not None and event_type in ('ADDED', 'MODIFIED', 'DELETED'):
+            obj = self.decode(event['raw_object'])
+        if event_type in ('ADDED', 'MODIFIED'):
+            self.store.upsert(obj)
+        elif event_type == 'DELETED':
+            self.store.delete(obj)
+        elif event_type == 'BOOKMARK':
+            self.store.bookmark(event['raw_object']['metadata']['resourceVersion'])
+
+    def watch_once(self):
+        """
+        Consumes one watch request, starting from the store's resourceVersion.
+        Returns when the server closes the stream or the informer is stopped.
+        """
+        self._watcher = self.watch_factory()
+        # The watcher deserializes events into the model named in the list
+        # callable's docstring; a partial has none, so with decode the events
+        # stay JSON and no model is built only to be discarded
+        list_func = self.list_func if self.decode is None else functools.partial(self.list_func)
+        # A quiet resource may send nothing for the whole watch; the read
+        # timeout only ends a connection that outlives the server's timeout
+        stream = self._watcher.stream(list_func,
+                                      resource_version=self.store.resource_version,
+                                      timeout_seconds=self.timeout_seconds,
+                                      allow_watch_bookmarks=True,
+                                      _request_timeout=self.timeout_seconds + WATCH_READ_SLACK_SECONDS)
+        try:
+            # The stream is lazy: the watch is connected once something arrives
+            for event in stream:
+                if not self.store.watching:
+                    self.store.watch_opened()
+                self.handle_event(event)
+                if self._stop.is_set():
+                    self._watcher.stop()
+                    break
+        finally:
+            self.store.watch_closed()
+
+    def run(self):
+        """
+        Lists and watches until stopped, relisting when the resourceVersion
+        has expired (410 Gone) and backing off on other failures.
+        """
+        while not self._stop.is_set():
+            try:
+                if not self.store.synced:
+                    self.list_and_replace()
+                self.watch_once()
+            except k8s_client.ApiException as e:
+                if e.status == 410:
+                    logging.info("Informer for %s resourceVersion expired, relisting", self.resource)
+                    self.store.synced = False
+                    continue
+                logging.error("Informer for %s failed: %s", self.resource, e.reason)
+                self.store.synced = False
+                self._stop.wait(RETRY_BACKOFF_SECONDS)
+            except Exception as e:
+                logging.error("Informer for %s failed: %s", self.resource, e)
+                self.store.synced = False
+                self._stop.wait(RETRY_BACKOFF_SECONDS)
+
+    def start(self):
+        """
+        Starts the informer on a daemon thread.
+        """
+        self._thread = threading.Thread(target=self.run, name=f"informer-{self.resource}", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        """
+        Signals the informer to stop after the current watch event.
+        """
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.stop()
+
+    def wait_for_sync(self, timeout=None):
+        """
+        Blocks until the initial list has completed. Returns True on success.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.store.synced:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+
+def start_informer(resource, list_func, **kwargs):
+    """
+    Creates, registers and starts an informer for a resource type.
+    """
+    informer = Informer(resource, list_func, **kwargs)
+    _informers[resource] = informer
+    informer.start()
+    return informer
+
+
+def stop_informers():
+    """
+    Stops and unregisters every running informer.
+    """
+    for informer in _informers.values():
+        informer.stop()
+    _informers.clear()
+
+
+def get_informer(resource):
+    """
+    Returns the running informer of a resource type, or None.
+    """
+    return _informers.get(resource)
+
+
+def get_store(resource, max_staleness=None):
+    """
+    Returns the synced store for a resource, or None if there is no informer,
+    it has not synced yet, or it is older than `max_staleness` seconds.
+    """
+    informer = _informers.get(resource)
+    if informer is None or not informer.store.synced:
+        return None
+    if max_staleness is not None and informer.store.staleness() > max_staleness:
+        return None
+    return informer.store
+
+
+def informer_status():
+    """
+    Reports sync state and staleness for every registered informer.
+    """
+    status = {}
+    for resource, informer in _informers.items():
+        staleness = informer.store.staleness()
+        status[resource] = {
+            'synced': informer.store.synced,
+            'resource_version': informer.store.resource_version,
+            'objects': len(informer.store.list()),
+            'watching': informer.store.watching,
+            'staleness_seconds': round(staleness, 3) if staleness is not None else None
+        }
+    return status
+
+
+def informers_synced():
+    """
+    Returns True once every registered informer has completed its initial list.
+    """
+    return all(informer.initial_sync_done for informer in _informers.values())
@@ -0,0 +1,183 @@
+import functools
+import os
+import socket
+import threading
+import time
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+import metrics
+
+# Connections kept per API server host. Should cover the executor threads plus
+# one long-lived connection per running informer watch.
+K8S_POOL_SIZE = int(os.getenv("K8S_POOL_SIZE", "64"))
+
+# Default per-call timeouts in seconds, applied when a call sets none
+K8S_CONNECT_TIMEOUT = float(os.getenv("K8S_CONNECT_TIMEOUT", "5"))
+K8S_READ_TIMEOUT = float(os.getenv("K8S_READ_TIMEOUT", "30"))
+
+# Retries of idempotent calls on connection errors, 429 and 5xx responses,
+# with exponential backoff (honouring Retry-After) capped at K8S_RETRY_BACKOFF_MAX
+K8S_RETRIES = int(os.getenv("K8S_RETRIES", "3"))
+K8S_RETRY_BACKOFF = float(os.getenv("K8S_RETRY_BACKOFF", "0.5"))
+K8S_RETRY_BACKOFF_MAX = float(os.getenv("K8S_RETRY_BACKOFF_MAX", "10"))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# TCP keep-alive on pooled connections so idle ones are not silently dropped by load balancers
+K8S_TCP_KEEPALIVE = os.getenv("K8S_TCP_KEEPALIVE", "1") == "1"
+
+
+# The process-wide ApiClient, created on first use
+_api_client = None
+_api_client_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def _timeout_api_client_class():
+    # Defined on first use: the Kubernetes SDK takes about half a second to
+    # import, which should not be paid by importing this module
+    from kubernetes import client
+
+    class TimeoutApiClient(client.ApiClient):
+        """
+        ApiClient that applies a default (connect, read) timeout to every call
+        that does not pass its own `_request_timeout`. Watches and followed log
+        streams are meant to stay open and are left without a read timeout.
+        """
+
+        def __init__(self, configuration=None, request_timeout=None):
+            super().__init__(configuration)
+            self.request_timeout = request_timeout
+
+        def call_api(self, resource_path, method, path_params=None, query_params=None, *args, **kwargs):
+            if (kwargs.get('_request_timeout') is None and self.request_timeout
+                    and not _is_open_stream(query_params)):
+                kwargs['_request_timeout'] = self.request_timeout
+            resource, verb = describe_call(resource_path, method, query_params)
+            start = time.perf_counter()
+            try:
+                return super().call_api(resource_path, method, path_params, query_params, *args, **kwargs)
+            except client.exceptions.ApiException as e:
+                metrics.K8S_REQUEST_ERRORS_TOTAL.inc(resource=resource, verb=verb, status=e.status)
+                raise
+            except Exception:
+                metrics.K8S_REQUEST_ERRORS_TOTAL.inc(resource=resource, verb=verb, status='error')
+                raise
+            finally:
+                metrics.K8S_REQUEST_SECONDS.observe(time.perf_counter() - start, resource=resource, verb=verb)
+
+    return TimeoutApiClient
+
+
+def __getattr__(name):
+    # k8s_client.TimeoutApiClient and k8s_client.ApiException import the SDK when first accessed
+    if name == 'TimeoutApiClient':
+        return _timeout_api_client_class()
+    if name == 'ApiException':
+        from kubernetes.client.exceptions import ApiException
+        return ApiException
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _is_open_stream(query_params):
+    return any(key in ('watch', 'follow') and value for key, value in query_params or [])
+
+
+def describe_call(resource_path, method, query_params=None):
+    """
+    Returns the (resource, verb) of an API call in Kubernetes terms, e.g.
+    ('pods', 'list'), ('pods/log', 'get') or ('deployments', 'watch').
+    """
+    segments = resource_path.strip('/').split('/')
+    # Drop the /api/v1 or /apis/{group}/{version} prefix and the namespace scope
+    segments = segments[2:] if segments[0] == 'api' else segments[3:]
+    if len(segments) > 2 and segments[0] == 'namespaces':
+        segments = segments[2:]
+    resource = '/'.join(segments[:1] + segments[2:3])
+    if dict(query_params or []).get('watch'):
+        verb = 'watch'
+    elif method == 'GET':
+        verb = 'get' if len(segments) > 1 else 'list'
+    else:
+        verb = method.lower()
+    return resource or 'unknown', verb
+
+
+def load_configuration():
+    """
+    Loads the kubeconfig, or the in-cluster configuration when there is none,
+    and returns a copy with the pool and retry settings applied.
+    """
+    from kubernetes import client, config
+    try:
+        config.load_kube_config()
+    except:
+        config.load_incluster_config()
+
+    configuration = client.Configuration.get_default_copy()
+    configuration.connection_pool_maxsize = K8S_POOL_SIZE
+    configuration.retries = Retry(total=K8S_RETRIES, backoff_factor=K8S_RETRY_BACKOFF,
+                                  backoff_max=K8S_RETRY_BACKOFF_MAX, status_forcelist=RETRY_STATUSES,
+                                  allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+                                  respect_retry_after_header=True, raise_on_status=False)
+    return configuration
+
+
+def create_api_client(configuration=None):
+    """
+    Creates the ApiClient shared by all typed API objects, so that they reuse
+    one connection pool per API server host.
+    """
+    api_client = _timeout_api_client_class()(configuration or load_configuration(),
+                                             request_timeout=(K8S_CONNECT_TIMEOUT, K8S_READ_TIMEOUT))
+    if K8S_TCP_KEEPALIVE:
+        # Pools are created lazily, so options set here apply to every host's pool
+        api_client.rest_client.pool_manager.connection_pool_kw['socket_options'] = (
+            HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)])
+    return api_client
+
+
+def get_api_client():
+    """
+    Returns the process-wide ApiClient, loading the configuration and
+    creating it on first use.
+    """
+    global _api_client
+    if _api_client is None:
+        with _api_client_lock:
+            if _api_client is None:
+                _api_client = create_api_client()
+    return _api_client
+
+
+def set_api_client(api_client):
+    """
+    Injects the ApiClient to use instead of one created from the kubeconfig,
+    e.g. a client pointed at a test server. None resets to the default.
+    """
+    global _api_client
+    with _api_client_lock:
+        _api_client = api_client
+
+
+def pool_stats(api_client):
+    """
+    Reports connection pool utilization per API server host: pool size,
+    connections opened so far, connections checked out, idle connections and
+    requests served.
+    """
+    stats = {}
+    pools = api_client.rest_client.pool_manager.pools
+    for key in list(pools.keys()):
+        pool = pools.get(key)
+        if pool is None:
+            continue
+        # The pool queue holds idle connections plus None placeholders for unopened slots
+        queued = list(pool.pool.queue) if pool.pool is not None else []
+        stats[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+            'max_size': pool.pool.maxsize if pool.pool is not None else 0,
+            'connections_opened': pool.num_connections,
+            'in_use': (pool.pool.maxsize - len(queued)) if pool.pool is not None else 0,
+            'idle': sum(1 for conn in queued if conn is not None),
+            'requests': pool.num_requests
+        }
+    return stats
@@ -1,32 +1,396 @@
+import asyncio
+import contextvars
+import itertools
+import os
 import re
-from kubernetes import client, config
-
-# Load Kubernetes configuration
-try:
-    config.load_kube_config()
-except:
-    config.load_incluster_config()
-
-# Initialize API clients
-v1 = client.CoreV1Api()
-apps_v1 = client.AppsV1Api()
-batch_v1 = client.BatchV1Api()
-rbac_v1 = client.RbacAuthorizationV1Api()
-networking_v1 = client.NetworkingV1Api()
-
-# Mappings with pluralized resource names
-resource_api_mapping = {
-    'pods': v1,
-    'deployments': apps_v1,
-    'services': v1,
-    'nodes': v1,
-    'namespaces': v1,
-    'jobs': batch_v1,
-    'cronjobs': batch_v1,
-    'ingresses': networking_v1,
-    'events': v1
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib3.exceptions import ReadTimeoutError
+import aggregates
+import event_buffer
+import informer
+import k8s_client
+import metrics
+import paging
+import query_engine
+import relations
+import snapshot
+from resource_registry import ResourceType, camel_case, custom_resource_type, parse_custom_resources
+from result_cache import ResultCache, parse_ttls
+
+class KubernetesApis:
+    """
+    The typed API objects and the resource registry of the executor, all
+    built on one shared, pooled ApiClient.
+    """
+
+    def __init__(self, api_client):
+        from kubernetes import client
+        self.api_client = api_client
+        self.v1 = v1 = client.CoreV1Api(api_client)
+        self.apps_v1 = apps_v1 = client.AppsV1Api(api_client)
+        self.batch_v1 = batch_v1 = client.BatchV1Api(api_client)
+        self.rbac_v1 = client.RbacAuthorizationV1Api(api_client)
+        self.networking_v1 = networking_v1 = client.NetworkingV1Api(api_client)
+        self.custom = client.CustomObjectsApi(api_client)
+
+        # Registry of supported resource types, keyed by pluralized resource name
+        self.resources = {resource_type.name: resource_type for resource_type in (
+            ResourceType('pods', '/api/v1', 'Pod',
+                         list_all=v1.list_pod_for_all_namespaces,
+                         list_namespaced=lambda namespace: v1.list_namespaced_pod(namespace=namespace),
+                         read=lambda name, namespace: v1.read_namespaced_pod(name=name, namespace=namespace),
+                         describe=get_pod_info),
+            ResourceType('deployments', '/apis/apps/v1', 'Deployment',
+                         list_all=apps_v1.list_deployment_for_all_namespaces,
+                         list_namespaced=lambda namespace: apps_v1.list_namespaced_deployment(namespace=namespace),
+                         read=lambda name, namespace: apps_v1.read_namespaced_deployment(name=name,
+                                                                                         namespace=namespace),
+                         describe=get_deployment_info),
+            ResourceType('services', '/api/v1', 'Service',
+                         list_all=v1.list_service_for_all_namespaces,
+                         list_namespaced=lambda namespace: v1.list_namespaced_service(namespace=namespace),
+                         read=lambda name, namespace: v1.read_namespaced_service(name=name, namespace=namespace),
+                         describe=get_service_info),
+            ResourceType('nodes', '/api/v1', 'Node', namespaced=False,
+                         list_all=v1.list_node,
+                         list_namespaced=lambda namespace: v1.list_node(),
+                         read=lambda name, namespace: v1.read_node(name=name),
+                         describe=get_node_info, get=get_nodes),
+            ResourceType('namespaces', '/api/v1', 'Namespace', namespaced=False, simplify_names=False,
+                         list_all=v1.list_namespace,
+                         list_namespaced=lambda namespace: v1.list_namespace(),
+                         read=lambda name, namespace: v1.read_namespace(name=name),
+                         describe=get_namespace_info, get=get_namespaces),
+            ResourceType('replicasets', '/apis/apps/v1', 'ReplicaSet',
+                         list_all=apps_v1.list_replica_set_for_all_namespaces,
+                         list_namespaced=lambda namespace: apps_v1.list_namespaced_replica_set(namespace=namespace),
+                         read=lambda name, namespace: apps_v1.read_namespaced_replica_set(name=name,
+                                                                                          namespace=namespace),
+                         describe=get_replicaset_info),
+            ResourceType('endpoints', '/api/v1', 'Endpoints',
+                         list_all=v1.list_endpoints_for_all_namespaces,
+                         list_namespaced=lambda namespace: v1.list_namespaced_endpoints(namespace=namespace),
+                         read=lambda name, namespace: v1.read_namespaced_endpoints(name=name, namespace=namespace),
+                         describe=get_endpoints_info),
+            ResourceType('jobs', '/apis/batch/v1', 'Job',
+                         list_all=batch_v1.list_job_for_all_namespaces,
+                         list_namespaced=lambda namespace: batch_v1.list_namespaced_job(namespace=namespace),
+                         read=lambda name, namespace: batch_v1.read_namespaced_job(name=name, namespace=namespace),
+                         describe=get_job_info),
+            ResourceType('cronjobs', '/apis/batch/v1', 'CronJob',
+                         list_all=batch_v1.list_cron_job_for_all_namespaces,
+                         list_namespaced=lambda namespace: batch_v1.list_namespaced_cron_job(namespace=namespace),
+                         read=lambda name, namespace: batch_v1.read_namespaced_cron_job(name=name,
+                                                                                        namespace=namespace),
+                         describe=get_cronjob_info),
+            ResourceType('ingresses', '/apis/networking.k8s.io/v1', 'Ingress',
+                         list_all=networking_v1.list_ingress_for_all_namespaces,
+                         list_namespaced=lambda namespace: networking_v1.list_namespaced_ingress(namespace=namespace),
+                         read=lambda name, namespace: networking_v1.read_namespaced_ingress(name=name,
+                                                                                            namespace=namespace),
+                         describe=get_ingress_info),
+            # Event questions are answered by handle_event_action
+            ResourceType('events', '/api/v1', 'Event',
+                         list_all=v1.list_event_for_all_namespaces)
+        )}
+        for plural, group, version, namespaced, kind in custom_resources:
+            self.resources[plural] = custom_resource_type(self.custom, plural, group, version, namespaced, kind,
+                                                          describe=get_custom_object_info)
+
+
+_apis = None
+
+def apis() -> KubernetesApis:
+    """
+    Returns the API objects for the current shared ApiClient. They are built
+    on first use, so importing this module neither imports the Kubernetes SDK
+    nor loads the kubeconfig; inject a client with k8s_client.set_api_client.
+    """
+    global _apis
+    api_client = k8s_client.get_api_client()
+    if _apis is None or _apis.api_client is not api_client:
+        _apis = KubernetesApis(api_client)
+    return _apis
+
+def resource_type(resource):
+    """
+    Returns the registry entry of a resource type, or None if it is not supported.
+    """
+    return apis().resources.get(resource)
+
+# Custom resources served through CustomObjectsApi, as "plural.group/version"
+# (":cluster" appended for cluster-scoped types), e.g.
+# "certificates.cert-manager.io/v1,clusterissuers.cert-manager.io/v1:cluster"
+custom_resources = parse_custom_resources(os.getenv("K8S_CUSTOM_RESOURCES", ""))
+
+def register_custom_resource(plural, group, version, namespaced=True, kind=None):
+    """
+    Adds a custom resource type to the registry, so queries about it are
+    answered like those about built-in types, with the same caches, informers
+    and paged lists. The kind is looked up through discovery unless given.
+    """
+    custom_resources.append((plural, group, version, namespaced, kind))
+    if _apis is not None:
+        _apis.resources[plural] = custom_resource_type(_apis.custom, plural, group, version, namespaced, kind,
+                                                       describe=get_custom_object_info)
+
+# Lists prefetched for the batch being executed, keyed by (resource, namespace)
+_prefetched = contextvars.ContextVar('prefetched', default=None)
+
+# Objects read while executing an action, recorded for result cache revalidation
+_observed = contextvars.ContextVar('observed', default=None)
+
+# Set when the answer of the action being executed says how old its data is.
+# Such answers are not cached, as the age would be served unchanged later;
+# they come from in-memory indexes, so recomputing them is cheap
+_dated = contextvars.ContextVar('dated', default=False)
+
+# Cache of executed action answers. Resources missing from RESULT_CACHE_TTLS,
+# and log actions, are never cached. RESULT_CACHE_PATH adds a SQLite tier
+# shared by worker processes.
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "4096"))
+RESULT_CACHE_TTLS = parse_ttls(os.getenv(
+    "RESULT_CACHE_TTLS",
+    "nodes=30,namespaces=30,deployments=5,services=10,ingresses=10,cronjobs=10,jobs=5,pods=2"))
+result_cache = ResultCache(max_size=RESULT_CACHE_SIZE, ttls=RESULT_CACHE_TTLS,
+                           path=os.getenv("RESULT_CACHE_PATH") or None)
+
+# Answers that report a failure are never cached
+ERROR_ANSWER_PREFIXES = ("API Error:", "Failed to")
+
+# Namespace value of actions that span every namespace
+ALL_NAMESPACES = '*'
+
+# Group-by keys of aggregate queries: how to read the key from a raw JSON object
+# and from a client model object, and the resources the key applies to
+GROUP_BY_KEYS = {
+    'namespace': (lambda obj: obj['metadata'].get('namespace'), lambda obj: obj.metadata.namespace, None),
+    'phase': (lambda obj: (obj.get('status') or {}).get('phase'),
+              lambda obj: obj.status.phase if obj.status else None, {'pods'}),
+    'node': (lambda obj: (obj.get('spec') or {}).get('nodeName'),
+             lambda obj: obj.spec.node_name if obj.spec else None, {'pods'})
 }
 
+# Maximum age in seconds of informer data that may be served instead of a live API call.
+# A quiet watch is only refreshed by the API server's bookmarks, about once a minute
+INFORMER_MAX_STALENESS = float(os.getenv("INFORMER_MAX_STALENESS", "90"))
+
+# Bounded pool that runs the blocking Kubernetes calls for the async serving mode
+K8S_EXECUTOR_THREADS = int(os.getenv("K8S_EXECUTOR_THREADS", "64"))
+_executor_pool = ThreadPoolExecutor(max_workers=K8S_EXECUTOR_THREADS, thread_name_prefix="k8s")
+
+# Comma-separated resource types to serve from in-process informers, or "all"
+K8S_INFORMERS = os.getenv("K8S_INFORMERS", "")
+
+# Keep informer objects as compact snapshot records (see snapshot.py) built
+# from list and watch JSON, instead of full client model objects
+INFORMER_COMPACT = os.getenv("INFORMER_COMPACT", "1") == "1"
+
+# Comma-separated resource types without an informer whose aggregate index
+# (counts, phases, readiness) is rebuilt from a full list every AGGREGATE_REFRESH_SECONDS
+K8S_AGGREGATES = os.getenv("K8S_AGGREGATES", "")
+AGGREGATE_REFRESH_SECONDS = float(os.getenv("AGGREGATE_REFRESH_SECONDS", "30"))
+
+# List fields answered with a summary of all objects rather than their names
+SUMMARY_FIELDS = {
+    'pods': ('status', 'restart_count'),
+    'deployments': ('status', 'replicas'),
+    'nodes': ('status',)
+}
+
+# Keep an in-memory index of owner references and service endpoints (see
+# relations.py), starting informers for the resource types it needs, so
+# related-resource queries are answered without API calls
+K8S_RELATIONS = os.getenv("K8S_RELATIONS", "0") == "1"
+
+# Watch events into a bounded in-memory buffer (see event_buffer.py) that
+# answers event questions, keeping at most EVENT_BUFFER_PER_NAMESPACE events
+# per namespace and EVENT_BUFFER_MAX_EVENTS in total
+K8S_EVENT_BUFFER = os.getenv("K8S_EVENT_BUFFER", "0") == "1"
+EVENT_BUFFER_PER_NAMESPACE = int(os.getenv("EVENT_BUFFER_PER_NAMESPACE", "1000"))
+EVENT_BUFFER_MAX_EVENTS = int(os.getenv("EVENT_BUFFER_MAX_EVENTS", "50000"))
+
+# Most events listed in one answer, newest first
+EVENT_ANSWER_MAX_EVENTS = int(os.getenv("EVENT_ANSWER_MAX_EVENTS", "50"))
+
+# Maximum number of pod logs fetched concurrently for one job
+JOB_LOG_WORKERS = int(os.getenv("JOB_LOG_WORKERS", "8"))
+
+# Upper bounds for streamed pod logs: bytes read from the API server when the
+# request sets no limit_bytes, and seconds a follow=True stream stays open
+LOG_STREAM_MAX_BYTES = int(os.getenv("LOG_STREAM_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_FOLLOW_MAX_SECONDS = float(os.getenv("LOG_FOLLOW_MAX_SECONDS", "300"))
+
+# Upper bound for log answers that are returned as a single string
+LOG_ANSWER_MAX_BYTES = int(os.getenv("LOG_ANSWER_MAX_BYTES", str(1024 * 1024)))
+
+def start_configured_informers():
+    """
+    Starts the informers selected by the K8S_INFORMERS environment variable, if any.
+    """
+    if K8S_EVENT_BUFFER:
+        start_event_buffer()
+    if K8S_INFORMERS:
+        start_informers(None if K8S_INFORMERS == 'all' else [r.strip() for r in K8S_INFORMERS.split(',')])
+    if K8S_AGGREGATES:
+        start_aggregates([r.strip() for r in K8S_AGGREGATES.split(',')])
+    if K8S_RELATIONS:
+        start_relations()
+
+# Held while checking for and starting informers, so that concurrent callers
+# (subscriptions opened at the same time) start one informer per resource type
+_informers_lock = threading.Lock()
+
+def start_informers(resources=None):
+    """
+    Starts an informer for each resource type (every registered type by default)
+    that does not have one running.
+    Once synced, list and get actions for those resources are answered from memory,
+    counts and status summaries from an aggregate index kept current by its events,
+    and filtered, grouped and top-k questions from a columnar query engine index.
+    """
+    with _informers_lock:
+        _start_informers(resources)
+
+def _start_informers(resources):
+    registry = apis().resources
+    for resource in resources or registry:
+        entry = registry.get(resource)
+        if entry is None or entry.list_all is None or informer.get_informer(resource) is not None:
+            continue
+        if INFORMER_COMPACT and resource in snapshot.RECORD_TYPES:
+            started = informer.start_informer(
+                resource, entry.list_all, decode=snapshot.RECORD_TYPES[resource],
+                load=lambda entry=entry: snapshot.load_list(apis().api_client, entry.list_path(), entry.name))
+        else:
+            started = informer.start_informer(resource, entry.list_all, decode=entry.decode)
+        aggregates.attach(resource, started.store)
+        if resource in query_engine.COLUMNS:
+            query_engine.attach(resource, started.store)
+
+def start_event_buffer():
+    """
+    Starts an events informer that lists and watches into a bounded event
+    buffer, and registers the buffer for event questions.
+    """
+    entry = resource_type('events')
+    buffer = event_buffer.EventBuffer(EVENT_BUFFER_PER_NAMESPACE, EVENT_BUFFER_MAX_EVENTS)
+    informer.start_informer('events', entry.list_all, decode=snapshot.EventRecord, store=buffer,
+                            load=lambda: snapshot.load_list(apis().api_client, entry.list_path(), 'events'))
+    return event_buffer.attach(buffer)
+
+def start_relations():
+    """
+    Starts informers for the resource types the relation index needs, unless
+    they are running already, and attaches the index to their stores.
+    """
+    start_informers([resource for resource in relations.RELATION_RESOURCES if informer.get_informer(resource) is None])
+    relations.attach({resource: informer.get_informer(resource).store for resource in relations.RELATION_RESOURCES})
+
+def start_aggregates(resources):
+    """
+    Starts a periodically refreshed aggregate index for each resource type that has no informer.
+    """
+    for resource in resources:
+        entry = resource_type(resource)
+        if entry is not None and entry.list_all is not None and aggregates.get_index(resource) is None:
+            aggregates.start_refresh(resource, entry.list_all, AGGREGATE_REFRESH_SECONDS)
+
+def list_items(resource, namespace, fetch):
+    """
+    Returns the objects of a resource type in a namespace.
+    Served from the batch prefetch or the informer store when available, otherwise from fetch().
+    """
+    items = cached_items(resource, namespace)
+    return items if items is not None else fetch().items
+
+def cached_items(resource, namespace):
+    """
+    Returns the objects of a resource type in a namespace from the batch prefetch
+    or the informer store, or None if neither holds them.
+    """
+    prefetched = _prefetched.get()
+    scope = scope_of(resource, namespace)
+    if prefetched and (resource, scope) in prefetched:
+        metrics.K8S_LOOKUPS_TOTAL.inc(source='prefetch')
+        return prefetched[(resource, scope)]
+    store = informer.get_store(resource, INFORMER_MAX_STALENESS)
+    if store is None:
+        metrics.K8S_LOOKUPS_TOTAL.inc(source='api')
+        return None
+    metrics.K8S_LOOKUPS_TOTAL.inc(source='informer')
+    return store.list(scope)
+
+def scope_of(resource, namespace):
+    """
+    Returns the namespace objects of a resource type are looked up in: None for cluster-scoped types.
+    """
+    return apis().resources[resource].scope(namespace)
+
+def list_path(resource, namespace=None):
+    """
+    Returns the REST path of a resource's list endpoint, cluster-wide if namespace is None.
+    """
+    return apis().resources[resource].list_path(namespace)
+
+def list_names(resource, namespace):
+    """
+    Yields the names of a resource type in a namespace. Without cached objects,
+    names are streamed from paged, metadata-only list calls.
+    """
+    items = cached_items(resource, namespace)
+    if items is not None:
+        return (obj.metadata.name for obj in items)
+    return paging.iter_names(apis().api_client, list_path(resource, namespace))
+
+def count_items(resource, namespace):
+    """
+    Counts the objects of a resource type in a namespace. Without cached objects,
+    the count comes from paged, metadata-only list calls.
+    """
+    index = aggregates.get_index(resource, INFORMER_MAX_STALENESS)
+    if index is not None:
+        metrics.K8S_LOOKUPS_TOTAL.inc(source='index')
+        return index.value('count', scope_of(resource, namespace))
+    items = cached_items(resource, namespace)
+    if items is not None:
+        return len(items)
+    return paging.count_objects(apis().api_client, list_path(resource, namespace))
+
+def read_item(resource, name, namespace, fetch):
+    """
+    Returns a single object by name.
+    Served from the batch prefetch or the informer store when available, otherwise from fetch().
+    """
+    obj = _read_item(resource, name, namespace, fetch)
+    observed = _observed.get()
+    if observed is not None:
+        observed.append((resource, namespace, name, obj.metadata.resource_version))
+    return obj
+
+def _read_item(resource, name, namespace, fetch):
+    prefetched = _prefetched.get()
+    scope = scope_of(resource, namespace)
+    if prefetched and (resource, scope) in prefetched:
+        for obj in prefetched[(resource, scope)]:
+            if obj.metadata.name == name:
+                metrics.K8S_LOOKUPS_TOTAL.inc(source='prefetch')
+                return obj
+    store = informer.get_store(resource, INFORMER_MAX_STALENESS)
+    if store is None:
+        metrics.K8S_LOOKUPS_TOTAL.inc(source='api')
+        return fetch()
+    metrics.K8S_LOOKUPS_TOTAL.inc(source='informer')
+    obj = store.get(name, scope)
+    if obj is None:
+        e = k8s_client.ApiException(status=404, reason="Not Found")
+        e.body = f'{resource} "{name}" not found'
+        raise e
+    return obj
+
 def execute_action(mapped_action: dict) -> str:
     """
     Executes the action based on the mapped_action dictionary.
@@ -37,19 +401,35 @@ def execute_action(mapped_action: dict) -> str:
     target_name = mapped_action.get('target_name')
     namespace = mapped_action.get('namespace') or 'default'
     field = mapped_action.get('field')
-    related_to = mapped_action.get('related_to', {'resource': None, 'name': None})
+    related_to = mapped_action.get('related_to') or {'resource': None, 'name': None}
 
-    api_client = resource_api_mapping.get(resource)
-    if not api_client:
+    entry = resource_type(resource)
+    if entry is None:
         return f"Unsupported resource type: {resource}"
 
+    filters = mapped_action.get('filters') or {}
+    group_by = mapped_action.get('group_by')
+    if namespace == ALL_NAMESPACES and (action_type != 'list' or related_to.get('resource')):
+        return "Please specify a namespace for this query."
+
     try:
-        if action_type == 'get':
-            return handle_get_action(api_client, resource, target_name, namespace, field, related_to)
+        if resource == 'events' and action_type in ('get', 'list'):
+            return handle_event_action(target_name, namespace, related_to, filters)
+        elif action_type in ('get', 'list') and related_to.get('resource') and related_to.get('name'):
+            return handle_related_action(resource, related_to['resource'], related_to['name'], namespace, field)
+        elif action_type == 'get':
+            return handle_get_action(entry, target_name, namespace, field, related_to)
+        elif action_type == 'list' and mapped_action.get('query'):
+            return handle_query_action(resource, namespace, field, filters, mapped_action['query'])
+        elif action_type == 'list' and (namespace == ALL_NAMESPACES or filters or group_by):
+            return handle_aggregate_action(resource, namespace, field, filters, group_by)
         elif action_type == 'list':
-            return handle_list_action(api_client, resource, namespace, field)
+            return handle_list_action(entry, namespace, field)
         elif action_type == 'logs':
             if resource == 'pods' and target_name:
+                log_options = mapped_action.get('log_options')
+                if log_options:
+                    return get_filtered_pod_logs(target_name, namespace, log_options)
                 return get_pod_logs(target_name, namespace)
             elif resource == 'jobs' and target_name:
                 return get_logs_from_job(target_name, namespace)
@@ -57,148 +437,326 @@ def execute_action(mapped_action: dict) -> str:
                 return "Unsupported logs request."
         else:
             return "Unsupported action type."
-    except client.exceptions.ApiException as e:
+    except k8s_client.ApiException as e:
         return f"API Error: {e.reason} - {e.body}"
 
-def handle_list_action(api_client, resource, namespace, field):
+async def execute_action_async(mapped_action: dict, prefetched=None, cache_control=None) -> str:
+    """
+    Async variant of execute_with_prefetched. The blocking Kubernetes client calls
+    run on a bounded thread pool so the event loop stays free for other requests.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor_pool, execute_with_prefetched, mapped_action, prefetched,
+                                      cache_control)
+
+def execute_with_prefetched(mapped_action: dict, prefetched=None, cache_control=None) -> str:
+    """
+    Executes an action, answering list and get lookups from prefetched lists when possible.
+    Answers go through the result cache; cache_control takes Cache-Control style
+    directives ("no-cache", "max-age=N") to force or bound freshness.
+    """
+    def execute():
+        token = _prefetched.set(prefetched)
+        observed_token = _observed.set([])
+        dated_token = _dated.set(False)
+        try:
+            answer = execute_action(mapped_action)
+            observed = _observed.get()
+            dated = _dated.get()
+        finally:
+            _dated.reset(dated_token)
+            _observed.reset(observed_token)
+            _prefetched.reset(token)
+        # An answer built from a single object can be revalidated against its resourceVersion
+        validator = observed[0] if len(observed) == 1 and mapped_action.get('action_type') == 'get' else None
+        return answer, validator, not (dated or answer.startswith(ERROR_ANSWER_PREFIXES))
+
+    return result_cache.get_or_execute(mapped_action, execute, object_unchanged, cache_control)
+
+def object_unchanged(validator) -> bool:
+    """
+    Returns True if the object recorded by a result cache validator still has
+    the same resourceVersion. Checks the informer store when there is one,
+    otherwise reads only the object's metadata from the API server.
+    """
+    resource, namespace, name, resource_version = validator
+    entry = resource_type(resource)
+    if resource_version is None or entry is None:
+        return False
+    scope = entry.scope(namespace)
+    store = informer.get_store(resource, INFORMER_MAX_STALENESS)
+    try:
+        if store is not None:
+            obj = store.get(name, scope)
+            current = obj.metadata.resource_version if obj is not None else None
+        else:
+            metadata = paging.read_metadata(apis().api_client, f"{entry.list_path(scope)}/{name}")
+            current = metadata.get('resourceVersion')
+    except k8s_client.ApiException:
+        return False
+    return current == resource_version
+
+def prefetch_key(mapped_action: dict):
+    """
+    Returns the (resource, namespace) list that can answer a mapped action,
+    or None if the action needs a dedicated API call.
+    """
+    resource = mapped_action.get('resource')
+    related_to = mapped_action.get('related_to') or {}
+    entry = resource_type(resource)
+    if mapped_action.get('action_type') not in ('list', 'get') or entry is None or entry.list_namespaced is None:
+        return None
+    if related_to.get('resource') and related_to.get('name'):
+        return None
+    if mapped_action.get('filters') or mapped_action.get('group_by') or mapped_action.get('query'):
+        return None
+    namespace = mapped_action.get('namespace') or 'default'
+    if namespace == ALL_NAMESPACES and entry.namespaced:
+        return None
+    return (resource, entry.scope(namespace))
+
+def group_prefetch_keys(mapped_actions):
+    """
+    Returns the (resource, namespace) lists shared by two or more mapped actions.
+    A single action is cheaper to answer with its own list or read call.
+    """
+    counts = {}
+    for mapped_action in mapped_actions:
+        key = prefetch_key(mapped_action)
+        if key is not None:
+            counts[key] = counts.get(key, 0) + 1
+    return [key for key, count in counts.items() if count > 1]
+
+def prefetch_list(key):
+    """
+    Lists one (resource, namespace) pair. Returns None if the call fails so that
+    each action falls back to its own call and reports its own error.
+    """
+    resource, namespace = key
+    try:
+        return list_items(resource, namespace, lambda: apis().resources[resource].list_namespaced(namespace))
+    except k8s_client.ApiException:
+        return None
+
+def prefetch_lists(keys) -> dict:
+    """
+    Lists each (resource, namespace) pair once, concurrently.
+    """
+    results = _executor_pool.map(prefetch_list, keys)
+    return {key: items for key, items in zip(keys, results) if items is not None}
+
+async def prefetch_lists_async(keys) -> dict:
+    """
+    Async variant of prefetch_lists.
     """
-    Handles 'list' actions for different Kubernetes resources.
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*[loop.run_in_executor(_executor_pool, prefetch_list, key) for key in keys])
+    return {key: items for key, items in zip(keys, results) if items is not None}
+
+def handle_list_action(resource_type, namespace, field):
+    """
+    Handles 'list' actions for any registered resource type.
     If 'field' is 'count', returns the count as a string.
     Otherwise, returns a comma-separated list of resource names.
+    Counts and names come from paged, metadata-only list calls unless cached.
     """
-    if resource == 'pods':
-        pods = api_client.list_namespaced_pod(namespace=namespace)
-        if field == 'count':
-            return str(len(pods.items))  # Return total count as a string
-        pod_names = [simplify_name(pod.metadata.name) for pod in pods.items]
-        return ', '.join(pod_names) if pod_names else "No pods found."
-    
-    elif resource == 'deployments':
-        deployments = api_client.list_namespaced_deployment(namespace=namespace)
-        if field == 'count':
-            return str(len(deployments.items))  # Return total count as a string
-        deployment_names = [simplify_name(dep.metadata.name) for dep in deployments.items]
-        return ', '.join(deployment_names) if deployment_names else "No deployments found."
-    
-    elif resource == 'services':
-        services = api_client.list_namespaced_service(namespace=namespace)
-        if field == 'count':
-            return str(len(services.items))  # Return total count as a string
-        service_names = [simplify_name(svc.metadata.name) for svc in services.items]
-        return ', '.join(service_names) if service_names else "No services found."
-    
-    elif resource == 'nodes':
-        nodes = api_client.list_node()
-        if field == 'count':
-            return str(len(nodes.items))  # Return total count as a string
-        node_names = [simplify_name(node.metadata.name) for node in nodes.items]
-        return ', '.join(node_names) if node_names else "No nodes found."
-    
-    elif resource == 'jobs':
-        jobs = api_client.list_namespaced_job(namespace=namespace)
-        if field == 'count':
-            return str(len(jobs.items))  # Return total count as a string
-        job_names = [simplify_name(job.metadata.name) for job in jobs.items]
-        return ', '.join(job_names) if job_names else "No jobs found."
-    
-    elif resource == 'cronjobs':
-        cronjobs = api_client.list_namespaced_cron_job(namespace=namespace)
-        if field == 'count':
-            return str(len(cronjobs.items))  # Return total count as a string
-        cronjob_names = [simplify_name(cj.metadata.name) for cj in cronjobs.items]
-        return ', '.join(cronjob_names) if cronjob_names else "No cronjobs found."
-    
-    elif resource == 'ingresses':
-        ingresses = api_client.list_namespaced_ingress(namespace=namespace)
-        if field == 'count':
-            return str(len(ingresses.items))  # Return total count as a string
-        ingress_names = [simplify_name(ing.metadata.name) for ing in ingresses.items]
-        return ', '.join(ingress_names) if ingress_names else "No ingresses found."
-    
-    elif resource == 'namespaces':
-        namespaces = api_client.list_namespace()
-        if field == 'count':
-            return str(len(namespaces.items))  # Return total count as a string
-        namespace_names = [ns.metadata.name for ns in namespaces.items]
-        return ', '.join(namespace_names) if namespace_names else "No namespaces found."
-    
-    else:
-        return f"Unsupported resource type: {resource}"
+    resource = resource_type.name
+    if field in SUMMARY_FIELDS.get(resource, ()):
+        return summarize_resource(resource, namespace, field)
+    if field == 'count':
+        return str(count_items(resource, namespace))  # Return total count as a string
+    names = list_names(resource, namespace)
+    names = [simplify_name(name) for name in names] if resource_type.simplify_names else list(names)
+    return ', '.join(names) if names else f"No {resource} found."
 
-def handle_get_action(api_client, resource, name, namespace, field, related_to):
+def handle_aggregate_action(resource, namespace, field, filters, group_by):
     """
-    Handles 'get' actions for different Kubernetes resources.
-    Returns specific information based on the field.
+    Answers list and count queries across all namespaces, with label/field
+    selectors or grouped by namespace, phase or node, in a single pass over
+    paged list responses. Selectors are applied by the API server.
     """
-    if resource == 'pods':
-        if related_to['resource'] and related_to['name']:
-            return get_pods_by_related_resource(related_to['resource'], related_to['name'], namespace)
-        if name:
-            pod = api_client.read_namespaced_pod(name=name, namespace=namespace)
-            return get_pod_info(pod, field)
-        else:
-            return "Pod name not specified."
+    if group_by and group_by not in GROUP_BY_KEYS:
+        return f"Unsupported grouping: {group_by}"
+    from_json, from_model, group_resources = GROUP_BY_KEYS.get(group_by, (None, None, None))
+    if group_resources and resource not in group_resources:
+        return f"Grouping by {group_by} is not supported for {resource}."
+    entry = resource_type(resource)
+    if entry is None:
+        return f"Unsupported resource type: {resource}"
 
-    elif resource == 'deployments':
-        if name:
-            deployment = api_client.read_namespaced_deployment(name=name, namespace=namespace)
-            # Check if field relates to containers
-            if field in ['containers', 'container_names']:
-                return get_deployment_containers(deployment)
-            return get_deployment_info(deployment, field)
-        else:
-            return "Deployment name not specified."
+    scope = None if namespace == ALL_NAMESPACES else namespace
+    qualify = scope is None and entry.namespaced
+    counts = Counter()
+    names = []
 
-    elif resource == 'services':
-        if name:
-            service = api_client.read_namespaced_service(name=name, namespace=namespace)
-            return get_service_info(service, field)
+    # Counts without selectors come straight from the aggregate index
+    index = None
+    if not filters and field == 'count' and group_by in (None, 'namespace', 'phase'):
+        index = aggregates.get_index(resource, INFORMER_MAX_STALENESS)
+    if index is not None:
+        metrics.K8S_LOOKUPS_TOTAL.inc(source='index')
+        if group_by is None:
+            return str(index.value('count', scope))
+        if group_by == 'namespace':
+            counts.update({ns: n for ns, n in index.counts_by_namespace().items() if scope in (None, ns)})
         else:
-            return "Service name not specified."
+            counts.update(index.groups(group_by, scope))
+        items = []
+    else:
+        # Without selectors the informer store holds everything needed
+        items = None if filters else cached_items(resource, scope)
+    if items is not None:
+        for obj in items:
+            if group_by:
+                counts[from_model(obj) or '<none>'] += 1
+            else:
+                names.append(f"{obj.metadata.namespace}/{obj.metadata.name}" if qualify else obj.metadata.name)
+    elif field == 'count' and not group_by:
+        return str(paging.count_objects(apis().api_client, list_path(resource, scope),
+                                        label_selector=filters.get('label_selector'),
+                                        field_selector=filters.get('field_selector')))
+    else:
+        # Phase and node live outside metadata, so only namespace grouping can use metadata-only lists
+        pages = paging.iter_list_pages(apis().api_client, list_path(resource, scope),
+                                       metadata_only=group_by in (None, 'namespace'),
+                                       label_selector=filters.get('label_selector'),
+                                       field_selector=filters.get('field_selector'))
+        for page in pages:
+            for obj in page.get('items') or []:
+                if group_by:
+                    counts[from_json(obj) or '<none>'] += 1
+                else:
+                    metadata = obj['metadata']
+                    names.append(f"{metadata.get('namespace')}/{metadata['name']}" if qualify else metadata['name'])
 
-    elif resource == 'nodes':
-        if name:
-            node = api_client.read_node(name=name)
-            return get_node_info(node, field)
-        else:
-            return get_node_count(api_client)
+    if group_by:
+        if not counts:
+            return f"No {resource} found."
+        groups = ', '.join(f"{key}: {count}" for key, count in sorted(counts.items(), key=lambda kv: (-kv[1], kv[0])))
+        return f"{groups} (total {sum(counts.values())})"
+    if field == 'count':
+        return str(len(names))
+    return ', '.join(names) if names else f"No {resource} found."
 
-    elif resource == 'namespaces':
-        if name:
-            ns = api_client.read_namespace(name=name)
-            return get_namespace_info(ns, field)
-        else:
-            return list_namespaces(api_client)
+def handle_query_action(resource, namespace, field, filters, query):
+    """
+    Answers filtered, grouped and top-k list questions about pods, deployments
+    and nodes with the query engine, vectorized over a columnar index kept
+    current by the informer or built from one paged list. Plain counts with
+    no index fall back to handle_aggregate_action.
+    """
+    where, group_by, limit = query.get('where'), query.get('group_by'), query.get('limit')
+    selectors = {key: filters[key] for key in ('label_selector', 'field_selector') if filters.get(key)}
+    scope = None if namespace == ALL_NAMESPACES else scope_of(resource, namespace)
+    index = None if selectors else query_engine.get_index(resource, INFORMER_MAX_STALENESS)
+    if index is None and query['metric'] == 'count' and not where and not limit and group_by in GROUP_BY_KEYS:
+        return handle_aggregate_action(resource, namespace, field, selectors, group_by)
+    if index is None:
+        metrics.K8S_LOOKUPS_TOTAL.inc(source='api')
+        records, _ = snapshot.load_list(apis().api_client, list_path(resource, scope), resource, **selectors)
+        index = query_engine.from_items(resource, records)
+    else:
+        metrics.K8S_LOOKUPS_TOTAL.inc(source='index')
 
-    elif resource == 'jobs':
-        if name:
-            job = api_client.read_namespaced_job(name=name, namespace=namespace)
-            return get_job_info(job, field)
-        else:
-            return "Job name not specified."
+    try:
+        predicates = query_engine.parse_where(where) if where else []
+        rows, total = index.query(predicates, group_by, query['metric'], query.get('column'),
+                                  limit=limit, namespace=scope)
+    except ValueError as e:
+        return f"Unsupported query: {e}"
 
-    elif resource == 'cronjobs':
-        if name:
-            cronjob = api_client.read_namespaced_cron_job(name=name, namespace=namespace)
-            return get_cronjob_info(cronjob, field)
-        else:
-            return "CronJob name not specified."
+    if group_by:
+        if not rows:
+            return f"No {resource} found."
+        return f"{', '.join(f'{key}: {value}' for key, value in rows)} (total {total})"
+    if query['metric'] == 'count':
+        return str(total)
+    if query['metric'] == 'sum':
+        _, count = index.query(predicates, namespace=scope)
+        if not count:
+            return f"No {resource} found."
+        return f"{total} {query['column'].replace('_', ' ')} across {count} {resource}"
+    if not rows:
+        return f"No {resource} found."
+    answer = ', '.join(name if value is None else f"{name}: {value}" for name, value in rows)
+    return answer + (f" (top {len(rows)} of {total})" if len(rows) < total else '')
 
-    elif resource == 'ingresses':
-        if name:
-            ingress = api_client.read_namespaced_ingress(name=name, namespace=namespace)
-            return get_ingress_info(ingress, field)
+def summarize_resource(resource, namespace, field):
+    """
+    Answers status, restart and replica questions about all objects of a
+    resource type in a namespace (or cluster-wide for nodes). Totals come from
+    the aggregate index in O(1) when one is current, otherwise from one list.
+    """
+    entry = resource_type(resource)
+    scope = None if namespace == ALL_NAMESPACES else entry.scope(namespace)
+    index = aggregates.get_index(resource, INFORMER_MAX_STALENESS)
+    freshness = ''
+    if index is not None:
+        metrics.K8S_LOOKUPS_TOTAL.inc(source='index')
+        totals = index.totals(scope)
+        phases = index.groups('phase', scope)
+        freshness = f" (as of {index.staleness():.0f}s ago)"
+        _dated.set(True)
+    else:
+        if scope is None:
+            items = list_items(resource, None, entry.list_all)
         else:
-            return "Ingress name not specified."
+            items = list_items(resource, scope, lambda: entry.list_namespaced(scope))
+        summary = aggregates.summarize(resource, items)
+        totals = summary.totals()
+        phases = summary.groups('phase')
 
-    elif resource == 'events':
-        if name:
-            return get_pod_events(name, namespace)
-        else:
-            return "Pod name not specified for event retrieval."
+    count = totals.get('count', 0)
+    if not count:
+        return f"No {resource} found."
+    if resource == 'pods' and field == 'restart_count':
+        answer = f"{totals.get('restarts', 0)} restarts across {count} pods"
+    elif resource == 'pods':
+        answer = ', '.join(f"{phase}: {n}" for phase, n in sorted(phases.items(), key=lambda kv: (-kv[1], kv[0])))
+    elif resource == 'deployments' and field == 'replicas':
+        answer = f"{totals.get('available_replicas', 0)} of {totals.get('desired_replicas', 0)} replicas available"
+    elif resource == 'deployments':
+        answer = f"{totals.get('available', 0)} of {count} deployments available"
+    else:
+        answer = f"{totals.get('ready', 0)} of {count} nodes Ready"
+    return answer + freshness
 
+def handle_get_action(resource_type, name, namespace, field, related_to):
+    """
+    Handles 'get' actions for any registered resource type.
+    Returns specific information based on the field.
+    """
+    if resource_type.get is not None:
+        return resource_type.get(resource_type, name, namespace, field, related_to)
+    return get_named_object(resource_type, name, namespace, field)
+
+def get_named_object(resource_type, name, namespace, field):
+    """
+    Reads one object by name and answers the field asked about it.
+    """
+    if not name:
+        return f"{resource_type.kind} name not specified."
+    obj = read_item(resource_type.name, name, namespace, lambda: resource_type.read(name, namespace))
+    return resource_type.describe(obj, field)
+
+def get_nodes(resource_type, name, namespace, field, related_to):
+    """
+    Answers a get action about nodes. Without a name, answers for all nodes.
+    """
+    if name:
+        return get_named_object(resource_type, name, namespace, field)
+    elif field == 'status':
+        return summarize_resource('nodes', namespace, field)
     else:
-        return f"Unsupported resource type: {resource}"
+        return get_node_count()
+
+def get_namespaces(resource_type, name, namespace, field, related_to):
+    """
+    Answers a get action about namespaces. Without a name, lists them.
+    """
+    if name:
+        return get_named_object(resource_type, name, namespace, field)
+    return list_namespaces()
 
 def get_pod_info(pod, field):
     """
@@ -211,7 +769,7 @@ def get_pod_info(pod, field):
     elif field == 'node':
         return pod.spec.node_name
     elif field == 'restart_count':
-        restart_count = sum(cs.restart_count for cs in pod.status.container_statuses)
+        restart_count = sum(cs.restart_count for cs in pod.status.container_statuses or [])
         return str(restart_count)
     elif field == 'container_count':
         return str(len(pod.spec.containers))
@@ -225,7 +783,9 @@ def get_deployment_info(deployment, field):
     """
     Retrieves specific information from a deployment based on the field.
     """
-    if field == 'replicas':
+    if field in ['containers', 'container_names']:
+        return get_deployment_containers(deployment)
+    elif field == 'replicas':
         return str(deployment.spec.replicas)
     elif field == 'labels':
         return format_labels(deployment.metadata.labels)
@@ -233,7 +793,7 @@ def get_deployment_info(deployment, field):
         images = [container.image for container in deployment.spec.template.spec.containers]
         return ', '.join(images)
     elif field == 'status':
-        conditions = deployment.status.conditions
+        conditions = deployment.status.conditions or []
         for condition in conditions:
             if condition.type == 'Available':
                 return condition.status
@@ -350,6 +910,54 @@ def get_ingress_info(ingress, field):
         hosts = [rule.host for rule in ingress.spec.rules]
         return f"Ingress '{simplify_name(ingress.metadata.name)}' has hosts '{', '.join(hosts)}'."
 
+def get_replicaset_info(replicaset, field):
+    """
+    Retrieves specific information from a replicaset based on the field.
+    """
+    if field == 'replicas':
+        return str(replicaset.spec.replicas)
+    elif field == 'labels':
+        return format_labels(replicaset.metadata.labels)
+    else:
+        # Default response if field is not specifically handled
+        ready_replicas = replicaset.status.ready_replicas or 0
+        return f"ReplicaSet '{replicaset.metadata.name}' has {ready_replicas} ready replicas."
+
+def get_endpoints_info(endpoints, field):
+    """
+    Retrieves the addresses of an endpoints object, with the pods behind them.
+    """
+    if field == 'labels':
+        return format_labels(endpoints.metadata.labels)
+    addresses = [f"{address.ip} ({address.target_ref.name})" if address.target_ref else address.ip
+                 for subset in endpoints.subsets or [] for address in subset.addresses or []]
+    return ', '.join(addresses) if addresses else "No ready addresses."
+
+def get_custom_object_info(obj, field):
+    """
+    Retrieves specific information from a custom resource object based on the
+    field, read from its spec or status by name.
+    """
+    status = obj.status or {}
+    ready = next((condition.get('status') for condition in status.get('conditions') or []
+                  if condition.get('type') == 'Ready'), None)
+    value = None
+    if field:
+        value = next((part.get(camel_case(field)) for part in (obj.spec or {}, status)
+                      if part.get(camel_case(field)) is not None), None)
+    if field == 'labels':
+        return format_labels(obj.metadata.labels)
+    elif field == 'status':
+        return ready or status.get('phase') or "Unknown"
+    elif isinstance(value, list):
+        return ', '.join(str(item) for item in value)
+    elif value is not None:
+        return str(value)
+    else:
+        # Default response if field is not specifically handled
+        state = f"Ready={ready}" if ready else status.get('phase') or 'Unknown'
+        return f"{obj.kind} '{simplify_name(obj.metadata.name)}' status is '{state}'."
+
 def get_deployment_containers(deployment):
     """
     Retrieves container names from a deployment.
@@ -357,99 +965,321 @@ def get_deployment_containers(deployment):
     container_names = [container.name for container in deployment.spec.template.spec.containers]
     return ', '.join(container_names) if container_names else "No containers found in the deployment."
 
-def get_node_count(api_client):
+def get_node_count():
     """
     Retrieves the count of nodes in the cluster.
     """
-    nodes = api_client.list_node()
-    return str(len(nodes.items))
+    return str(count_items('nodes', None))
 
 def get_pod_logs(pod_name, namespace):
     """
     Retrieves logs from a specific pod.
     """
     try:
-        logs = v1.read_namespaced_pod_log(name=pod_name, namespace=namespace, tail_lines=100)
+        logs = apis().v1.read_namespaced_pod_log(name=pod_name, namespace=namespace, tail_lines=100)
         return logs or "No logs found."
-    except client.exceptions.ApiException as e:
+    except k8s_client.ApiException as e:
         return f"Failed to retrieve logs: {e}"
 
-def get_pod_events(pod_name, namespace):
+def get_filtered_pod_logs(pod_name, namespace, log_options):
     """
-    Retrieves events related to a specific pod.
+    Retrieves pod logs with the given log options as a single string,
+    capped at LOG_ANSWER_MAX_BYTES. follow is ignored for non-streamed answers.
     """
+    options = dict(log_options, follow=False)
+    if not any(options.get(key) for key in ('since_seconds', 'tail_lines', 'limit_bytes')):
+        options['tail_lines'] = 100
+    options['limit_bytes'] = min(options.get('limit_bytes') or LOG_ANSWER_MAX_BYTES, LOG_ANSWER_MAX_BYTES)
+    return ''.join(iter_pod_logs(pod_name, namespace, **options)).rstrip('\n') or "No logs found."
+
+def iter_pod_logs(pod_name, namespace, container=None, since_seconds=None, limit_bytes=None,
+                  tail_lines=None, grep=None, follow=False):
+    """
+    Yields pod log lines as they are read from the API server, without loading
+    the whole body into memory. Lines that do not contain `grep` (matched
+    case-insensitively) are dropped before they reach the client.
+    Reads are capped at LOG_STREAM_MAX_BYTES and follow streams are closed
+    after LOG_FOLLOW_MAX_SECONDS.
+    """
+    params = {
+        'container': container,
+        'since_seconds': since_seconds,
+        'tail_lines': tail_lines,
+        'limit_bytes': min(limit_bytes or LOG_STREAM_MAX_BYTES, LOG_STREAM_MAX_BYTES),
+        'follow': follow
+    }
+    # Keep the previous default of the last 100 lines when no window is requested
+    if tail_lines is None and since_seconds is None and limit_bytes is None:
+        params['tail_lines'] = 100
+    pattern = re.compile(re.escape(grep), re.IGNORECASE) if grep else None
+    deadline = time.monotonic() + LOG_FOLLOW_MAX_SECONDS
+
     try:
-        field_selector = f"involvedObject.name={pod_name},involvedObject.kind=Pod"
-        events = v1.list_namespaced_event(namespace=namespace, field_selector=field_selector)
-        event_messages = [f"{event.type}: {event.message}" for event in events.items]
-        return '\n'.join(event_messages) if event_messages else "No events found."
-    except client.exceptions.ApiException as e:
-        return f"Failed to retrieve events: {e}"
+        resp = apis().v1.read_namespaced_pod_log(name=pod_name, namespace=namespace, _preload_content=False,
+                                                 _request_timeout=LOG_FOLLOW_MAX_SECONDS if follow else None,
+                                                 **{k: v for k, v in params.items() if v is not None})
+    except k8s_client.ApiException as e:
+        yield f"Failed to retrieve logs: {e}\n"
+        return
 
-def get_pods_by_related_resource(resource, name, namespace):
+    from kubernetes.watch.watch import iter_resp_lines
+    try:
+        for line in iter_resp_lines(resp):
+            if pattern is None or pattern.search(line):
+                yield line + '\n'
+            if follow and time.monotonic() >= deadline:
+                break
+    except ReadTimeoutError:
+        pass
+    finally:
+        resp.release_conn()
+
+def handle_event_action(name, namespace, related_to, filters):
     """
-    Retrieves pods related to a specific resource, such as deployments or jobs.
+    Answers questions about events: those of a namespace (or the cluster),
+    of a named pod, or of a related object and the objects it owns,
+    narrowed by a type/reason field selector and a time window. Served from
+    the event buffer when it is current, otherwise from one list call.
     """
-    if resource == 'deployments':
-        return get_pods_by_deployment(name, namespace)
-    elif resource == 'jobs':
-        return get_pods_by_job(name, namespace)
+    scope = None if namespace == ALL_NAMESPACES else namespace
+    involved = None
+    if related_to.get('resource') and related_to.get('name'):
+        owner = resource_type(related_to['resource'])
+        if owner is None:
+            return f"Unsupported resource type: {related_to['resource']}"
+        involved = event_subjects(owner, related_to['name'], scope)
+    elif name:
+        involved = [('Pod', name)]
+    field_selector = filters.get('field_selector')
+    since_seconds = filters.get('since_seconds')
+    try:
+        selector = event_buffer.parse_field_selector(field_selector)
+        buffer = event_buffer.get_buffer(INFORMER_MAX_STALENESS)
+    except ValueError:
+        # Selectors the buffer cannot evaluate are left to the API server
+        buffer = None
+    if buffer is not None:
+        metrics.K8S_LOOKUPS_TOTAL.inc(source='events')
+        events = buffer.query(scope, involved, selector, since_seconds)
     else:
+        metrics.K8S_LOOKUPS_TOTAL.inc(source='api')
+        if involved is not None and len(involved) == 1:
+            kind, involved_name = involved[0]
+            subject = f"involvedObject.kind={kind},involvedObject.name={involved_name}"
+            field_selector = f"{field_selector},{subject}" if field_selector else subject
+        try:
+            pages = paging.iter_list_pages(apis().api_client, list_path('events', scope), metadata_only=False,
+                                           field_selector=field_selector)
+            records = [snapshot.EventRecord(item) for page in pages for item in page.get('items') or []]
+        except k8s_client.ApiException as e:
+            return f"Failed to retrieve events: {e.reason}"
+        events = event_buffer.select(records, involved, since_seconds=since_seconds)
+    return format_events(events, qualify=scope is None)
+
+def event_subjects(owner, name, namespace):
+    """
+    Returns the (kind, name) pairs whose events concern an object: the
+    object itself and, when the relation index holds them, the ReplicaSets,
+    Jobs and Pods it owns.
+    """
+    subjects = [(owner.kind, name)]
+    for (resource, target), path in relations.OWNER_PATHS.items():
+        if resource != owner.name:
+            continue
+        index = relations.get_index(path, INFORMER_MAX_STALENESS)
+        names = index.descendants(resource, namespace, name, target) if index is not None else None
+        subjects.extend((resource_type(target).kind, child) for child in names or [])
+    return subjects
+
+def format_events(events, qualify=False):
+    """
+    Formats events newest first, one per line, with their age, type, reason
+    and subject, up to EVENT_ANSWER_MAX_EVENTS.
+    """
+    if not events:
+        return "No events found."
+    now = time.time()
+    lines = []
+    for event in events[:EVENT_ANSWER_MAX_EVENTS]:
+        subject = f"{(event.involved_kind or '').lower()}/{event.involved_name}"
+        if qualify:
+            subject = f"{event.namespace}/{subject}"
+        age = format_age(now - event.timestamp) if event.timestamp else '?'
+        repeats = f" (x{event.count})" if event.count and event.count > 1 else ''
+        lines.append(f"[{age} ago] {event.type} {event.reason} {subject}: {event.message}{repeats}")
+    if len(events) > EVENT_ANSWER_MAX_EVENTS:
+        lines.append(f"... {len(events) - EVENT_ANSWER_MAX_EVENTS} older events not shown")
+    return '\n'.join(lines)
+
+def format_age(seconds):
+    """
+    Formats a duration as its largest unit: "45s", "12m", "3h", "2d".
+    """
+    seconds = max(0, int(seconds))
+    for unit, size in (('d', 86400), ('h', 3600), ('m', 60)):
+        if seconds >= size:
+            return f"{seconds // size}{unit}"
+    return f"{seconds}s"
+
+def handle_related_action(resource, related_resource, related_name, namespace, field):
+    """
+    Answers questions about the objects related to a named object: the pods
+    of a deployment, job, cronjob or service, the replicasets of a
+    deployment, the jobs of a cronjob, and the nodes running the pods of any
+    of these. Answered from the relation index when it is current, otherwise
+    from API calls.
+    """
+    target = 'pods' if resource == 'nodes' else resource
+    owner = resource_type(related_resource)
+    if owner is None or ((related_resource, target) not in relations.OWNER_PATHS
+                         and (related_resource, target) != ('services', 'pods')):
         return "Unsupported related resource."
 
-def get_pods_by_deployment(deployment_name, namespace='default'):
+    names = related_names(related_resource, related_name, namespace, target)
+    if resource == 'nodes':
+        # Multi-hop: the nodes that run the related pods
+        wanted = set(names)
+        pods = list_items('pods', namespace, lambda: apis().v1.list_namespaced_pod(namespace=namespace))
+        names = sorted({pod.spec.node_name for pod in pods if pod.metadata.name in wanted and pod.spec.node_name})
+
+    if field == 'count':
+        return str(len(names))
+    if not names:
+        return f"No {resource} found for {owner.kind.lower()} '{related_name}'."
+    return ', '.join(names)
+
+def related_names(related_resource, related_name, namespace, target):
     """
-    Retrieves pods created by a specific deployment.
+    Returns the names of the `target` objects that belong to the named object.
+    Raises ApiException (404) if the named object does not exist.
     """
-    try:
-        deployment = apps_v1.read_namespaced_deployment(name=deployment_name, namespace=namespace)
-        match_labels = deployment.spec.selector.match_labels
+    if related_resource == 'services':
+        index = relations.get_index(relations.SERVICE_PATH, INFORMER_MAX_STALENESS)
+        names = index.service_pods(namespace, related_name) if index is not None else None
+    else:
+        index = relations.get_index(relations.OWNER_PATHS[(related_resource, target)], INFORMER_MAX_STALENESS)
+        names = index.descendants(related_resource, namespace, related_name, target) if index is not None else None
+    if index is not None:
+        if names is not None:
+            metrics.K8S_LOOKUPS_TOTAL.inc(source='relations')
+            return names
+        e = k8s_client.ApiException(status=404, reason="Not Found")
+        e.body = f'{related_resource} "{related_name}" not found'
+        raise e
+
+    metrics.K8S_LOOKUPS_TOTAL.inc(source='api')
+    owner = resource_type(related_resource).read(related_name, namespace)
+    if related_resource == 'jobs':
+        selector = f"job-name={related_name}"
+    elif related_resource == 'cronjobs':
+        jobs = [job.metadata.name for job in apis().batch_v1.list_namespaced_job(namespace=namespace).items
+                if owned_by(job, owner)]
+        if target == 'jobs' or not jobs:
+            return sorted(jobs)
+        selector = f"job-name in ({','.join(jobs)})"
+    else:
+        match_labels = owner.spec.selector if related_resource == 'services' else owner.spec.selector.match_labels
         if not match_labels:
-            return "No match labels found in deployment."
-        
-        label_selector = ','.join([f"{k}={v}" for k, v in match_labels.items()])
-        pods = v1.list_namespaced_pod(namespace=namespace, label_selector=label_selector)
-        
-        pod_names = [simplify_name(pod.metadata.name) for pod in pods.items]
-        deployment_name_simplified = simplify_name(deployment_name)
-        
-        if pod_names:
-            return deployment_name_simplified
-        else:
-            return f"No pods found for deployment '{deployment_name_simplified}'."
-    except client.exceptions.ApiException as e:
-        return f"Failed to retrieve pods: {e}"
+            return []
+        selector = ','.join(f"{k}={v}" for k, v in match_labels.items())
+    if target == 'replicasets':
+        children = apis().apps_v1.list_namespaced_replica_set(namespace=namespace, label_selector=selector).items
+    else:
+        children = apis().v1.list_namespaced_pod(namespace=namespace, label_selector=selector).items
+    # A selector can match objects another controller owns; keep the owner's own
+    if related_resource == 'deployments' and target == 'replicasets':
+        children = [child for child in children if owned_by(child, owner)]
+    return sorted(child.metadata.name for child in children)
 
+def owned_by(obj, owner):
+    """
+    Returns True if an owner reference of obj points at owner.
+    """
+    return any(ref.uid == owner.metadata.uid for ref in obj.metadata.owner_references or [])
 
-def get_pods_by_job(job_name, namespace='default'):
+def get_job_pod_names(job_name, namespace):
     """
-    Retrieves pods created by a specific job.
+    Returns the full (unsimplified) names of the pods created by a job.
     """
-    try:
-        pods = v1.list_namespaced_pod(namespace=namespace, label_selector=f"job-name={job_name}")
-        pod_names = [simplify_name(pod.metadata.name) for pod in pods.items]
-        return ', '.join(pod_names) if pod_names else f"No pods found for job '{job_name}'."
-    except client.exceptions.ApiException as e:
-        return f"Failed to retrieve pods: {e}"
+    index = relations.get_index(relations.OWNER_PATHS[('jobs', 'pods')], INFORMER_MAX_STALENESS)
+    names = index.descendants('jobs', namespace, job_name, 'pods') if index is not None else None
+    if names is not None:
+        return names
+    pods = apis().v1.list_namespaced_pod(namespace=namespace, label_selector=f"job-name={job_name}")
+    return [pod.metadata.name for pod in pods.items]
 
 def get_logs_from_job(job_name, namespace):
     """
-    Retrieves logs from all pods created by a specific job.
+    Retrieves logs from all pods created by a specific job as a single string,
+    capped at LOG_ANSWER_MAX_BYTES. Pods are no longer fetched once the cap is reached.
+    """
+    chunks, size = [], 0
+    logs = iter_job_logs(job_name, namespace)
+    try:
+        for chunk in logs:
+            data = chunk.encode('utf-8')
+            if size + len(data) >= LOG_ANSWER_MAX_BYTES:
+                chunks.append(data[:LOG_ANSWER_MAX_BYTES - size].decode('utf-8', 'ignore'))
+                break
+            chunks.append(chunk)
+            size += len(data)
+    finally:
+        # Cancels the fetches still queued in the job log pool
+        logs.close()
+    return ''.join(chunks).rstrip('\n') or "No logs found."
+
+def iter_job_logs(job_name, namespace):
+    """
+    Yields the logs of each pod created by a job as soon as that pod's logs arrive.
+    Logs are fetched by a pool of JOB_LOG_WORKERS threads and at most that many
+    fetches are in flight, so memory stays bounded however many pods the job has.
     """
-    pods_response = get_pods_by_job(job_name, namespace)
-    if pods_response.startswith("Failed"):
-        return pods_response
-    if pods_response.startswith("No pods found"):
-        return f"No pods found for the job '{job_name}'."
-    pod_names = [pod.strip() for pod in pods_response.split(',')]
+    try:
+        pod_names = get_job_pod_names(job_name, namespace)
+    except k8s_client.ApiException as e:
+        yield f"Failed to retrieve pods: {e}\n"
+        return
     if not pod_names:
-        return f"No pods found for the job '{job_name}'."
-    # Collect logs from all pods
-    all_logs = []
-    for pod_name in pod_names:
-        logs = get_pod_logs(pod_name, namespace)
-        all_logs.append(f"Logs for pod '{pod_name}':\n{logs}")
-    return '\n\n'.join(all_logs) if all_logs else "No logs found."
+        yield f"No pods found for the job '{job_name}'.\n"
+        return
+
+    remaining = iter(pod_names)
+    pool = ThreadPoolExecutor(max_workers=JOB_LOG_WORKERS, thread_name_prefix="job-logs")
+    try:
+        pending = {pool.submit(get_pod_logs, name, namespace): name
+                   for name in itertools.islice(remaining, JOB_LOG_WORKERS)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pod_name = pending.pop(future)
+                yield f"Logs for pod '{pod_name}':\n{future.result()}\n\n"
+                next_name = next(remaining, None)
+                if next_name is not None:
+                    pending[pool.submit(get_pod_logs, next_name, namespace)] = next_name
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def stream_action(mapped_action: dict):
+    """
+    Returns an iterator over the answer chunks of an action. Pod logs are
+    yielded line by line, job logs pod by pod, and other actions yield their
+    single answer. Nothing is executed until the iterator is consumed.
+    """
+    resource = mapped_action.get('resource')
+    target_name = mapped_action.get('target_name')
+    namespace = mapped_action.get('namespace') or 'default'
+    if mapped_action.get('action_type') == 'logs' and target_name:
+        if resource == 'pods':
+            return iter_pod_logs(target_name, namespace, **(mapped_action.get('log_options') or {}))
+        if resource == 'jobs':
+            return iter_job_logs(target_name, namespace)
+    return iter_single_answer(mapped_action)
+
+def iter_single_answer(mapped_action: dict):
+    """
+    Yields the answer of an action that cannot be streamed in parts.
+    """
+    yield execute_action(mapped_action) + '\n'
 
 def format_labels(labels):
     """
@@ -470,10 +1300,9 @@ def simplify_name(name):
     return simplified_name
 
 
-def list_namespaces(api_client):
+def list_namespaces():
     """
     Lists all namespaces in the cluster.
     """
-    namespaces = api_client.list_namespace()
-    namespace_names = [ns.metadata.name for ns in namespaces.items]
+    namespace_names = list(list_names('namespaces', None))
     return ', '.join(namespace_names) if namespace_names else "No namespaces found."
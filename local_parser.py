@@ -0,0 +1,390 @@
+import ast
+import copy
+import difflib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+# Labelled queries the index is built from: comma-separated JSON lines files
+# of {"query": ..., "expected": {...}} entries
+LOCAL_PARSER_CORPUS = os.getenv(
+    "LOCAL_PARSER_CORPUS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus', 'queries.jsonl'))
+
+# Cosine similarity to the nearest labelled query below which the parser abstains
+LOCAL_PARSER_MIN_SIMILARITY = float(os.getenv("LOCAL_PARSER_MIN_SIMILARITY", "0.8"))
+
+# Neighbours tried, most similar first, until one aligns with the query
+CANDIDATES = 3
+
+# Parts of a parse read from the query text. Names, the namespace and label
+# selectors are copied as written; resource and field words are mapped to
+# their canonical values. Everything else in a parse (action, the "all"
+# namespace, filters and grouping) is the intent of the nearest neighbour.
+VALUE_SLOTS = (('target_name',), ('namespace',), ('related_to', 'name'), ('filters', 'label_selector'))
+RESOURCE_SLOTS = (('resource',), ('related_to', 'resource'))
+FIELD_SLOT = ('field',)
+
+# Feature tokens standing for slot words: any name (or a word the index has
+# never seen), a resource type, or a field
+SLOT_TOKEN = '<slot>'
+RESOURCE_TOKEN = '<resource>'
+FIELD_TOKEN = '<field>'
+
+TOKEN_PATTERN = re.compile(r"[^\s'\"`?!,;:()]+")
+
+_parser = None
+_parser_lock = threading.Lock()
+
+
+def tokenize(query: str) -> list:
+    """
+    Splits a query into words, keeping names such as "web-1.example" whole.
+    """
+    return [token.rstrip('.') for token in TOKEN_PATTERN.findall(query) if token.rstrip('.')]
+
+
+def stem(token: str) -> str:
+    """
+    Lowercases a word and drops a plural "s", so "pods" and "Pod" compare equal.
+    """
+    token = token.lower()
+    return token[:-1] if len(token) > 3 and token.endswith('s') and not token.endswith('ss') else token
+
+
+def _get(parse, path):
+    for key in path:
+        parse = parse.get(key) if isinstance(parse, dict) else None
+    return parse
+
+
+def _set(parse, path, value):
+    for key in path[:-1]:
+        parse = parse.setdefault(key, {})
+    parse[path[-1]] = value
+
+
+class Example:
+    """
+    A labelled query reduced to a template, in which the words holding slot
+    values are replaced by typed placeholders, and a frame: the parse
+    without those values.
+    """
+
+    def __init__(self, query, expected, resources):
+        words = tokenize(query)
+        self.query = query
+        self.features = [stem(word) for word in words]
+        self.slots = [None] * len(words)
+        self.frame = copy.deepcopy(expected)
+        self.field_words = {}
+
+        def assign(path, token, matches):
+            value = _get(expected, path)
+            if not isinstance(value, str):
+                return
+            for i, word in enumerate(words):
+                if self.slots[i] is None and matches(word, value):
+                    self.slots[i] = path
+                    self.features[i] = token
+                    _set(self.frame, path, None)
+                    return i
+
+        for path in VALUE_SLOTS:
+            assign(path, SLOT_TOKEN, lambda word, value: stem(word) == stem(value))
+        for path in RESOURCE_SLOTS:
+            assign(path, RESOURCE_TOKEN, lambda word, value: resources.get(word.lower()) == value)
+        i = assign(FIELD_SLOT, FIELD_TOKEN, lambda word, value: stem(word) == stem(value))
+        if i is not None:
+            self.field_words[stem(words[i])] = expected['field']
+
+
+class LocalParser:
+    """
+    Offline parser: an intent classifier that finds the most similar labelled
+    query by cosine similarity of TF-IDF weighted word and word-pair features
+    (one NumPy matrix product per batch), and a slot extractor that aligns the
+    query with that neighbour's template to read the names, namespace,
+    resource types, field and label selector. Returns None when no neighbour
+    is similar enough or the query does not align, so the caller can fall
+    back to the LLM.
+
+    `resources` maps singular and plural resource words to plural resource names.
+    """
+
+    def __init__(self, entries, resources, min_similarity=LOCAL_PARSER_MIN_SIMILARITY):
+        import numpy as np
+        self._np = np
+        self.resources = dict(resources, **{plural: plural for plural in resources.values()})
+        self.min_similarity = min_similarity
+
+        # Queries with the same template and frame add nothing to the index
+        unique = {}
+        for entry in entries:
+            example = Example(entry['query'], entry['expected'], self.resources)
+            unique.setdefault((tuple(example.features), json.dumps(example.frame, sort_keys=True)), example)
+        self.examples = list(unique.values())
+        self.field_words = {}
+        for example in self.examples:
+            self.field_words.update(example.field_words)
+        self.vocabulary = {token for example in self.examples for token in example.features}
+
+        documents = [self._feature_names(example.features) for example in self.examples]
+        names = sorted({name for document in documents for name in document})
+        self.index = {name: i for i, name in enumerate(names)}
+        document_frequency = np.zeros(len(names), dtype=np.float32)
+        for document in documents:
+            document_frequency[[self.index[name] for name in set(document)]] += 1
+        self.idf = np.log((1 + len(documents)) / (1 + document_frequency)) + 1
+        self.matrix = self._vectorize(documents)
+
+    @staticmethod
+    def _feature_names(tokens):
+        return tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+
+    def _vectorize(self, documents):
+        np = self._np
+        vectors = np.zeros((len(documents), len(self.index)), dtype=np.float32)
+        for row, document in enumerate(documents):
+            for name in document:
+                column = self.index.get(name)
+                if column is not None:
+                    vectors[row, column] += 1
+        vectors *= self.idf
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _mask(self, word):
+        if word.lower() in self.resources:
+            return RESOURCE_TOKEN
+        word = stem(word)
+        if word in self.field_words:
+            return FIELD_TOKEN
+        return word if word in self.vocabulary else SLOT_TOKEN
+
+    def parse(self, query: str):
+        """
+        Parses one query, or returns None when unsure.
+        """
+        return self.parse_batch([query])[0]
+
+    def parse_batch(self, queries: list) -> list:
+        """
+        Parses a batch of queries with one similarity matrix product.
+        """
+        np = self._np
+        if not queries or not self.examples:
+            return [None] * len(queries)
+        words = [tokenize(query) for query in queries]
+        masked = [[self._mask(word) for word in query_words] for query_words in words]
+        similarities = self._vectorize([self._feature_names(tokens) for tokens in masked]) @ self.matrix.T
+        top = np.argsort(-similarities, axis=1)[:, :CANDIDATES]
+
+        results = []
+        for row in range(len(queries)):
+            result = None
+            for column in top[row]:
+                if similarities[row, column] < self.min_similarity:
+                    break
+                result = self._fill(self.examples[column], words[row], masked[row])
+                if result is not None and agrees_with_rules(queries[row], result):
+                    break
+                result = None
+            results.append(result)
+        return results
+
+    def _fill(self, example, words, masked):
+        """
+        Aligns the query with the example's template and copies the words that
+        line up with its placeholders into the example's frame.
+        """
+        matcher = difflib.SequenceMatcher(None, example.features, masked, autojunk=False)
+        parse = copy.deepcopy(example.frame)
+        filled = 0
+        for op, i1, i2, j1, j2 in matcher.get_opcodes():
+            slots = [i for i in range(i1, i2) if example.slots[i] is not None]
+            if not slots:
+                continue
+            if op not in ('equal', 'replace') or i2 - i1 != j2 - j1:
+                return None
+            for i in slots:
+                path, word = example.slots[i], words[j1 + i - i1]
+                if path in RESOURCE_SLOTS:
+                    value = self.resources.get(word.lower())
+                elif path == FIELD_SLOT:
+                    value = self.field_words.get(stem(word))
+                else:
+                    value = word
+                if value is None:
+                    return None
+                _set(parse, path, value)
+                filled += 1
+        return parse if filled == sum(slot is not None for slot in example.slots) else None
+
+
+def agrees_with_rules(query, parsed):
+    """
+    Returns True if a parse is consistent with what the rule parser's
+    patterns read from the query: the field they find (none if they find
+    none), the namespace they find, or "all" for a cluster-wide phrase,
+    and a logs action exactly when the field is logs. The neighbour's
+    intent is only trusted where it does not contradict the query's words.
+    """
+    import rule_parser
+
+    text = query.strip().lower()
+    plain_text = text
+    for pattern in (rule_parser.GROUP_BY_PATTERN, rule_parser.LABEL_SELECTOR_PATTERN,
+                    rule_parser.ALL_NAMESPACES_PATTERN, rule_parser.TOP_PATTERN):
+        plain_text = pattern.sub(' ', plain_text)
+    field = next((name for name, pattern in rule_parser.FIELD_PATTERNS if pattern.search(plain_text)), None)
+    if parsed.get('group_by') and field is None:
+        field = 'count'
+    if parsed.get('field') != field or (parsed.get('action') == 'logs') != (field == 'logs'):
+        return False
+    namespace = None
+    for pattern in rule_parser.NAMESPACE_PATTERNS:
+        match = pattern.search(plain_text.replace("'", '').replace('"', ''))
+        if match:
+            namespace = match.group(1)
+            break
+    if namespace is None and rule_parser.ALL_NAMESPACES_PATTERN.search(text) and \
+            parsed.get('resource') not in ('nodes', 'namespaces'):
+        namespace = 'all'
+    return (parsed.get('namespace') or '').lower() == (namespace or '')
+
+
+def load_entries(paths):
+    """
+    Reads labelled queries from JSON lines files, skipping files that do not exist.
+    """
+    entries = []
+    for path in paths:
+        if not os.path.exists(path):
+            logging.warning("Local parser corpus %s not found", path)
+            continue
+        with open(path) as corpus:
+            entries.extend(json.loads(line) for line in corpus if line.strip())
+    return entries
+
+
+def get_parser():
+    """
+    Returns the shared LocalParser, building its index from LOCAL_PARSER_CORPUS on first use.
+    """
+    global _parser
+    if _parser is None:
+        with _parser_lock:
+            if _parser is None:
+                start = time.perf_counter()
+                from nlp_parser import PLURAL_RULES
+                _parser = LocalParser(load_entries(LOCAL_PARSER_CORPUS.split(',')), PLURAL_RULES)
+                logging.info("Local parser indexed %d templates in %.3f s",
+                             len(_parser.examples), time.perf_counter() - start)
+    return _parser
+
+
+def project(parsed):
+    """
+    Reduces a logged parse to the keys of a corpus entry, dropping ones the
+    executor added and optional keys left empty.
+    """
+    from nlp_parser import PARSE_KEYS
+
+    related_to = parsed.get('related_to') if isinstance(parsed.get('related_to'), dict) else {}
+    expected = {key: parsed.get(key) for key in PARSE_KEYS if key not in ('filters', 'group_by', 'limit')}
+    expected['related_to'] = {'resource': related_to.get('resource'), 'name': related_to.get('name')}
+    for key in ('filters', 'group_by', 'limit'):
+        if parsed.get(key):
+            expected[key] = parsed[key]
+    return expected
+
+
+def harvest(log_paths):
+    """
+    Yields labelled entries from agent logs (JSON lines or the older text
+    format): each "Received query" paired with the next "Parsed result" of
+    the same thread. Parses that found no action or resource are skipped.
+    Review the output before adding it to a corpus.
+    """
+    text_line = re.compile(r"^\S+ \S+ [A-Z]+ - (.*)$")
+    seen = set()
+    for path in log_paths:
+        pending = {}
+        with open(path, errors='replace') as log:
+            for line in log:
+                try:
+                    record = json.loads(line)
+                    thread, message = record.get('thread'), record.get('message', '')
+                except ValueError:
+                    match = text_line.match(line.rstrip('\n'))
+                    if not match:
+                        continue
+                    thread, message = None, match.group(1)
+                if message.startswith("Received query: "):
+                    pending[thread] = message[len("Received query: "):]
+                elif message.startswith("Parsed result: ") and thread in pending:
+                    query = pending.pop(thread)
+                    try:
+                        parsed = ast.literal_eval(message[len("Parsed result: "):])
+                    except (ValueError, SyntaxError):
+                        continue
+                    if query in seen or not isinstance(parsed, dict):
+                        continue
+                    if parsed.get('action') or parsed.get('resource'):
+                        seen.add(query)
+                        yield {'query': query, 'expected': project(parsed)}
+
+
+def run_evaluation(paths):
+    """
+    Leave-one-out evaluation on labelled corpora: each query is parsed by an
+    index built from all the others. Reports coverage, accuracy on the
+    queries answered, and single-query and batched latency.
+    """
+    from nlp_parser import PLURAL_RULES
+
+    entries = load_entries(paths)
+    if not entries:
+        print("No queries in corpus.")
+        return
+    answered = correct = 0
+    for i, entry in enumerate(entries):
+        parsed = LocalParser(entries[:i] + entries[i + 1:], PLURAL_RULES).parse(entry['query'])
+        if parsed is None:
+            continue
+        answered += 1
+        if parsed == entry['expected']:
+            correct += 1
+        else:
+            print(f"MISMATCH {entry['query']!r}: got {parsed}, expected {entry['expected']}")
+
+    parser = LocalParser(entries, PLURAL_RULES)
+    queries = [entry['query'] for entry in entries]
+    start = time.perf_counter()
+    for query in queries:
+        parser.parse(query)
+    single = (time.perf_counter() - start) / len(queries)
+    start = time.perf_counter()
+    parser.parse_batch(queries)
+    batched = (time.perf_counter() - start) / len(queries)
+
+    print(f"Queries:               {len(entries)} ({len(parser.examples)} templates)")
+    print(f"Answered (held out):   {answered} ({answered / len(entries):.1%})")
+    print(f"Accuracy on answered:  {correct}/{answered}")
+    print(f"Latency per query:     {single * 1000:.2f} ms single, {batched * 1000:.3f} ms batched")
+
+
+if __name__ == "__main__":
+    # Usage: python local_parser.py eval [corpus.jsonl ...]
+    #        python local_parser.py harvest agent.log [more.log ...] > corpus/harvested.jsonl
+    command, args = (sys.argv[1], sys.argv[2:]) if len(sys.argv) > 1 else ('eval', [])
+    if command == 'harvest':
+        for harvested in harvest(args or ['agent.log']):
+            print(json.dumps(harvested))
+    else:
+        run_evaluation(args or LOCAL_PARSER_CORPUS.split(','))
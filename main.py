@@ -1,24 +1,25 @@
 import logging
-from pydantic import BaseModel, ValidationError
-from flask import Flask, request, jsonify
-from nlp_parser import parse_query
-from action_mapper import map_action
-from k8s_executor import execute_action
+from pydantic import ValidationError
+from flask import Flask, Response, request, jsonify, stream_with_context
+from nlp_parser import parse_cache
+from schemas import QueryRequest, QueryResponse, BatchQueryRequest, BatchQueryResponse, SubscriptionRequest
+from k8s_executor import result_cache, start_configured_informers
+from pipeline import (answer_query, answer_batch, stream_query, format_chunks, subscribe_query,
+                      format_subscription, BATCH_MAX_QUERIES)
+import aggregates
+import event_buffer
+import informer
+import k8s_client
+import metrics
+import startup
+from log_setup import configure_logging
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG, 
-                    format='%(asctime)s %(levelname)s - %(message)s',
-                    filename='agent.log', filemode='a')
+configure_logging()
+metrics.configure_multiprocess()
 
 app = Flask(__name__)
 
-class QueryRequest(BaseModel):
-    query: str
-
-class QueryResponse(BaseModel):
-    query: str
-    answer: str
-
 @app.route('/query', methods=['POST'])
 def create_query():
     try:
@@ -26,31 +27,159 @@ def create_query():
         if not request_data or 'query' not in request_data:
             logging.error("Invalid request: 'query' field is missing.")
             return jsonify({"error": "Invalid request, 'query' field is required."}), 400
-        query = request_data['query']
-        logging.info(f"Received query: {query}")
+        query_request = QueryRequest(**request_data)
+        query = query_request.query
+        logging.info("Received query: %s", query)
+        log_options = query_request.log_options.dict(exclude_none=True) if query_request.log_options else None
 
-        # Parse the query
-        parsed_result = parse_query(query)
-        logging.info(f"Parsed result: {parsed_result}")
+        # Stream the answer chunk by chunk when requested
+        if query_request.stream:
+            event_stream = 'text/event-stream' in request.headers.get('Accept', '')
+            chunks = format_chunks(stream_query(query, log_options), event_stream)
+            return Response(stream_with_context(chunks),
+                            mimetype='text/event-stream' if event_stream else 'text/plain')
 
-        # Map the action
-        mapped_action = map_action(parsed_result)
-        logging.debug(f"Mapped action: {mapped_action}")
-
-        # Execute the action and get the answer
-        answer = execute_action(mapped_action)
-        logging.info(f"Generated answer: {answer}")
+        # Parse, map and execute the query
+        cache_control = query_request.cache_control or request.headers.get('Cache-Control')
+        answer = answer_query(query, log_options, cache_control)
+        startup.mark('first_request')
 
         # Create and return the response model
         response = QueryResponse(query=query, answer=answer)
         return jsonify(response.dict())
 
     except ValidationError as e:
-        logging.error(f"Validation error: {e}")
+        logging.error("Validation error: %s", e)
+        return jsonify({"error": e.errors()}), 400
+    except Exception as e:
+        logging.error("Unexpected error: %s", e)
+        return jsonify({"error": "Internal server error."}), 500
+
+@app.route('/query/batch', methods=['POST'])
+def create_batch_query():
+    """
+    Answers a list of queries in one request, sharing parses and list calls.
+    """
+    try:
+        request_data = request.get_json(silent=True)
+        if not request_data or 'queries' not in request_data:
+            logging.error("Invalid batch request: 'queries' field is missing.")
+            return jsonify({"error": "Invalid request, 'queries' field is required."}), 400
+        batch_request = BatchQueryRequest(**request_data)
+        queries = batch_request.queries
+        cache_control = batch_request.cache_control or request.headers.get('Cache-Control')
+        if len(queries) > BATCH_MAX_QUERIES:
+            return jsonify({"error": f"At most {BATCH_MAX_QUERIES} queries are allowed per batch."}), 400
+        logging.info("Received batch of %d queries", len(queries))
+
+        response = BatchQueryResponse(results=answer_batch(queries, cache_control))
+        startup.mark('first_request')
+        return jsonify(response.dict())
+
+    except ValidationError as e:
+        logging.error("Validation error: %s", e)
+        return jsonify({"error": e.errors()}), 400
+    except Exception as e:
+        logging.error("Unexpected error: %s", e)
+        return jsonify({"error": "Internal server error."}), 500
+
+@app.route('/query/subscribe', methods=['POST'])
+def create_subscription():
+    """
+    Subscribes to the answer of a query: streams a snapshot of the answer,
+    then only its changes, as server-sent events.
+    """
+    try:
+        request_data = request.get_json(silent=True)
+        if not request_data or 'query' not in request_data:
+            logging.error("Invalid subscription request: 'query' field is missing.")
+            return jsonify({"error": "Invalid request, 'query' field is required."}), 400
+        subscription_request = SubscriptionRequest(**request_data)
+        logging.info("Received subscription: %s", subscription_request.query)
+        subscription = subscribe_query(subscription_request.query)
+        return Response(stream_with_context(format_subscription(subscription)), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    except ValidationError as e:
+        logging.error("Validation error: %s", e)
         return jsonify({"error": e.errors()}), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except (RuntimeError, TimeoutError) as e:
+        logging.warning("Subscription refused: %s", e)
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
-        logging.error(f"Unexpected error: {e}")
+        logging.error("Unexpected error: %s", e)
         return jsonify({"error": "Internal server error."}), 500
 
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """
+    Liveness probe: the process is up and serving requests.
+    """
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """
+    Readiness probe: fails until the clients are warmed up and the configured
+    informers have completed their first list, so a worker only receives
+    traffic once it can answer from its caches. Later watch errors do not
+    fail it: reads fall back to the API server while an informer recovers.
+    """
+    if not (startup.is_warm() and informer.informers_synced()):
+        return jsonify({'status': 'not ready', 'startup': startup.startup_status(),
+                        'informers': informer.informer_status()}), 503
+    return jsonify({'status': 'ready', 'startup': startup.startup_status()})
+
+@app.route('/informers', methods=['GET'])
+def informers_status():
+    """
+    Reports sync state and staleness of the informer stores.
+    """
+    return jsonify(informer.informer_status())
+
+@app.route('/aggregates', methods=['GET'])
+def aggregates_status():
+    """
+    Reports freshness and cluster-wide totals of the aggregate indexes.
+    """
+    return jsonify(aggregates.aggregates_status())
+
+@app.route('/events/buffer', methods=['GET'])
+def event_buffer_status():
+    """
+    Reports size, limits, evictions and freshness of the event buffer.
+    """
+    status = event_buffer.buffer_status()
+    if status is None:
+        return jsonify({"error": "The event buffer is not enabled."}), 404
+    return jsonify(status)
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """
+    Reports hit/miss counters of the query caches.
+    """
+    return jsonify({'parse': parse_cache.stats(), 'results': result_cache.stats()})
+
+@app.route('/k8s/pool', methods=['GET'])
+def k8s_pool_stats():
+    """
+    Reports utilization of the Kubernetes API connection pool.
+    """
+    return jsonify(k8s_client.pool_stats(k8s_client.get_api_client()))
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    Exports latency histograms and counters in the Prometheus text format.
+    """
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+startup.mark('app_imported')
+
 if __name__ == "__main__":
+    start_configured_informers()
+    startup.start_warm_up()
     app.run(host="0.0.0.0", port=8000)
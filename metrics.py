@@ -0,0 +1,278 @@
+import atexit
+import bisect
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# OpenTelemetry is optional: spans are recorded only when the API package is
+# installed (and exported only when an SDK and exporter are configured).
+try:
+    from opentelemetry import trace
+    _tracer = trace.get_tracer("k8s-agent")
+except ImportError:
+    _tracer = None
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Directory shared by the worker processes of one server. Each worker writes
+# its series there every METRICS_FLUSH_SECONDS, and /metrics on any worker
+# renders the sum over all of them. Unset, /metrics reports this process only.
+METRICS_DIR = os.getenv("METRICS_DIR") or None
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+_registry = []
+_flusher = None
+
+
+class Metric:
+    """
+    Base class of the metrics exported on /metrics. Each label combination
+    gets its own series, created on first use.
+    """
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _format_labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def dump(self):
+        """
+        Returns the series as JSON-serializable [labels, value] pairs.
+        """
+        with self._lock:
+            return [[list(key), value] for key, value in self._series.items()]
+
+    def merge(self, dumps):
+        """
+        Combines the dumps of several processes into one series map. Counts
+        add up; gauges are process-local and keep the dump's 'worker' label.
+        """
+        merged = {}
+        for worker, series in dumps:
+            for key, value in series:
+                key = tuple(key)
+                merged[key] = self._combine(merged[key], value) if key in merged else value
+        return merged
+
+    def _combine(self, value, other):
+        return value + other
+
+    def render(self, dumps=None):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        if dumps is None:
+            with self._lock:
+                series = sorted(self._series.items())
+        else:
+            series = sorted(self.merge(dumps).items())
+        for key, value in series:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{self._format_labels(key)} {value}"]
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def merge(self, dumps):
+        # One series per live worker; a gauge of an exited process means nothing
+        return {(*key, worker): value for worker, series in dumps if _alive(worker) for key, value in series}
+
+    def _render_series(self, key, value):
+        if len(key) > len(self.labelnames):
+            return [f"{self.name}{self._format_labels(key[:-1], [('worker', key[-1])])} {value}"]
+        return [f"{self.name}{self._format_labels(key)} {value}"]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), sum of observations
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def _combine(self, value, other):
+        return [[a + b for a, b in zip(value[0], other[0])], value[1] + other[1]]
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_series(self, key, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', le)])} {cumulative}")
+        lines.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+        lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Metrics of the query pipeline
+QUERY_STAGE_SECONDS = Histogram('query_stage_seconds', 'Time spent in each stage of answering a query', ['stage'])
+PARSE_SOURCE_TOTAL = Counter('parse_source_total', 'Parsed queries by where the parse came from', ['source'])
+LLM_REQUEST_SECONDS = Histogram('llm_request_seconds', 'Latency of LLM parse calls', ['model', 'query_class'])
+LLM_TOKENS_TOTAL = Counter('llm_tokens_total', 'Tokens used by LLM parse calls', ['model', 'query_class', 'kind'])
+K8S_REQUEST_SECONDS = Histogram('k8s_request_seconds',
+                                'Latency of Kubernetes API calls until the response headers arrive',
+                                ['resource', 'verb'])
+K8S_REQUEST_ERRORS_TOTAL = Counter('k8s_request_errors_total', 'Failed Kubernetes API calls',
+                                   ['resource', 'verb', 'status'])
+LOG_RECORDS_DROPPED_TOTAL = Counter('log_records_dropped_total', 'Log records dropped because the log queue was full')
+K8S_LOOKUPS_TOTAL = Counter('k8s_lookups_total', 'List and get lookups by where they were answered from',
+                            ['source'])
+EVENTS_EVICTED_TOTAL = Counter('events_evicted_total', 'Events dropped from the event buffer to stay within its limits',
+                               ['reason'])
+SUBSCRIPTIONS_ACTIVE = Gauge('subscriptions_active', 'Open query subscriptions')
+SUBSCRIPTION_EVENTS_TOTAL = Counter('subscription_events_total', 'Events sent to query subscriptions', ['type'])
+STARTUP_SECONDS = Gauge('startup_seconds', 'Seconds from process start to each startup milestone',
+                        ['milestone'])
+
+
+@contextmanager
+def stage(name, **attributes):
+    """
+    Times a pipeline stage into query_stage_seconds and, when OpenTelemetry
+    is available, records it as a span.
+    """
+    with QUERY_STAGE_SECONDS.time(stage=name):
+        if _tracer is None:
+            yield
+        else:
+            with _tracer.start_as_current_span(name, attributes=attributes):
+                yield
+
+
+def render():
+    """
+    Returns all metrics in the Prometheus text exposition format: of every
+    worker process when METRICS_DIR is set, otherwise of this process.
+    """
+    dumps = None
+    if METRICS_DIR:
+        write_dump()
+        dumps = read_dumps()
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render(None if dumps is None else dumps.get(metric.name, [])))
+    return '\n'.join(lines) + '\n'
+
+
+def _alive(pid):
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        pass
+    return True
+
+
+def write_dump():
+    """
+    Writes this process's series to METRICS_DIR, replacing its previous dump.
+    """
+    path = os.path.join(METRICS_DIR, f"metrics.{os.getpid()}.json")
+    temporary = f"{path}.tmp"
+    with open(temporary, 'w') as dump:
+        json.dump({metric.name: metric.dump() for metric in _registry}, dump)
+    os.replace(temporary, path)
+
+
+def read_dumps():
+    """
+    Returns {metric name: [(worker pid, series)]} from every dump in METRICS_DIR,
+    including those of exited workers, so counters never go backwards.
+    """
+    dumps = {}
+    for path in glob.glob(os.path.join(METRICS_DIR, "metrics.*.json")):
+        worker = os.path.basename(path).split('.')[1]
+        try:
+            with open(path) as dump:
+                contents = json.load(dump)
+        except (OSError, ValueError):
+            continue
+        for name, series in contents.items():
+            dumps.setdefault(name, []).append((worker, series))
+    return dumps
+
+
+def configure_multiprocess():
+    """
+    Starts writing this process's series to METRICS_DIR every
+    METRICS_FLUSH_SECONDS and on exit. A no-op without METRICS_DIR or when
+    already started.
+    """
+    global _flusher
+    if not METRICS_DIR or _flusher is not None:
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+
+    def flush():
+        while True:
+            time.sleep(METRICS_FLUSH_SECONDS)
+            try:
+                write_dump()
+            except OSError as e:
+                logging.warning("Could not write metrics to %s: %s", METRICS_DIR, e)
+
+    _flusher = threading.Thread(target=flush, name="metrics-flush", daemon=True)
+    _flusher.start()
+    atexit.register(write_dump)
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
@@ -1,19 +1,85 @@
 import json
+import logging
 import os
-from openai import OpenAI
+import re
+import threading
+import time
 from dotenv import load_dotenv
+from parse_cache import ParseCache, make_cache_key
+from rule_parser import RuleParser
+import metrics
 
 # Load environment variables from the .env file
 load_dotenv()
 
-# Get the API key from the environment variables
-api_key = os.getenv("OPENAI_API_KEY")
+# OpenAI clients, created on first use; the async client serves the ASGI app
+_clients = {}
+_clients_lock = threading.Lock()
 
-if not api_key:
-    raise ValueError("OPENAI_API_KEY not found. Ensure it is set in the .env file.")
+def get_openai_client(use_async=False):
+    """
+    Returns the shared OpenAI client (or the async one), creating it on first
+    use. The SDK is only imported then, so importing this module stays fast.
+    Raises ValueError if OPENAI_API_KEY is not set.
+    """
+    kind = 'async' if use_async else 'sync'
+    if kind not in _clients:
+        with _clients_lock:
+            if kind not in _clients:
+                api_key = os.getenv("OPENAI_API_KEY")
+                if not api_key:
+                    raise ValueError("OPENAI_API_KEY not found. Ensure it is set in the .env file.")
+                from openai import OpenAI, AsyncOpenAI
+                _clients[kind] = (AsyncOpenAI if use_async else OpenAI)(api_key=api_key)
+    return _clients[kind]
+
+def set_openai_clients(client=None, async_client=None):
+    """
+    Injects the OpenAI clients to use, e.g. stubs in tests. None resets a
+    client so the default is created again on next use.
+    """
+    with _clients_lock:
+        for kind, value in (('sync', client), ('async', async_client)):
+            if value is None:
+                _clients.pop(kind, None)
+            else:
+                _clients[kind] = value
+
+def parse_class_models(spec: str) -> dict:
+    """
+    Parses per-query-class models written as "simple=gpt-4o-mini,logs=gpt-4o-mini".
+    """
+    models = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        query_class, _, model = item.partition('=')
+        models[query_class.strip()] = model.strip()
+    return models
 
-# Create the OpenAI client with the API key
-client = OpenAI(api_key=api_key)
+# Model used for parsing, and the version of the prompts below.
+# Bump PROMPT_VERSION whenever a prompt changes so cached parses are not reused.
+PARSER_MODEL = os.getenv("LLM_MODEL", "gpt-4")
+PROMPT_VERSION = "5"
+
+# Models for individual query classes ("simple", "aggregate", "logs",
+# "relation"); classes not listed use PARSER_MODEL
+LLM_CLASS_MODELS = parse_class_models(os.getenv("LLM_CLASS_MODELS", ""))
+
+# How queries are sent to the LLM: "full" is the original verbose prompt,
+# "compact" sends short instructions once as the system message, and
+# "structured" adds a strict JSON schema response format, which needs a model
+# that supports structured outputs (e.g. gpt-4o or gpt-4o-mini)
+LLM_PROMPT_STYLE = os.getenv("LLM_PROMPT_STYLE", "compact")
+PROMPT_STYLES = ('full', 'compact', 'structured')
+
+# Upper bound on reply tokens; a complete parse takes about 80
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "150"))
+
+# Cache of parse results keyed on the normalized query and prompt/model version
+parse_cache = ParseCache(
+    max_size=int(os.getenv("PARSE_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("PARSE_CACHE_TTL", "86400")),
+    path=os.getenv("PARSE_CACHE_PATH") or None
+)
 
 # Kubernetes-specific pluralization rules
 PLURAL_RULES = {
@@ -28,6 +94,99 @@ PLURAL_RULES = {
     'event': 'events'
 }
 
+# Deterministic parser for common query templates, tried before the LLM
+RULE_PARSER_ENABLED = os.getenv("RULE_PARSER_ENABLED", "1") == "1"
+rule_parser = RuleParser(PLURAL_RULES)
+
+# Offline nearest-neighbour parser over the labelled corpus (see local_parser.py):
+# "off", "fallback" (tried after the parse cache, before the LLM) or "only"
+# (never call the LLM, e.g. in air-gapped clusters)
+LOCAL_PARSER_MODE = os.getenv("LOCAL_PARSER_MODE", "off")
+
+# Keys of a parse result produced by the LLM
+PARSE_KEYS = ('action', 'resource', 'target_name', 'namespace', 'field', 'related_to', 'filters', 'group_by',
+              'limit')
+
+# Instructions of the compact and structured prompt styles, sent once as the system message
+COMPACT_INSTRUCTIONS = """Extract the Kubernetes query in the user message as a JSON object with exactly these keys:
+action: "get", "list" or "logs", or null
+resource: plural resource type (pods, deployments, services, nodes, namespaces, jobs, cronjobs, ingresses, \
+events), or null
+target_name: name of one specific resource, or null
+namespace: namespace name, "all" for the whole cluster, or null
+field: attribute asked for, e.g. count, status, logs, containers, container_count, labels, replicas, image, \
+cluster_ip, external_ip, node, age, restart_count, schedule, completions, hosts, type; or null
+related_to: {"resource": plural type, "name": name} of a resource the target belongs to, or whose events are asked \
+for, or both null
+filters: {"label_selector": ..., "field_selector": ..., "where": ..., "since_seconds": ...} restricting a list or \
+count (e.g. "app=web", "status.phase!=Running", "type=Warning" for events; where compares columns restarts, \
+containers, ready, replicas, available_replicas, ready_replicas, e.g. "restarts>5" or \
+"available_replicas<replicas"; since_seconds is a time window such as 600 for "last 10 minutes"), or null
+group_by: "namespace", "phase" or "node" when a count is grouped, or null
+limit: N of a "top N" question, or null
+Use "containers" to list containers and "container_count" for how many. Reply with the JSON object only."""
+
+_NULLABLE_STRING = {'type': ['string', 'null']}
+
+# Strict JSON schema of the structured prompt style
+PARSE_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'action': _NULLABLE_STRING,
+        'resource': _NULLABLE_STRING,
+        'target_name': _NULLABLE_STRING,
+        'namespace': _NULLABLE_STRING,
+        'field': _NULLABLE_STRING,
+        'related_to': {
+            'type': 'object',
+            'properties': {'resource': _NULLABLE_STRING, 'name': _NULLABLE_STRING},
+            'required': ['resource', 'name'],
+            'additionalProperties': False
+        },
+        'filters': {
+            'anyOf': [{
+                'type': 'object',
+                'properties': {'label_selector': _NULLABLE_STRING, 'field_selector': _NULLABLE_STRING,
+                               'where': _NULLABLE_STRING, 'since_seconds': {'type': ['integer', 'null']}},
+                'required': ['label_selector', 'field_selector', 'where', 'since_seconds'],
+                'additionalProperties': False
+            }, {'type': 'null'}]
+        },
+        'group_by': {'type': ['string', 'null'], 'enum': ['namespace', 'phase', 'node', None]},
+        'limit': {'type': ['integer', 'null']}
+    },
+    'required': list(PARSE_KEYS),
+    'additionalProperties': False
+}
+
+# Cues used to pick a query class, and with it a model, before calling the LLM
+LOGS_CUE = re.compile(r'\blogs?\b', re.IGNORECASE)
+AGGREGATE_CUE = re.compile(r'\b(how many|number of|count|per namespace|by (namespace|phase|status|node))\b',
+                           re.IGNORECASE)
+RESOURCE_CUE = re.compile(r'\b(pod|deployment|service|node|namespace|job|cronjob|ingress|event)(e?s)?\b',
+                          re.IGNORECASE)
+
+def classify_query(query: str) -> str:
+    """
+    Returns the class of a query: "logs", "relation" (it names two resource
+    types, e.g. the pods of a deployment), "aggregate" (counts and groupings)
+    or "simple".
+    """
+    if LOGS_CUE.search(query):
+        return 'logs'
+    kinds = {match.group(1).lower() for match in RESOURCE_CUE.finditer(query)} - {'namespace'}
+    if len(kinds) > 1:
+        return 'relation'
+    if AGGREGATE_CUE.search(query):
+        return 'aggregate'
+    return 'simple'
+
+def model_for(query_class: str) -> str:
+    """
+    Returns the model used to parse queries of a class.
+    """
+    return LLM_CLASS_MODELS.get(query_class, PARSER_MODEL)
+
 def pluralize_resource(resource: str) -> str:
     """
     Pluralizes Kubernetes resource names based on predefined rules.
@@ -37,9 +196,95 @@ def pluralize_resource(resource: str) -> str:
 
 def parse_query(query: str) -> dict:
     """
-    Parses the user's natural language query using GPT-4 to extract components.
-    Returns a dictionary containing the parsed components.
+    Parses the user's natural language query into its components.
+    Common templates are handled by the rule parser and repeated queries are
+    answered from the parse cache, both without calling GPT-4.
+    """
+    parsed_result, cache_key = parse_query_without_llm(query)
+    if parsed_result is not None:
+        return parsed_result
+
+    parsed_result = parse_query_with_llm(query)
+    cache_parse_result(cache_key, parsed_result)
+    return parsed_result
+
+async def parse_query_async(query: str) -> dict:
+    """
+    Async variant of parse_query. The GPT-4 call is awaited on the async
+    OpenAI client so the event loop is never blocked.
     """
+    parsed_result, cache_key = parse_query_without_llm(query)
+    if parsed_result is not None:
+        return parsed_result
+
+    parsed_result = await parse_query_with_llm_async(query)
+    cache_parse_result(cache_key, parsed_result)
+    return parsed_result
+
+def parse_query_without_llm(query: str):
+    """
+    Tries the rule parser, the parse cache and then the local parser.
+    Returns the parsed result (or None) and the cache key for the query.
+    With LOCAL_PARSER_MODE "only" the result is never None, so the LLM is not called.
+    """
+    if RULE_PARSER_ENABLED:
+        parsed_result = rule_parser.parse(query)
+        if parsed_result is not None:
+            metrics.PARSE_SOURCE_TOTAL.inc(source='rules')
+            return parsed_result, None
+
+    model = model_for(classify_query(query))
+    cache_key = make_cache_key(query, f"{model}:{PROMPT_VERSION}:{LLM_PROMPT_STYLE}")
+    parsed_result = parse_cache.get(cache_key)
+    if parsed_result is not None:
+        metrics.PARSE_SOURCE_TOTAL.inc(source='cache')
+        return parsed_result, cache_key
+
+    if LOCAL_PARSER_MODE != 'off':
+        import local_parser
+        parsed_result = local_parser.get_parser().parse(query)
+        if parsed_result is not None:
+            metrics.PARSE_SOURCE_TOTAL.inc(source='local')
+            return parsed_result, None
+        if LOCAL_PARSER_MODE == 'only':
+            metrics.PARSE_SOURCE_TOTAL.inc(source='none')
+            return empty_parse_result(), None
+    return None, cache_key
+
+def cache_parse_result(cache_key: str, parsed_result: dict):
+    """
+    Stores an LLM parse result. Failed parses are not cached so the next request can retry.
+    """
+    if parsed_result['action'] or parsed_result['resource']:
+        parse_cache.set(cache_key, parsed_result)
+
+def build_llm_request(query: str, style: str = None, model: str = None) -> dict:
+    """
+    Builds the chat completion request used to parse a query, in the given
+    prompt style (LLM_PROMPT_STYLE by default) for the given model (by default
+    the model of the query's class).
+    """
+    style = style or LLM_PROMPT_STYLE
+    model = model or model_for(classify_query(query))
+    if style not in PROMPT_STYLES:
+        raise ValueError(f"Unknown prompt style {style!r}, expected one of {', '.join(PROMPT_STYLES)}")
+    if style != 'full':
+        request = {
+            'model': model,
+            'messages': [
+                {"role": "system", "content": COMPACT_INSTRUCTIONS},
+                {"role": "user", "content": query}
+            ],
+            'temperature': 0,
+            'max_tokens': LLM_MAX_TOKENS
+        }
+        if style == 'structured':
+            request['response_format'] = {
+                'type': 'json_schema',
+                'json_schema': {'name': 'kubernetes_query', 'strict': True, 'schema': PARSE_SCHEMA}
+            }
+        return request
+
     prompt = f"""
     You are a Kubernetes assistant. Extract the following information from the user's query and return it as a JSON object with the exact keys specified below. Do not include any additional information or keys.
 
@@ -53,16 +298,27 @@ def parse_query(query: str) -> dict:
         "related_to": {{
             "resource": string or null,
             "name": string or null
-        }}
+        }},
+        "filters": {{
+            "label_selector": string or null,
+            "field_selector": string or null,
+            "where": string or null,
+            "since_seconds": integer or null
+        }} or null,
+        "group_by": string or null,
+        "limit": integer or null
     }}
 
     **Definitions:**
     - **action**: The operation to perform (e.g., "get", "list", "describe", "show", "fetch").
     - **resource**: The Kubernetes resource type in plural form (e.g., "pods", "deployments", "services").
     - **target_name**: The name of the specific resource, if any.
-    - **namespace**: The Kubernetes namespace, if specified.
+    - **namespace**: The Kubernetes namespace, if specified. Use "all" when the query covers the whole cluster or all namespaces.
     - **field**: A specific attribute to retrieve (e.g., "logs", "containers", "container_count", "labels", "replicas", "IP address", "count", "status").
-    - **related_to**: An object specifying a related resource, if applicable.
+    - **related_to**: An object specifying a related resource, if applicable. For events, the resource whose events are asked for (e.g., "deployments" and its name); events of a pod keep the pod name in `target_name`.
+    - **filters**: Kubernetes label and field selectors restricting a list or count (e.g., "app=web", "status.phase!=Running"), if any. `where` holds comparisons of the columns restarts, containers, ready, replicas, available_replicas and ready_replicas (e.g., "restarts>5", "available_replicas<replicas"). `since_seconds` is a time window in seconds (e.g., 600 for "in the last 10 minutes").
+    - **group_by**: How to group a count, one of "namespace", "phase" or "node", if requested.
+    - **limit**: The N of a "top N" question, if any.
 
     **Additional Instructions:**
     - Use plural forms for resources when the query implies multiple instances.
@@ -78,57 +334,135 @@ def parse_query(query: str) -> dict:
     **Extracted JSON:**
     """
 
+    return {
+        'model': model,
+        'messages': [
+            {"role": "system", "content": "You are a Kubernetes assistant. Respond strictly in JSON format as per the instructions."},
+            {"role": "user", "content": prompt}
+        ],
+        'temperature': 0,
+        'max_tokens': LLM_MAX_TOKENS
+    }
+
+def parse_query_with_llm(query: str, style: str = None, model: str = None, stats: dict = None) -> dict:
+    """
+    Parses the user's natural language query with the LLM to extract components.
+    Returns a dictionary containing the parsed components. When `stats` is
+    given, it is filled with the model, query class, tokens and latency of the call.
+    """
+    metrics.PARSE_SOURCE_TOTAL.inc(source='llm')
+    request, call = _prepare_llm_call(query, style, model, stats)
+    try:
+        start = time.perf_counter()
+        response = get_openai_client().chat.completions.create(**request)
+        record_llm_call(call, response, time.perf_counter() - start)
+        return process_llm_reply(query, response.choices[0].message.content,
+                                 structured='response_format' in request)
+    except json.JSONDecodeError:
+        logging.exception("Invalid JSON in the LLM reply for query: %s", query)
+    except Exception:
+        logging.exception("Error parsing query with the LLM: %s", query)
+    return empty_parse_result()
+
+async def parse_query_with_llm_async(query: str, style: str = None, model: str = None, stats: dict = None) -> dict:
+    """
+    Async variant of parse_query_with_llm using the async OpenAI client.
+    """
+    metrics.PARSE_SOURCE_TOTAL.inc(source='llm')
+    request, call = _prepare_llm_call(query, style, model, stats)
     try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a Kubernetes assistant. Respond strictly in JSON format as per the instructions."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0,
-            max_tokens=150
-        )
+        start = time.perf_counter()
+        response = await get_openai_client(use_async=True).chat.completions.create(**request)
+        record_llm_call(call, response, time.perf_counter() - start)
+        return process_llm_reply(query, response.choices[0].message.content,
+                                 structured='response_format' in request)
+    except json.JSONDecodeError:
+        logging.exception("Invalid JSON in the LLM reply for query: %s", query)
+    except Exception:
+        logging.exception("Error parsing query with the LLM: %s", query)
+    return empty_parse_result()
 
-        assistant_reply = response.choices[0].message.content.strip()
+def _prepare_llm_call(query, style, model, stats):
+    query_class = classify_query(query)
+    request = build_llm_request(query, style, model or model_for(query_class))
+    call = stats if stats is not None else {}
+    call.update(model=request['model'], query_class=query_class, style=style or LLM_PROMPT_STYLE)
+    return request, call
+
+def record_llm_call(call: dict, response, seconds: float):
+    """
+    Accounts one LLM call: its latency and the prompt and completion tokens
+    of the chat completion, per model and query class.
+    """
+    usage = getattr(response, 'usage', None)
+    call['seconds'] = seconds
+    call['prompt_tokens'] = (usage.prompt_tokens or 0) if usage else 0
+    call['completion_tokens'] = (usage.completion_tokens or 0) if usage else 0
+    labels = {'model': call['model'], 'query_class': call['query_class']}
+    metrics.LLM_REQUEST_SECONDS.observe(seconds, **labels)
+    metrics.LLM_TOKENS_TOTAL.inc(call['prompt_tokens'], kind='prompt', **labels)
+    metrics.LLM_TOKENS_TOTAL.inc(call['completion_tokens'], kind='completion', **labels)
+    logging.info("LLM parse with %s (%s query, %s prompt): %d prompt + %d completion tokens in %.3f s",
+                 call['model'], call['query_class'], call['style'], call['prompt_tokens'],
+                 call['completion_tokens'], seconds)
 
+def process_llm_reply(query: str, assistant_reply: str, structured: bool = False) -> dict:
+    """
+    Parses the JSON object of the LLM reply and normalizes it. Structured
+    replies are exactly the JSON object; free-form replies may wrap it in text.
+    Raises json.JSONDecodeError if the reply does not contain valid JSON.
+    """
+    assistant_reply = assistant_reply.strip()
+    if structured:
+        parsed_result = json.loads(assistant_reply)
+    else:
         # Extract the JSON part from the response
         json_start = assistant_reply.find("{")
         json_end = assistant_reply.rfind("}") + 1
-        json_str = assistant_reply[json_start:json_end]
-
-        # Parse the JSON output
-        parsed_result = json.loads(json_str)
-
-        # Ensure all expected keys are present
-        expected_keys = ['action', 'resource', 'target_name', 'namespace', 'field', 'related_to']
-        parsed_result_lower = {key.lower(): parsed_result.get(key.lower(), None) for key in expected_keys}
-
-        # Adjust parsed result for specific queries
-        if "logs" in query.lower():
-            parsed_result_lower['field'] = 'logs'
-            parsed_result_lower['action'] = 'logs'
-        elif "containers" in query.lower():
-            if 'how many' in query.lower() or 'number of' in query.lower():
-                parsed_result_lower['field'] = 'container_count'
-            else:
-                parsed_result_lower['field'] = 'containers'
+        parsed_result = json.loads(assistant_reply[json_start:json_end])
 
-        # Pluralize resource name if necessary
-        if parsed_result_lower['resource']:
-            parsed_result_lower['resource'] = pluralize_resource(parsed_result_lower['resource'])
+    # Ensure all expected keys are present
+    expected_keys = ['action', 'resource', 'target_name', 'namespace', 'field', 'related_to']
+    parsed_result_lower = {key.lower(): parsed_result.get(key.lower(), None) for key in expected_keys}
 
-        # Ensure related_to has both 'resource' and 'name'
-        if not isinstance(parsed_result_lower.get('related_to'), dict):
-            parsed_result_lower['related_to'] = {'resource': None, 'name': None}
+    # Adjust parsed result for specific queries
+    if "logs" in query.lower():
+        parsed_result_lower['field'] = 'logs'
+        parsed_result_lower['action'] = 'logs'
+    elif "containers" in query.lower():
+        if 'how many' in query.lower() or 'number of' in query.lower():
+            parsed_result_lower['field'] = 'container_count'
+        else:
+            parsed_result_lower['field'] = 'containers'
 
-        return parsed_result_lower
+    # Pluralize resource name if necessary
+    if parsed_result_lower['resource']:
+        parsed_result_lower['resource'] = pluralize_resource(parsed_result_lower['resource'])
 
-    except json.JSONDecodeError as jde:
-        print(f"JSON Decode Error: {jde}")
-    except Exception as e:
-        print(f"Error parsing query with GPT-4: {e}")
+    # Ensure related_to has both 'resource' and 'name'
+    if not isinstance(parsed_result_lower.get('related_to'), dict):
+        parsed_result_lower['related_to'] = {'resource': None, 'name': None}
 
-    # Return a dictionary with all keys set to None in case of error
+    # Filters and grouping are optional and only kept when given
+    filters = parsed_result.get('filters')
+    if isinstance(filters, dict):
+        filters = {key: filters[key] for key in ('label_selector', 'field_selector', 'where', 'since_seconds')
+                   if filters.get(key)}
+        if filters:
+            parsed_result_lower['filters'] = filters
+    if parsed_result.get('group_by') in ('namespace', 'phase', 'node'):
+        parsed_result_lower['group_by'] = parsed_result['group_by']
+        if parsed_result_lower['field'] is None:
+            parsed_result_lower['field'] = 'count'
+    if isinstance(parsed_result.get('limit'), int) and parsed_result['limit'] > 0:
+        parsed_result_lower['limit'] = parsed_result['limit']
+
+    return parsed_result_lower
+
+def empty_parse_result() -> dict:
+    """
+    Returns a dictionary with all keys set to None, used when parsing fails.
+    """
     return {
         'action': None,
         'resource': None,
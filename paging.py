@@ -0,0 +1,80 @@
+import json
+import os
+
+# Objects requested per page when listing through paging
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "500"))
+
+# Ask the API server for PartialObjectMetadataList so that only metadata is
+# sent back, falling back to the full object list on servers that lack it.
+METADATA_ACCEPT = "application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1,application/json"
+METADATA_OBJECT_ACCEPT = "application/json;as=PartialObjectMetadata;g=meta.k8s.io;v=v1,application/json"
+
+
+def iter_list_pages(api_client, path, metadata_only=True, label_selector=None, field_selector=None,
+                    page_size=None):
+    """
+    Yields the pages of a list call as plain dicts, following `continue`
+    tokens. Responses are decoded as JSON without building client model
+    objects, and only one page is held in memory at a time.
+    """
+    continue_token = None
+    while True:
+        query_params = [('limit', page_size or LIST_PAGE_SIZE)]
+        if continue_token:
+            query_params.append(('continue', continue_token))
+        if label_selector:
+            query_params.append(('labelSelector', label_selector))
+        if field_selector:
+            query_params.append(('fieldSelector', field_selector))
+
+        resp = api_client.call_api(path, 'GET', query_params=query_params,
+                                   header_params={'Accept': METADATA_ACCEPT if metadata_only else 'application/json'},
+                                   auth_settings=['BearerToken'], _preload_content=False,
+                                   _return_http_data_only=True)
+        try:
+            page = json.loads(resp.data)
+        finally:
+            resp.release_conn()
+
+        yield page
+        continue_token = (page.get('metadata') or {}).get('continue')
+        if not continue_token:
+            return
+
+
+def iter_names(api_client, path, **kwargs):
+    """
+    Yields object names from a paged, metadata-only list.
+    """
+    for page in iter_list_pages(api_client, path, **kwargs):
+        for item in page.get('items') or []:
+            yield item['metadata']['name']
+
+
+def count_objects(api_client, path, label_selector=None, field_selector=None, page_size=None):
+    """
+    Counts the objects of a list call. When the server reports remainingItemCount
+    (it does for lists without selectors) the first page gives the exact total;
+    otherwise the metadata-only pages are walked and counted.
+    """
+    total = 0
+    for page in iter_list_pages(api_client, path, label_selector=label_selector,
+                                field_selector=field_selector, page_size=page_size):
+        total += len(page.get('items') or [])
+        remaining = (page.get('metadata') or {}).get('remainingItemCount')
+        if remaining is not None:
+            return total + remaining
+    return total
+
+
+def read_metadata(api_client, path):
+    """
+    Returns the metadata of a single object as a plain dict, without its spec and status.
+    """
+    resp = api_client.call_api(path, 'GET', header_params={'Accept': METADATA_OBJECT_ACCEPT},
+                               auth_settings=['BearerToken'], _preload_content=False,
+                               _return_http_data_only=True)
+    try:
+        return json.loads(resp.data).get('metadata') or {}
+    finally:
+        resp.release_conn()
@@ -0,0 +1,113 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from shared_store import SharedStore
+
+# Punctuation that does not change the meaning of a query. Hyphens, dots and
+# slashes are kept because they appear inside resource names.
+_PUNCTUATION_RE = re.compile(r"[?!,;:\"'`]")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a query so that trivially different phrasings share a cache entry.
+    Lowercases, drops punctuation and trailing periods, and collapses whitespace.
+    Example: "How many pods in 'default'?" becomes "how many pods in default".
+    """
+    normalized = _PUNCTUATION_RE.sub(' ', query.lower())
+    normalized = _WHITESPACE_RE.sub(' ', normalized).strip()
+    return normalized.rstrip('. ')
+
+
+def make_cache_key(query: str, version: str) -> str:
+    """
+    Builds the cache key for a query under a given prompt/model version.
+    """
+    return f"{version}|{normalize_query(query)}"
+
+
+class ParseCache:
+    """
+    LRU cache with per-entry TTL for parse results.
+    When `path` is set, entries are also written to a SQLite file so that a
+    restarted process starts warm and worker processes share their parses.
+    """
+
+    def __init__(self, max_size=1024, ttl=86400, path=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = SharedStore(path, 'parse_cache') if path else None
+
+    def get(self, key):
+        """
+        Returns a fresh copy of the cached value, or None on a miss or expiry.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(value)
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.get(key)
+                if row is not None:
+                    self._store(key, row[0], row[1])
+                    self.disk_hits += 1
+                    return json.loads(row[0])
+
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        """
+        Stores a JSON-serializable value in memory and, if enabled, on disk.
+        """
+        expires_at = time.time() + self.ttl
+        serialized = json.dumps(value)
+        with self._lock:
+            self._store(key, serialized, expires_at)
+            if self._db is not None:
+                self._db.set(key, serialized, expires_at)
+
+    def _store(self, key, serialized, expires_at):
+        self._entries[key] = (expires_at, serialized)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Drops every entry from memory and disk.
+        """
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.clear()
+
+    def stats(self):
+        """
+        Returns hit/miss counters and the current size.
+        """
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,281 @@
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from nlp_parser import parse_query, parse_query_async
+from action_mapper import map_action
+from parse_cache import normalize_query
+from singleflight import SingleFlight, AsyncSingleFlight
+import metrics
+import subscriptions
+from k8s_executor import (execute_with_prefetched, execute_action_async, group_prefetch_keys,
+                          prefetch_lists, prefetch_lists_async, stream_action)
+
+# Threads used to parse and execute the queries of a batch concurrently
+BATCH_THREADS = int(os.getenv("BATCH_THREADS", "16"))
+
+# Maximum number of queries accepted in one batch request
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "100"))
+
+# Characters of each answer written to the log; answers can be whole log payloads
+LOG_ANSWER_PREVIEW = int(os.getenv("LOG_ANSWER_PREVIEW", "200"))
+
+# Concurrent identical queries share one parse and one execution
+_query_flight = SingleFlight()
+_async_query_flight = AsyncSingleFlight()
+
+_batch_pool = ThreadPoolExecutor(max_workers=BATCH_THREADS, thread_name_prefix="batch")
+
+
+def answer_query(query: str, log_options: dict = None, cache_control: str = None) -> str:
+    """
+    Parses, maps and executes a query. Identical queries that arrive while
+    one is in flight wait for and share its answer. cache_control takes
+    Cache-Control style directives for the result cache.
+    """
+    key = (normalize_query(query), _options_key(log_options), cache_control)
+    return _query_flight.do(key, lambda: _answer_query(query, log_options, cache_control))
+
+
+async def answer_query_async(query: str, log_options: dict = None, cache_control: str = None) -> str:
+    """
+    Async variant of answer_query.
+    """
+    key = (normalize_query(query), _options_key(log_options), cache_control)
+    return await _async_query_flight.do(key, lambda: _answer_query_async(query, log_options, cache_control))
+
+
+def _options_key(log_options):
+    return tuple(sorted(log_options.items())) if log_options else None
+
+
+def _map_query(parsed_result, log_options):
+    """
+    Maps a parsed query, letting log options from the request override those parsed from the query.
+    """
+    if log_options:
+        parsed_result['log_options'] = dict(parsed_result.get('log_options') or {}, **log_options)
+    return map_action(parsed_result)
+
+
+def _answer_query(query, log_options=None, cache_control=None):
+    with metrics.stage('total'):
+        # Parse the query
+        with metrics.stage('parse'):
+            parsed_result = parse_query(query)
+        logging.info("Parsed result: %s", parsed_result)
+
+        # Map the action
+        with metrics.stage('map'):
+            mapped_action = _map_query(parsed_result, log_options)
+        logging.debug("Mapped action: %s", mapped_action)
+
+        # Execute the action and get the answer
+        with metrics.stage('execute', resource=str(mapped_action.get('resource'))):
+            answer = execute_with_prefetched(mapped_action, cache_control=cache_control)
+        logging.info("Generated answer (%d chars): %.*s", len(answer), LOG_ANSWER_PREVIEW, answer)
+        return answer
+
+
+async def _answer_query_async(query, log_options=None, cache_control=None):
+    with metrics.stage('total'):
+        # Parse the query
+        with metrics.stage('parse'):
+            parsed_result = await parse_query_async(query)
+        logging.info("Parsed result: %s", parsed_result)
+
+        # Map the action
+        with metrics.stage('map'):
+            mapped_action = _map_query(parsed_result, log_options)
+        logging.debug("Mapped action: %s", mapped_action)
+
+        # Execute the action and get the answer
+        with metrics.stage('execute', resource=str(mapped_action.get('resource'))):
+            answer = await execute_action_async(mapped_action, cache_control=cache_control)
+        logging.info("Generated answer (%d chars): %.*s", len(answer), LOG_ANSWER_PREVIEW, answer)
+        return answer
+
+
+def stream_query(query: str, log_options: dict = None):
+    """
+    Parses and maps a query and returns an iterator over its answer chunks.
+    """
+    with metrics.stage('parse'):
+        parsed_result = parse_query(query)
+    logging.info("Parsed result: %s", parsed_result)
+    with metrics.stage('map'):
+        mapped_action = _map_query(parsed_result, log_options)
+    logging.debug("Mapped action: %s", mapped_action)
+    return stream_action(mapped_action)
+
+
+async def stream_query_async(query: str, log_options: dict = None):
+    """
+    Async variant of stream_query. The returned iterator is synchronous and
+    should be consumed off the event loop.
+    """
+    with metrics.stage('parse'):
+        parsed_result = await parse_query_async(query)
+    logging.info("Parsed result: %s", parsed_result)
+    with metrics.stage('map'):
+        mapped_action = _map_query(parsed_result, log_options)
+    logging.debug("Mapped action: %s", mapped_action)
+    return stream_action(mapped_action)
+
+
+def subscribe_query(query: str):
+    """
+    Parses and maps a query and opens a subscription to its answer (see
+    subscriptions.subscribe for the errors raised).
+    """
+    with metrics.stage('parse'):
+        parsed_result = parse_query(query)
+    logging.info("Parsed result: %s", parsed_result)
+    with metrics.stage('map'):
+        mapped_action = map_action(parsed_result)
+    logging.debug("Mapped action: %s", mapped_action)
+    return subscriptions.subscribe(mapped_action)
+
+
+async def subscribe_query_async(query: str):
+    """
+    Async variant of subscribe_query. Opening the subscription, which may
+    wait for an informer to sync, runs off the event loop; the returned
+    subscription delivers its events on the loop and is iterated with async for.
+    """
+    with metrics.stage('parse'):
+        parsed_result = await parse_query_async(query)
+    logging.info("Parsed result: %s", parsed_result)
+    with metrics.stage('map'):
+        mapped_action = map_action(parsed_result)
+    logging.debug("Mapped action: %s", mapped_action)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, subscriptions.subscribe, mapped_action, loop)
+
+
+def format_subscription(subscription):
+    """
+    Frames subscription events as server-sent events, one per change, with
+    heartbeats as comments.
+    """
+    for event_type, data in subscription:
+        yield _subscription_frame(event_type, data)
+
+
+async def format_subscription_async(subscription):
+    """
+    Async variant of format_subscription for subscriptions opened with
+    subscribe_query_async.
+    """
+    async for event_type, data in subscription:
+        yield _subscription_frame(event_type, data)
+
+
+def _subscription_frame(event_type, data):
+    if event_type == 'heartbeat':
+        return ": keepalive\n\n"
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+def format_chunks(chunks, event_stream=False):
+    """
+    Frames answer chunks for a streaming HTTP response: plain text as is, or
+    one server-sent event per chunk when event_stream is set.
+    """
+    for chunk in chunks:
+        if event_stream:
+            yield ''.join(f"data: {line}\n" for line in chunk.rstrip('\n').split('\n')) + '\n'
+        else:
+            yield chunk
+
+
+def _unique_queries(queries):
+    """
+    Returns one representative query per normalized form, in order.
+    """
+    unique = {}
+    for query in queries:
+        unique.setdefault(normalize_query(query), query)
+    return unique
+
+
+def _batch_results(queries, answers):
+    """
+    Builds the per-query results of a batch from the answers of the unique queries.
+    """
+    results = []
+    for query in queries:
+        answer = answers[normalize_query(query)]
+        if isinstance(answer, Exception):
+            logging.error("Batch query failed: %s: %s", query, answer)
+            results.append({'query': query, 'error': "Internal server error."})
+        else:
+            results.append({'query': query, 'answer': answer})
+    return results
+
+
+def _safe(fn, *args):
+    try:
+        return fn(*args)
+    except Exception as e:
+        return e
+
+
+def answer_batch(queries: list, cache_control: str = None) -> list:
+    """
+    Answers a batch of queries. Duplicate queries are answered once, queries
+    are parsed concurrently, and actions on the same (resource, namespace)
+    are answered from a single shared list call.
+    """
+    unique = _unique_queries(queries)
+    keys = list(unique)
+
+    with metrics.stage('batch_parse', queries=len(keys)):
+        parsed = list(_batch_pool.map(lambda key: _safe(parse_query, unique[key]), keys))
+    mapped = {key: _safe(map_action, p) if not isinstance(p, Exception) else p
+              for key, p in zip(keys, parsed)}
+
+    actions = [m for m in mapped.values() if not isinstance(m, Exception)]
+    with metrics.stage('batch_prefetch'):
+        prefetched = prefetch_lists(group_prefetch_keys(actions))
+    logging.info("Batch of %d queries: %d unique, %d shared lists", len(queries), len(keys), len(prefetched))
+
+    def execute(key):
+        if isinstance(mapped[key], Exception):
+            return mapped[key]
+        return _safe(execute_with_prefetched, mapped[key], prefetched, cache_control)
+
+    with metrics.stage('batch_execute', queries=len(keys)):
+        answers = dict(zip(keys, _batch_pool.map(execute, keys)))
+    return _batch_results(queries, answers)
+
+
+async def answer_batch_async(queries: list, cache_control: str = None) -> list:
+    """
+    Async variant of answer_batch.
+    """
+    unique = _unique_queries(queries)
+    keys = list(unique)
+
+    with metrics.stage('batch_parse', queries=len(keys)):
+        parsed = await asyncio.gather(*[parse_query_async(unique[key]) for key in keys], return_exceptions=True)
+    mapped = {key: _safe(map_action, p) if not isinstance(p, Exception) else p
+              for key, p in zip(keys, parsed)}
+
+    actions = [m for m in mapped.values() if not isinstance(m, Exception)]
+    with metrics.stage('batch_prefetch'):
+        prefetched = await prefetch_lists_async(group_prefetch_keys(actions))
+    logging.info("Batch of %d queries: %d unique, %d shared lists", len(queries), len(keys), len(prefetched))
+
+    async def execute(key):
+        if isinstance(mapped[key], Exception):
+            return mapped[key]
+        try:
+            return await execute_action_async(mapped[key], prefetched, cache_control)
+        except Exception as e:
+            return e
+
+    with metrics.stage('batch_execute', queries=len(keys)):
+        answers = dict(zip(keys, await asyncio.gather(*[execute(key) for key in keys])))
+    return _batch_results(queries, answers)
@@ -0,0 +1,413 @@
+import re
+import threading
+import time
+import numpy as np
+from aggregates import condition_true
+
+# Label of the group of objects whose grouping column has no value
+NONE_LABEL = '<none>'
+
+# Registry of columnar indexes, keyed by pluralized resource name
+_indexes = {}
+
+
+def pod_restarts(pod):
+    statuses = pod.status.container_statuses if pod.status else None
+    return sum(cs.restart_count or 0 for cs in statuses or [])
+
+
+def pod_ready(pod):
+    statuses = pod.status.container_statuses if pod.status else None
+    return bool(statuses) and all(cs.ready for cs in statuses)
+
+
+# Columns of each resource type: name -> (kind, getter). "name" columns hold
+# object names, "category" columns small integer codes into the column's
+# distinct values, "int" and "bool" columns the values themselves. Getters
+# read client models and snapshot records alike.
+COLUMNS = {
+    'pods': {
+        'name': ('name', lambda pod: pod.metadata.name),
+        'namespace': ('category', lambda pod: pod.metadata.namespace),
+        'node': ('category', lambda pod: pod.spec.node_name if pod.spec else None),
+        'phase': ('category', lambda pod: pod.status.phase if pod.status else None),
+        'restarts': ('int', pod_restarts),
+        'containers': ('int', lambda pod: len(pod.spec.containers or []) if pod.spec else 0),
+        'ready': ('bool', pod_ready)
+    },
+    'deployments': {
+        'name': ('name', lambda deployment: deployment.metadata.name),
+        'namespace': ('category', lambda deployment: deployment.metadata.namespace),
+        'replicas': ('int', lambda deployment: (deployment.spec.replicas or 0) if deployment.spec else 0),
+        'available_replicas': ('int', lambda deployment: (deployment.status.available_replicas or 0)
+                               if deployment.status else 0),
+        'ready_replicas': ('int', lambda deployment: (deployment.status.ready_replicas or 0)
+                           if deployment.status else 0),
+        'available': ('bool', lambda deployment: bool(deployment.status) and
+                      condition_true(deployment.status.conditions, 'Available'))
+    },
+    'nodes': {
+        'name': ('name', lambda node: node.metadata.name),
+        'namespace': ('category', lambda node: node.metadata.namespace),
+        'ready': ('bool', lambda node: bool(node.status) and condition_true(node.status.conditions, 'Ready'))
+    }
+}
+
+# Group labels of boolean columns, for false and true
+BOOL_LABELS = {'ready': ('NotReady', 'Ready'), 'available': ('Unavailable', 'Available')}
+
+DTYPES = {'name': object, 'category': np.int32, 'int': np.int64, 'bool': np.bool_}
+
+# Comparison operators of filter predicates
+OPERATORS = {
+    '=': np.equal, '==': np.equal, '!=': np.not_equal,
+    '<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal
+}
+
+PREDICATE_PATTERN = re.compile(r"^\s*([a-z_]+)\s*(<=|>=|!=|==|=|<|>)\s*(.+?)\s*$")
+PREDICATE_SEPARATOR = re.compile(r"\s*,\s*|\s+and\s+", re.IGNORECASE)
+
+TRUE_WORDS = {'true', 'yes', '1'}
+FALSE_WORDS = {'false', 'no', '0'}
+
+
+def parse_where(where: str) -> list:
+    """
+    Parses a filter such as "restarts>5, phase!=Running" or
+    "available_replicas<replicas" into (column, operator, operand) triples.
+    Operands naming a column compare two columns; others are literals.
+    Raises ValueError for malformed predicates.
+    """
+    predicates = []
+    for part in filter(None, PREDICATE_SEPARATOR.split(where.strip())):
+        match = PREDICATE_PATTERN.match(part)
+        if match is None:
+            raise ValueError(f"invalid filter {part!r}, expected <column><operator><value>")
+        predicates.append((match.group(1), match.group(2), match.group(3).strip('\'"')))
+    return predicates
+
+
+def check_predicates(columns, predicates):
+    """
+    Raises ValueError for a predicate naming an unknown column or comparing
+    a column in a way it does not support.
+    """
+    for column, operator, operand in predicates:
+        if column not in columns:
+            raise ValueError(f"unknown column {column!r}, expected one of {', '.join(columns)}")
+        kind = columns[column][0]
+        if operand in columns:
+            if kind not in ('int', 'bool') or columns[operand][0] not in ('int', 'bool'):
+                raise ValueError(f"only numeric columns can be compared, not {column} and {operand}")
+        elif kind == 'int':
+            if not operand.lstrip('-').isdigit():
+                raise ValueError(f"{column} compares with a number, not {operand!r}")
+        elif operator not in ('=', '==', '!='):
+            raise ValueError(f"{column} only supports = and !=")
+        elif kind == 'bool' and operand.lower() not in TRUE_WORDS | FALSE_WORDS:
+            raise ValueError(f"{column} compares with true or false, not {operand!r}")
+
+
+def literal(kind, operand):
+    """
+    Returns the value a literal operand stands for in a column of the given
+    kind. Names compare exactly as written.
+    """
+    if kind == 'int':
+        return int(operand)
+    if kind == 'bool':
+        return operand.lower() in TRUE_WORDS
+    return operand
+
+
+def category_matches(value, operand):
+    """
+    Returns True if a category value equals an operand. Category values are
+    matched case-insensitively ("running" selects phase Running), and
+    NONE_LABEL selects objects without a value.
+    """
+    if value is None:
+        return operand == NONE_LABEL
+    return str(value).lower() == operand.lower()
+
+
+def matches(resource, obj, predicates):
+    """
+    Returns True if one object satisfies every predicate (checked with
+    check_predicates), compared the way ColumnarIndex.query compares its columns.
+    """
+    columns = COLUMNS[resource]
+    for column, operator, operand in predicates:
+        kind, getter = columns[column]
+        compare = OPERATORS[operator]
+        if operand in columns:
+            matched = compare(getter(obj), columns[operand][1](obj))
+        elif kind == 'category':
+            matched = category_matches(getter(obj), operand) == (compare is np.equal)
+        else:
+            matched = compare(getter(obj), literal(kind, operand))
+        if not matched:
+            return False
+    return True
+
+
+class ColumnarIndex:
+    """
+    Columnar snapshot of one resource type: one NumPy array per column of
+    COLUMNS, one row per object. Filters, group-by and top-k run as array
+    operations over every row at once instead of Python loops over objects.
+    Watch events overwrite single rows; rows of deleted objects are marked
+    dead and reused by later additions.
+    """
+
+    def __init__(self, resource, columns=None):
+        self.resource = resource
+        self.columns = columns or COLUMNS[resource]
+        self._lock = threading.Lock()
+        self._reset(0)
+        self.resource_version = None
+        self.synced = False
+        self.last_update = None
+        # Set when the index follows an informer store, which knows best how current it is
+        self.staleness_source = None
+
+    def _reset(self, capacity):
+        self._data = {column: np.empty(capacity, dtype=DTYPES[kind]) for column, (kind, _) in self.columns.items()}
+        self._live = np.zeros(capacity, dtype=np.bool_)
+        self._values = {column: [] for column, (kind, _) in self.columns.items() if kind == 'category'}
+        self._codes = {column: {} for column in self._values}
+        self._rows = {}   # (namespace, name) -> row
+        self._free = []   # rows of deleted objects
+        self._size = 0    # rows in use, live or dead
+
+    def _code(self, column, value):
+        codes = self._codes[column]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self._values[column])
+            self._values[column].append(value)
+        return code
+
+    def replace(self, items, resource_version=None):
+        """
+        Rebuilds the columns from a full list of objects.
+        """
+        items = list(items)
+        with self._lock:
+            self._reset(len(items))
+            for column, (kind, getter) in self.columns.items():
+                if kind == 'category':
+                    values = (self._code(column, getter(obj)) for obj in items)
+                else:
+                    values = (getter(obj) for obj in items)
+                self._data[column] = np.fromiter(values, dtype=DTYPES[kind], count=len(items))
+            self._live[:] = True
+            self._rows = {(obj.metadata.namespace, obj.metadata.name): row for row, obj in enumerate(items)}
+            self._size = len(items)
+            self.resource_version = resource_version
+            self.synced = True
+            self.last_update = time.monotonic()
+
+    def update(self, old, new):
+        """
+        Applies one change: old is None for an added object, new is None for a deleted one.
+        """
+        with self._lock:
+            if old is not None:
+                row = self._rows.pop((old.metadata.namespace, old.metadata.name), None)
+                if row is not None:
+                    self._live[row] = False
+                    self._free.append(row)
+            if new is not None:
+                self._write(self._allocate(), new)
+                self.resource_version = new.metadata.resource_version
+            self.last_update = time.monotonic()
+
+    def _allocate(self):
+        if self._free:
+            return self._free.pop()
+        if self._size == len(self._live):
+            capacity = max(16, 2 * self._size)
+            for column, array in self._data.items():
+                grown = np.empty(capacity, dtype=array.dtype)
+                grown[:self._size] = array[:self._size]
+                self._data[column] = grown
+            live = np.zeros(capacity, dtype=np.bool_)
+            live[:self._size] = self._live[:self._size]
+            self._live = live
+        self._size += 1
+        return self._size - 1
+
+    def _write(self, row, obj):
+        for column, (kind, getter) in self.columns.items():
+            value = getter(obj)
+            self._data[column][row] = self._code(column, value) if kind == 'category' else value
+        self._live[row] = True
+        self._rows[(obj.metadata.namespace, obj.metadata.name)] = row
+
+    def query(self, where=(), group_by=None, metric='count', column=None, sort='desc', limit=None,
+              namespace=None):
+        """
+        Runs one query over the objects of `namespace` (every namespace if
+        None) that match every (column, operator, operand) predicate of
+        `where`. Returns (rows, total):
+
+        - with `group_by`, rows are (group, value) pairs of `metric` ('count'
+          or 'sum' of `column`) per distinct value of the grouping column;
+        - with metric 'list', rows are (name, value of `column`) pairs of the
+          matching objects, qualified with their namespace when not scoped;
+        - otherwise rows are empty and only the total is computed.
+
+        Rows are ordered by value (`sort` 'desc' or 'asc', then by key) when
+        a value is computed, and cut to the first `limit`. The total covers
+        every match, before the limit. Raises ValueError for unknown columns
+        and comparisons a column does not support.
+        """
+        if metric not in ('count', 'sum', 'list'):
+            raise ValueError(f"unsupported metric {metric!r}")
+        if metric == 'sum' and column is None:
+            raise ValueError("a sum needs a column")
+        for name in filter(None, (group_by, column)):
+            self._kind(name)
+        check_predicates(self.columns, where)
+        if group_by is not None and self._kind(group_by) not in ('category', 'bool'):
+            raise ValueError(f"cannot group by {group_by}")
+        if column is not None and self._kind(column) not in ('int', 'bool'):
+            raise ValueError(f"{column} is not numeric")
+
+        with self._lock:
+            data = {name: array[:self._size] for name, array in self._data.items()}
+            mask = self._live[:self._size].copy()
+            if namespace is not None:
+                mask &= self._equals('namespace', data['namespace'], namespace)
+            for predicate in where:
+                mask &= self._predicate(data, *predicate)
+            matches = np.flatnonzero(mask)
+            values = data[column][matches].astype(np.int64) if column is not None else None
+
+            if group_by is not None:
+                return self._group(data[group_by][matches], group_by, metric, values, sort, limit)
+            if metric == 'list':
+                return self._list(data, matches, values, sort, limit, qualify=namespace is None)
+            return [], int(values.sum()) if metric == 'sum' else len(matches)
+
+    def _kind(self, column):
+        if column not in self.columns:
+            raise ValueError(f"unknown column {column!r} for {self.resource}, "
+                             f"expected one of {', '.join(self.columns)}")
+        return self.columns[column][0]
+
+    def _equals(self, column, array, value):
+        code = self._codes[column].get(value)
+        return array == code if code is not None else np.zeros(len(array), dtype=np.bool_)
+
+    def _predicate(self, data, column, operator, operand):
+        kind = self.columns[column][0]
+        compare = OPERATORS[operator]
+        if operand in self.columns:
+            return compare(data[column], data[operand])
+        if kind == 'category':
+            codes = [code for value, code in self._codes[column].items() if category_matches(value, operand)]
+            matched = np.isin(data[column], codes)
+            return matched if compare is np.equal else ~matched
+        return compare(data[column], literal(kind, operand))
+
+    def _group(self, codes, group_by, metric, values, sort, limit):
+        if self.columns[group_by][0] == 'bool':
+            labels = list(BOOL_LABELS.get(group_by, ('false', 'true')))
+            codes = codes.astype(np.int64)
+        else:
+            labels = [NONE_LABEL if value is None else str(value) for value in self._values[group_by]]
+        counts = np.bincount(codes, minlength=len(labels))
+        totals = counts if metric == 'count' else np.bincount(codes, weights=values, minlength=len(labels))
+        present = np.flatnonzero(counts)
+        rows = [(labels[code], int(totals[code])) for code in present]
+        rows.sort(key=lambda row: (-row[1] if sort == 'desc' else row[1], row[0]))
+        return rows[:limit] if limit else rows, int(totals[present].sum())
+
+    def _list(self, data, matches, values, sort, limit, qualify):
+        if values is not None:
+            keys = -values if sort == 'desc' else values
+            if limit and limit < len(matches):
+                # Only the first `limit` rows are ordered: O(n) selection, then a small sort
+                top = np.argpartition(keys, limit - 1)[:limit]
+                order = top[np.argsort(keys[top], kind='stable')]
+            else:
+                order = np.argsort(keys, kind='stable')
+        else:
+            order = np.arange(min(limit, len(matches)) if limit else len(matches))
+        rows = []
+        names = data['name']
+        namespace_values = self._values['namespace']
+        namespaces = data['namespace']
+        for position in order:
+            row = matches[position]
+            name = names[row]
+            if qualify and namespace_values[namespaces[row]] is not None:
+                name = f"{namespace_values[namespaces[row]]}/{name}"
+            rows.append((name, int(values[position]) if values is not None else None))
+        return rows, len(matches)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._rows)
+
+    def staleness(self):
+        """
+        Returns the number of seconds since the columns were last known to be current.
+        """
+        if self.staleness_source is not None:
+            return self.staleness_source()
+        if self.last_update is None:
+            return None
+        return time.monotonic() - self.last_update
+
+
+class StoreListener:
+    """
+    Forwards informer store changes to a columnar index.
+    """
+
+    def __init__(self, index):
+        self.index = index
+
+    def on_replace(self, items, resource_version):
+        self.index.replace(items, resource_version)
+
+    def on_update(self, old, new):
+        self.index.update(old, new)
+
+
+def from_items(resource, items):
+    """
+    Builds a columnar index of a list of objects without registering it, for
+    resources that have no informer.
+    """
+    index = ColumnarIndex(resource)
+    index.replace(items)
+    return index
+
+
+def attach(resource, store):
+    """
+    Creates and registers an index that is kept up to date from an informer store's events.
+    """
+    index = ColumnarIndex(resource)
+    index.staleness_source = store.staleness
+    store.add_listener(StoreListener(index))
+    _indexes[resource] = index
+    return index
+
+
+def get_index(resource, max_staleness=None):
+    """
+    Returns the synced index for a resource, or None if there is none or it
+    is older than `max_staleness` seconds.
+    """
+    index = _indexes.get(resource)
+    if index is None or not index.synced:
+        return None
+    staleness = index.staleness()
+    if staleness is None or (max_staleness is not None and staleness > max_staleness):
+        return None
+    return index
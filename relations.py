@@ -0,0 +1,180 @@
+import threading
+
+# Resource types whose informer stores feed the relation index
+RELATION_RESOURCES = ('deployments', 'replicasets', 'pods', 'cronjobs', 'jobs', 'endpoints')
+
+# Resource types on the owner-reference path from an owner type to a
+# descendant type, e.g. a Deployment owns ReplicaSets, which own Pods
+OWNER_PATHS = {
+    ('deployments', 'replicasets'): ('deployments', 'replicasets'),
+    ('deployments', 'pods'): ('deployments', 'replicasets', 'pods'),
+    ('replicasets', 'pods'): ('replicasets', 'pods'),
+    ('jobs', 'pods'): ('jobs', 'pods'),
+    ('cronjobs', 'jobs'): ('cronjobs', 'jobs'),
+    ('cronjobs', 'pods'): ('cronjobs', 'jobs', 'pods')
+}
+
+# Resource types a service-to-pods lookup needs: the service's Endpoints name its pods
+SERVICE_PATH = ('endpoints', 'pods')
+
+_index = None
+
+
+class RelationIndex:
+    """
+    In-memory relationship indexes kept current from informer store events:
+    owner uid to the uids of the objects it owns (from ownerReferences), and
+    service to the names of the pods its Endpoints route to. Related-resource
+    questions become dictionary lookups instead of chains of API calls.
+    """
+
+    def __init__(self, stores=None):
+        self._lock = threading.RLock()
+        self.stores = stores or {}
+        self._uids = {}         # (resource, namespace, name) -> uid
+        self._keys = {}         # uid -> (resource, namespace, name)
+        self._owners = {}       # uid -> uids of its owners
+        self._children = {}     # owner uid -> uids of the objects it owns
+        self._by_resource = {}  # resource -> uids of its objects
+        self._endpoints = {}    # (namespace, service) -> names of its pods
+
+    def replace(self, resource, items):
+        """
+        Replaces every entry of a resource type with the result of a full list.
+        """
+        with self._lock:
+            if resource == 'endpoints':
+                self._endpoints = {}
+            for uid in list(self._by_resource.get(resource, ())):
+                self._remove_uid(uid)
+            for obj in items:
+                self._add(resource, obj)
+
+    def update(self, resource, old, new):
+        """
+        Applies a watch event: old is None for additions, new is None for deletions.
+        """
+        with self._lock:
+            if old is not None:
+                self._remove(resource, old)
+            if new is not None:
+                self._add(resource, new)
+
+    def _add(self, resource, obj):
+        metadata = obj.metadata
+        if resource == 'endpoints':
+            pods = set()
+            for subset in obj.subsets or []:
+                for address in subset.addresses or []:
+                    if address.target_ref is not None and address.target_ref.kind == 'Pod':
+                        pods.add(address.target_ref.name)
+            self._endpoints[(metadata.namespace, metadata.name)] = pods
+            return
+        uid = metadata.uid
+        self._uids[(resource, metadata.namespace, metadata.name)] = uid
+        self._keys[uid] = (resource, metadata.namespace, metadata.name)
+        self._by_resource.setdefault(resource, set()).add(uid)
+        owners = [ref.uid for ref in metadata.owner_references or []]
+        self._owners[uid] = owners
+        for owner in owners:
+            self._children.setdefault(owner, set()).add(uid)
+
+    def _remove(self, resource, obj):
+        metadata = obj.metadata
+        if resource == 'endpoints':
+            self._endpoints.pop((metadata.namespace, metadata.name), None)
+            return
+        uid = self._uids.get((resource, metadata.namespace, metadata.name))
+        if uid is not None:
+            self._remove_uid(uid)
+
+    def _remove_uid(self, uid):
+        key = self._keys.pop(uid, None)
+        if key is None:
+            return
+        self._uids.pop(key, None)
+        self._by_resource.get(key[0], set()).discard(uid)
+        for owner in self._owners.pop(uid, ()):
+            children = self._children.get(owner)
+            if children is not None:
+                children.discard(uid)
+                if not children:
+                    del self._children[owner]
+
+    def descendants(self, resource, namespace, name, target):
+        """
+        Returns the names of the `target` objects owned, directly or through
+        the intermediate types of OWNER_PATHS, by the named object. Returns
+        None if the named object is not in the index.
+        """
+        path = OWNER_PATHS[(resource, target)]
+        with self._lock:
+            uid = self._uids.get((resource, namespace, name))
+            if uid is None:
+                return None
+            frontier = {uid}
+            for hop in path[1:]:
+                frontier = {child for owner in frontier for child in self._children.get(owner, ())
+                            if self._keys[child][0] == hop}
+            return sorted(self._keys[uid][2] for uid in frontier)
+
+    def service_pods(self, namespace, service):
+        """
+        Returns the names of the pods a service routes to, or None if its Endpoints are not in the index.
+        """
+        with self._lock:
+            pods = self._endpoints.get((namespace, service))
+            return None if pods is None else sorted(pods)
+
+    def fresh(self, resources, max_staleness=None):
+        """
+        Returns True if the stores of every given resource type have synced
+        and are at most `max_staleness` seconds old.
+        """
+        for resource in resources:
+            store = self.stores.get(resource)
+            if store is None or not store.synced:
+                return False
+            if max_staleness is not None and store.staleness() > max_staleness:
+                return False
+        return True
+
+
+class StoreListener:
+    """
+    Forwards one informer store's changes to the relation index.
+    """
+
+    def __init__(self, index, resource):
+        self.index = index
+        self.resource = resource
+
+    def on_replace(self, items, resource_version):
+        self.index.replace(self.resource, items)
+
+    def on_update(self, old, new):
+        self.index.update(self.resource, old, new)
+
+
+def attach(stores):
+    """
+    Creates and registers the relation index, kept up to date from the
+    informer stores of RELATION_RESOURCES (a dict of resource to Store).
+    """
+    global _index
+    index = RelationIndex(stores)
+    for resource, store in stores.items():
+        store.add_listener(StoreListener(index, resource))
+    _index = index
+    return index
+
+
+def get_index(resources, max_staleness=None):
+    """
+    Returns the relation index if the stores of the given resource types are
+    synced and fresh, otherwise None.
+    """
+    index = _index
+    if index is None or not index.fresh(resources, max_staleness):
+        return None
+    return index
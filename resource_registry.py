@@ -0,0 +1,164 @@
+import functools
+import re
+
+_CAMEL_BOUNDARY = re.compile(r'_([a-z])')
+
+
+@functools.lru_cache(maxsize=None)
+def camel_case(name: str) -> str:
+    """
+    Converts a client model attribute name to its JSON key: "resource_version" to "resourceVersion".
+    """
+    return _CAMEL_BOUNDARY.sub(lambda match: match.group(1).upper(), name)
+
+
+class ResourceType:
+    """
+    Registry entry of a resource type: where its REST endpoints are, whether
+    it is namespaced, the client callables that list and read it, and how a
+    field of one of its objects is answered. The executor dispatches on a
+    single lookup of the resource name in the registry.
+
+    `list_all` is the cluster-wide list callable that informers list and
+    watch with; `list_namespaced(namespace)` and `read(name, namespace)`
+    ignore the namespace for cluster-scoped types. `describe(obj, field)`
+    answers a field of one object. `get(resource_type, name, namespace,
+    field, related_to)` replaces the default get action (read one object by
+    name and describe it) for types that need more. `decode` builds the
+    stored object from the raw JSON of a watch event, for types whose watch
+    events are not deserialized into client models.
+    """
+
+    def __init__(self, name, api_prefix, kind, namespaced=True, list_all=None, list_namespaced=None,
+                 read=None, describe=None, get=None, decode=None, simplify_names=True):
+        self.name = name
+        self.api_prefix = api_prefix
+        self.kind = kind
+        self.namespaced = namespaced
+        self.list_all = list_all
+        self.list_namespaced = list_namespaced
+        self.read = read
+        self.describe = describe
+        self.get = get
+        self.decode = decode
+        # Whether listed names drop their generated suffix (see k8s_executor.simplify_name)
+        self.simplify_names = simplify_names
+
+    def scope(self, namespace):
+        """
+        Returns the namespace objects of this type are looked up in: None for cluster-scoped types.
+        """
+        return namespace if self.namespaced else None
+
+    def list_path(self, namespace=None):
+        """
+        Returns the REST path of the list endpoint, cluster-wide if namespace is None.
+        """
+        if namespace and self.namespaced:
+            return f"{self.api_prefix}/namespaces/{namespace}/{self.name}"
+        return f"{self.api_prefix}/{self.name}"
+
+
+class CustomObject(dict):
+    """
+    A custom object's JSON with attribute access in the style of the client's
+    models, so the executor, informers and aggregates handle it like a typed
+    object: obj.metadata.resource_version reads obj['metadata']['resourceVersion'],
+    and missing keys read as None.
+    """
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return self.get(camel_case(name), self.get(name))
+
+
+class CustomObjectList:
+    """
+    A custom object list response, shaped like the client's list models.
+    """
+
+    def __init__(self, response):
+        self.metadata = wrap(response.get('metadata') or {})
+        self.items = [wrap(item) for item in response.get('items') or []]
+
+
+def wrap(value):
+    """
+    Converts decoded JSON into CustomObjects, recursively.
+    """
+    if isinstance(value, dict):
+        return CustomObject((key, wrap(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return [wrap(item) for item in value]
+    return value
+
+
+class _ClusterCustomObjectLister:
+    """
+    Cluster-wide list callable of a custom resource. Watch requests get the
+    raw streaming response; plain lists are wrapped as CustomObjectList.
+    """
+
+    def __init__(self, custom_api, group, version, plural):
+        self.custom_api = custom_api
+        self.group, self.version, self.plural = group, version, plural
+
+    def __call__(self, **kwargs):
+        response = self.custom_api.list_cluster_custom_object(self.group, self.version, self.plural, **kwargs)
+        return response if kwargs.get('watch') else CustomObjectList(response)
+
+
+def parse_custom_resources(spec: str) -> list:
+    """
+    Parses custom resources written as "certificates.cert-manager.io/v1,
+    clusterissuers.cert-manager.io/v1:cluster=ClusterIssuer" (plural.group/version,
+    with ":cluster" for cluster-scoped types and "=Kind" for the kind) into
+    (plural, group, version, namespaced, kind) tuples; kind is None when not given.
+    """
+    resources = []
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        item, _, kind = item.partition('=')
+        item, _, scope = item.partition(':')
+        name, _, version = item.partition('/')
+        plural, _, group = name.partition('.')
+        if not (plural and group and version):
+            raise ValueError(f"Invalid custom resource {item!r}, expected plural.group/version")
+        resources.append((plural, group, version, scope.strip() != 'cluster', kind.strip() or None))
+    return resources
+
+
+def discover_kind(custom_api, group, version, plural):
+    """
+    Returns the kind of a custom resource as the API server's discovery
+    reports it. Raises ValueError if the group version does not serve it.
+    """
+    for resource in custom_api.get_api_resources(group, version).resources:
+        if resource.name == plural:
+            return resource.kind
+    raise ValueError(f"The API server does not serve {plural}.{group}/{version}")
+
+
+def custom_resource_type(custom_api, plural, group, version, namespaced=True, kind=None, describe=None):
+    """
+    Builds the registry entry of a custom resource served through CustomObjectsApi.
+    Its kind, which events and owner references name it by, is looked up
+    through discovery unless given.
+    """
+    if namespaced:
+        def list_namespaced(namespace):
+            return CustomObjectList(custom_api.list_namespaced_custom_object(group, version, namespace, plural))
+
+        def read(name, namespace):
+            return wrap(custom_api.get_namespaced_custom_object(group, version, namespace, plural, name))
+    else:
+        def list_namespaced(namespace):
+            return CustomObjectList(custom_api.list_cluster_custom_object(group, version, plural))
+
+        def read(name, namespace):
+            return wrap(custom_api.get_cluster_custom_object(group, version, plural, name))
+
+    kind = kind or discover_kind(custom_api, group, version, plural)
+    return ResourceType(plural, f"/apis/{group}/{version}", kind, namespaced=namespaced,
+                        list_all=_ClusterCustomObjectLister(custom_api, group, version, plural),
+                        list_namespaced=list_namespaced, read=read, describe=describe, decode=wrap)
@@ -0,0 +1,169 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from shared_store import SharedStore
+
+
+def parse_ttls(spec: str) -> dict:
+    """
+    Parses per-resource TTLs written as "nodes=30,pods=2".
+    """
+    ttls = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        resource, _, seconds = item.partition('=')
+        ttls[resource.strip()] = float(seconds)
+    return ttls
+
+
+def parse_cache_control(value):
+    """
+    Parses a Cache-Control style directive into (no_cache, max_age).
+    "no-cache" forces a fresh read; "max-age=N" accepts answers at most N seconds old.
+    """
+    no_cache, max_age = False, None
+    for directive in filter(None, (part.strip().lower() for part in (value or '').split(','))):
+        if directive in ('no-cache', 'no-store'):
+            no_cache = True
+        elif directive.startswith('max-age='):
+            try:
+                max_age = float(directive.split('=', 1)[1])
+            except ValueError:
+                pass
+    return no_cache, max_age
+
+
+def make_result_key(mapped_action: dict) -> str:
+    """
+    Builds the cache key of a mapped action: its canonical JSON form.
+    """
+    return json.dumps(mapped_action, sort_keys=True, default=str)
+
+
+class ResultCache:
+    """
+    LRU cache of executed action answers with per-resource TTLs.
+    Resources without a TTL (and log actions) are never cached. An expired
+    entry that recorded the resourceVersion of the object it was built from
+    is revalidated: if the object is unchanged, the entry is renewed instead
+    of executing the action again. When `path` is set, answers are also
+    written to a SQLite file shared by all worker processes.
+    """
+
+    def __init__(self, max_size=4096, ttls=None, path=None):
+        self.max_size = max_size
+        self.ttls = ttls or {}
+        self.hits = 0
+        self.shared_hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = SharedStore(path, 'result_cache') if path else None
+
+    def ttl_for(self, mapped_action: dict) -> float:
+        if mapped_action.get('action_type') == 'logs':
+            return 0
+        return self.ttls.get(mapped_action.get('resource'), 0)
+
+    def get_or_execute(self, mapped_action: dict, execute, revalidate=None, cache_control=None):
+        """
+        Returns the cached answer of an action, or executes it.
+        execute() returns (answer, validator, cacheable): validator identifies
+        the single object version the answer was built from, or None, and
+        cacheable is False for answers that must not be stored, such as errors.
+        revalidate(validator) returns True while that object is unchanged.
+        """
+        ttl = self.ttl_for(mapped_action)
+        if ttl <= 0 or self.max_size <= 0:
+            return execute()[0]
+
+        key = make_result_key(mapped_action)
+        no_cache, max_age = parse_cache_control(cache_control)
+        if not no_cache:
+            answer = self._lookup(key, max_age, revalidate, ttl)
+            if answer is not None:
+                return answer
+
+        answer, validator, cacheable = execute()
+        if cacheable:
+            self._store(key, answer, validator, ttl)
+        return answer
+
+    def _lookup(self, key, max_age, revalidate, ttl):
+        now = time.time()
+
+        def fresh(entry):
+            _, stored_at, expires_at, _ = entry
+            return expires_at > now and (max_age is None or now - stored_at <= max_age)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and fresh(entry):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        # Another worker may have stored a fresher answer
+        if self._db is not None:
+            shared = self._load_shared(key)
+            if shared is not None and fresh(shared):
+                with self._lock:
+                    self._put(key, shared)
+                    self.shared_hits += 1
+                return shared[0]
+            entry = entry or shared
+
+        # Revalidation calls the API server, so it runs outside the lock
+        if entry is not None and entry[3] is not None and revalidate is not None and revalidate(entry[3]):
+            self._store(key, entry[0], entry[3], ttl)
+            with self._lock:
+                self.revalidated += 1
+            return entry[0]
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self.misses += 1
+        return None
+
+    def _load_shared(self, key):
+        row = self._db.get(key)
+        if row is None:
+            return None
+        answer, stored_at, validator = json.loads(row[0])
+        return answer, stored_at, row[1], tuple(validator) if validator else None
+
+    def _put(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _store(self, key, answer, validator, ttl):
+        now = time.time()
+        with self._lock:
+            self._put(key, (answer, now, now + ttl, validator))
+        if self._db is not None:
+            self._db.set(key, json.dumps([answer, now, validator]), now + ttl)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.clear()
+
+    def stats(self):
+        """
+        Returns hit/revalidation/miss counters and the current size.
+        """
+        with self._lock:
+            served = self.hits + self.shared_hits + self.revalidated
+            lookups = served + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'revalidated': self.revalidated,
+                'misses': self.misses,
+                'hit_rate': round(served / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,398 @@
+import json
+import re
+import sys
+import time
+
+# Fields understood by map_action and the executor, checked in order.
+# More specific phrases come first so that "how many containers" wins over "how many".
+FIELD_PATTERNS = [
+    ('logs', re.compile(r"\blogs?\b|\b(?:errors?|warnings?|exceptions?) (?:in|from|of|for) (?:the )?(?:pod|job)\b")),
+    ('container_count', re.compile(r"\b(?:how many|number of|count of) containers\b")),
+    ('containers', re.compile(r"\bcontainers\b")),
+    ('restart_count', re.compile(r"\brestart(?:s| count)\b")),
+    ('replicas', re.compile(r"\breplicas\b")),
+    ('labels', re.compile(r"\blabels?\b")),
+    ('image', re.compile(r"\b(?:container )?images?\b")),
+    ('cluster_ip', re.compile(r"\bcluster ?ip\b")),
+    ('external_ip', re.compile(r"\bexternal ?ip\b")),
+    ('hosts', re.compile(r"\bhost(?:s|names?)\b")),
+    ('schedule', re.compile(r"\bschedule\b")),
+    ('completions', re.compile(r"\bcompletions\b")),
+    ('node', re.compile(r"\b(?:which|what) node\b|\brunning on\b")),
+    ('type', re.compile(r"\btype of\b")),
+    ('status', re.compile(r"\b(?:status|state)\b")),
+    ('count', re.compile(r"\b(?:how many|number of|count of)\b")),
+]
+
+LIST_PATTERN = re.compile(r"\b(?:list|show all|get all|what are the|which)\b")
+
+# Phrasings that need relationship, filter or attribute understanding the rules do not have.
+# Queries matching these always go to the LLM.
+UNSUPPORTED_PATTERN = re.compile(
+    r"\b(?:spawned|created by|owned by|belong|managed by|age|ip address|last completed)\b"
+    r"|\b(?:except|without|only)\b|\bnot\b(?! (?:in )?(?:running|pending|failed|succeeded|unknown)\b)"
+    r"|(?<!events )\brelated to\b")
+
+# Log filters: a time window such as "last hour" / "past 10 minutes" and a severity keyword
+LOG_WINDOW_PATTERN = re.compile(r"\b(?:last|past) (?:(\d+) )?(second|minute|hour|day)s?\b")
+LOG_GREP_PATTERN = re.compile(r"\b(error|warn|exception)(?:s|ings?)?\b")
+UNIT_SECONDS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+# Event type filters: "warning events", "normal events". Warnings that are
+# not about logs are Warning events: "warnings for deployment web"
+EVENT_TYPE_PATTERN = re.compile(r"\b(warning|normal)s?\b")
+WARNINGS_PATTERN = re.compile(r"\bwarnings\b")
+
+# Cluster-wide scope. "in the cluster" only widens namespaced resources.
+ALL_NAMESPACES_PATTERN = re.compile(
+    r"\b(?:across|in|from) (?:all|every) namespaces?\b|\bacross (?:the )?cluster\b|\bcluster[- ]wide\b"
+    r"|\bin (?:the )?(?:whole |entire )?cluster\b")
+
+# Pod phase filters pushed down as field selectors: "not running", "pending pods", "pods in failed state"
+NOT_PHASE_PATTERN = re.compile(r"\bnot (?:in )?(running|pending|failed|succeeded|unknown)\b")
+PHASE_PATTERN = re.compile(r"\b(pending|failed|succeeded|unknown) pods?\b"
+                           r"|\bpods? (?:that are |which are )?(?:in )?(?:the )?(running|pending|failed|succeeded|unknown) "
+                           r"(?:state|phase)\b")
+
+# Label selectors: "with label app=web", "labelled tier=frontend"
+LABEL_SELECTOR_PATTERN = re.compile(r"\blabel(?:l?ed)? ([a-z0-9./_-]+!?=[a-z0-9._-]+)")
+
+# Group-by aggregations: "by namespace", "per node", "grouped by phase"
+GROUP_BY_PATTERN = re.compile(r"\b(?:grouped )?(?:by|per) (namespace|phase|status|node)\b")
+
+# Top-k questions: "top 5 pods by restarts"
+TOP_PATTERN = re.compile(r"\btop (\d+)\b")
+
+# Column comparisons answered by the query engine, as (pattern, resources, where)
+# where may refer to the pattern's groups: "more than 3 restarts",
+# "fewer available than desired replicas", "unready nodes"
+WHERE_PATTERNS = [
+    (re.compile(r"\b(?:more than|over|above) (\d+) restarts\b|\brestarts? (?:more than|over|above) (\d+)\b"),
+     {'pods'}, lambda m: f"restarts>{m.group(1) or m.group(2)}"),
+    (re.compile(r"\b(?:fewer|less) (available|ready)(?: replicas)? than (?:desired|requested)(?: replicas)?\b"),
+     {'deployments'}, lambda m: f"{m.group(1)}_replicas<replicas"),
+    (re.compile(r"\bunready\b"), {'pods', 'nodes'}, lambda m: "ready=false")
+]
+
+# Fields a filtered, grouped or top-k list question can total or rank by
+QUERY_FIELDS = (None, 'count', 'restart_count', 'replicas')
+
+NAMESPACE_PATTERNS = [
+    re.compile(r"\bin (?:the )?([a-z0-9][a-z0-9-]*) namespace\b"),
+    re.compile(r"\b(?:in|from) (?:the )?namespace ([a-z0-9][a-z0-9-]*)\b"),
+]
+
+# Quoted names: 'example-pod' or "example-pod"
+QUOTED_NAME_PATTERN = re.compile(r"['\"]([A-Za-z0-9][A-Za-z0-9.-]*)['\"]")
+
+# Events asked about another object: "events related to pod web-1"
+RELATED_TO_PATTERN = re.compile(r"\brelated to\b")
+
+# "in <word>": a bare namespace ("pods in default") unless the word has
+# another reading, a phase or a time window ("in the last hour")
+IN_WORD_PATTERN = re.compile(r"\bin (?:the )?([a-z0-9][a-z0-9-]*)\b")
+IN_WORDS = {'namespace', 'cluster', 'state', 'phase', 'pod', 'job', 'last', 'past',
+            'running', 'pending', 'failed', 'succeeded', 'unknown'}
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:['.=!<>-][a-z0-9]+)*")
+
+# Words a query may contain besides the phrases the rules recognize. Any
+# other word is content the rules did not understand, and the query goes to the LLM.
+FILLER_WORDS = {
+    'a', 'an', 'the', 'is', 'are', 'was', 'be', 'in', 'on', 'of', 'for', 'to', 'from', 'at', 'me', 'i',
+    'what', "what's", 'whats', 'which', 'how', 'many', 'much', 'there', 'do', 'does', 'did', 'can', 'you',
+    'please', 'show', 'get', 'give', 'tell', 'find', 'display', 'fetch', 'current', 'currently', 'all',
+    'every', 'each', 'my', 'this', 'that', 'these', 'those', 'it', 'its', 'with', 'and', 'by', 'have',
+    'has', 'named', 'called', 'set', 'configured', 'used', 'defined', 'assigned', 'exist', 'exists',
+    'running', 'available', 'scheduled', 'deployed', 'total', 'number', 'count', 'any', 'some', 'now',
+    'namespace', 'cluster', 'value', 'values', 'details', 'info', 'information', 'recent', 'latest'
+}
+
+# Words that can follow a resource keyword without being its name
+STOPWORDS = {
+    'a', 'an', 'the', 'is', 'are', 'in', 'on', 'of', 'for', 'to', 'have', 'has',
+    'named', 'called', 'running', 'available', 'there', 'configured', 'scheduled',
+    'does', 'do', 'with', 'and', 'set', 'used', 'by', 'that', 'this', 'all', 'my',
+    'not', 'per', 'across', 'labelled', 'labeled', 'pending', 'failed', 'succeeded', 'grouped'
+}
+
+
+class RuleParser:
+    """
+    Deterministic parser for the common query templates.
+    Returns the same dictionary shape as the LLM parser, or None when the
+    query is not recognized confidently and should fall back to the LLM.
+    """
+
+    def __init__(self, plural_rules):
+        # Both singular and plural spellings map to the plural resource name
+        self.resources = {}
+        for singular, plural in plural_rules.items():
+            self.resources[singular] = plural
+            self.resources[plural] = plural
+        words = sorted(self.resources, key=len, reverse=True)
+        self.resource_pattern = re.compile(r"\b(" + '|'.join(map(re.escape, words)) + r")\b")
+        self.named_pattern = re.compile(
+            r"\b(" + '|'.join(map(re.escape, words)) + r")(?: named| called)? ([a-z0-9][a-z0-9.-]*)\b")
+
+    def parse(self, query: str):
+        """
+        Parses a query with the rules, returning None if not confident.
+        """
+        text = query.strip().lower()
+        if not text or UNSUPPORTED_PATTERN.search(text):
+            return None
+
+        group_by = GROUP_BY_PATTERN.search(text)
+        # Scope, grouping and selector phrases are matched on their own and must not
+        # be read as a field ("label") or a name ("namespace cluster-wide")
+        plain_text = text
+        for pattern in (GROUP_BY_PATTERN, LABEL_SELECTOR_PATTERN, ALL_NAMESPACES_PATTERN, TOP_PATTERN,
+                        *(where_pattern for where_pattern, _, _ in WHERE_PATTERNS)):
+            plain_text = pattern.sub(' ', plain_text)
+        field = next((name for name, pattern in FIELD_PATTERNS if pattern.search(plain_text)), None)
+        resource = self._find_resource(text, field)
+        if resource is None:
+            return None
+
+        namespace = self._find_namespace(plain_text)
+        target_name = self._find_name(query, plain_text, namespace, resource)
+        if self._unrecognized(text, field, resource, target_name, namespace):
+            return None
+        filters = self._find_filters(text, resource)
+        if resource not in ('nodes', 'namespaces') and not target_name and ALL_NAMESPACES_PATTERN.search(text):
+            namespace = 'all'
+        if resource == 'events' and field != 'logs':
+            return self._parse_events(text, namespace, target_name, field)
+        if group_by and field is None:
+            field = 'count'
+
+        top = TOP_PATTERN.search(text)
+        limit = int(top.group(1)) if top else None
+        if (filters or group_by or limit) and (target_name or field not in QUERY_FIELDS):
+            # Filters and aggregations only apply to list, count and total questions
+            return None
+
+        if field == 'logs':
+            action = 'logs'
+            if not target_name:
+                return None
+        elif field == 'count' or filters or group_by or limit:
+            action = 'list'
+        elif target_name:
+            action = 'get'
+        elif LIST_PATTERN.search(text) and field is None:
+            action = 'list'
+        elif resource in ('nodes', 'namespaces') and field is None:
+            action = 'list'
+        else:
+            # A field question without a target name is ambiguous
+            return None
+
+        parsed = {
+            'action': action,
+            'resource': resource,
+            'target_name': target_name,
+            'namespace': namespace,
+            'field': field,
+            'related_to': {'resource': None, 'name': None}
+        }
+        if field == 'logs':
+            log_options = self._find_log_options(text)
+            if log_options:
+                parsed['log_options'] = log_options
+        if filters:
+            parsed['filters'] = filters
+        if group_by:
+            parsed['group_by'] = 'phase' if group_by.group(1) == 'status' else group_by.group(1)
+        if limit:
+            parsed['limit'] = limit
+        return parsed
+
+    def _parse_events(self, text, namespace, target_name, field):
+        """
+        Parses an events question: the events of a named pod, or of another
+        named resource given as related_to, or of a whole namespace, with an
+        optional event type and time window.
+        """
+        subjects = [self.resources[word] for word in self.resource_pattern.findall(text)]
+        owner = next((resource for resource in subjects if resource not in ('events', 'namespaces')), None)
+        related_to = {'resource': None, 'name': None}
+        if target_name and owner not in (None, 'pods'):
+            related_to = {'resource': owner, 'name': target_name}
+            target_name = None
+        filters = {}
+        event_type = EVENT_TYPE_PATTERN.search(text)
+        if event_type:
+            filters['field_selector'] = f"type={event_type.group(1).capitalize()}"
+        window = LOG_WINDOW_PATTERN.search(text)
+        if window:
+            filters['since_seconds'] = int(window.group(1) or 1) * UNIT_SECONDS[window.group(2)]
+        parsed = {
+            'action': 'get' if target_name or related_to['name'] else 'list',
+            'resource': 'events',
+            'target_name': target_name,
+            'namespace': namespace,
+            'field': field,
+            'related_to': related_to
+        }
+        if filters:
+            parsed['filters'] = filters
+        return parsed
+
+    def _find_filters(self, text, resource):
+        """
+        Returns label and field selectors and column comparisons mentioned in
+        the query. Phase filters only apply to pods.
+        """
+        filters = {}
+        label = LABEL_SELECTOR_PATTERN.search(text)
+        if label:
+            filters['label_selector'] = label.group(1)
+        where = [make(match) for pattern, resources, make in WHERE_PATTERNS
+                 if resource in resources for match in [pattern.search(text)] if match]
+        if where:
+            filters['where'] = ', '.join(where)
+        if resource == 'pods':
+            not_phase = NOT_PHASE_PATTERN.search(text)
+            phase = PHASE_PATTERN.search(text)
+            if not_phase:
+                filters['field_selector'] = f"status.phase!={not_phase.group(1).capitalize()}"
+            elif phase:
+                filters['field_selector'] = f"status.phase={(phase.group(1) or phase.group(2)).capitalize()}"
+        return filters
+
+    def _find_resource(self, text, field):
+        """
+        Returns the plural resource named in the query.
+        Mentions of "events" take precedence because event queries name a pod too.
+        """
+        matches = [self.resources[m] for m in self.resource_pattern.findall(text)]
+        # "namespace" usually qualifies another resource rather than being the subject
+        subjects = [r for r in matches if r != 'namespaces'] or matches
+        if 'events' in subjects or (field is None and WARNINGS_PATTERN.search(text)):
+            return 'events'
+        if field == 'containers' or field == 'container_count':
+            subjects = [r for r in subjects if r in ('pods', 'deployments')]
+        elif field == 'node':
+            subjects = [r for r in subjects if r != 'nodes']
+        return subjects[0] if subjects else None
+
+    def _find_log_options(self, text):
+        """
+        Returns log options for a time window and severity filter mentioned in the query.
+        """
+        log_options = {}
+        window = LOG_WINDOW_PATTERN.search(text)
+        if window:
+            log_options['since_seconds'] = int(window.group(1) or 1) * UNIT_SECONDS[window.group(2)]
+        severity = LOG_GREP_PATTERN.search(text)
+        if severity:
+            log_options['grep'] = severity.group(1)
+        return log_options
+
+    def _find_namespace(self, text):
+        """
+        Returns the namespace named by "in namespace X" or "in X namespace",
+        or else by a bare "in X" when X has no other reading.
+        """
+        text = text.replace("'", '').replace('"', '')
+        for pattern in NAMESPACE_PATTERNS:
+            match = pattern.search(text)
+            if match and match.group(1) not in STOPWORDS:
+                return match.group(1)
+        for match in IN_WORD_PATTERN.finditer(text):
+            word = match.group(1)
+            if word not in IN_WORDS and word not in self.resources and word not in STOPWORDS \
+                    and word not in FILLER_WORDS:
+                return word
+        return None
+
+    def _find_name(self, query, text, namespace, resource):
+        """
+        Returns the target resource name: a quoted token that is not the
+        namespace, or the token following a keyword of the queried resource
+        (of any resource for events, which are asked about other objects).
+        """
+        for name in QUOTED_NAME_PATTERN.findall(query):
+            if name.lower() != namespace:
+                return name
+        for keyword, name in self.named_pattern.findall(text):
+            if resource != 'events' and self.resources[keyword] != resource:
+                continue
+            if name not in STOPWORDS and name not in self.resources and name != namespace:
+                return name
+        return None
+
+    def _unrecognized(self, text, field, resource, target_name, namespace):
+        """
+        Returns the words of the query left once every phrase the rules
+        recognize is removed, other than FILLER_WORDS. A query with such
+        words is not understood in full, e.g. "pods failing in prod".
+        """
+        # Names first, as resource keywords also occur inside them ("example-pod")
+        rest = QUOTED_NAME_PATTERN.sub(' ', text)
+        if target_name:
+            rest = re.sub(r"(?<![\w.-])" + re.escape(target_name.lower()) + r"(?![\w.-])", ' ', rest)
+        rest = rest.replace("'", '').replace('"', '')
+        if namespace:
+            rest = re.sub(r"\bin (?:the )?" + re.escape(namespace) + r"\b", ' ', rest)
+        patterns = [GROUP_BY_PATTERN, LABEL_SELECTOR_PATTERN, ALL_NAMESPACES_PATTERN, TOP_PATTERN, LIST_PATTERN,
+                    *(where_pattern for where_pattern, _, _ in WHERE_PATTERNS), *NAMESPACE_PATTERNS]
+        patterns += [pattern for name, pattern in FIELD_PATTERNS if name == field]
+        if resource == 'pods':
+            patterns += [NOT_PHASE_PATTERN, PHASE_PATTERN]
+        if field == 'logs':
+            patterns += [LOG_WINDOW_PATTERN, LOG_GREP_PATTERN]
+        if resource == 'events':
+            patterns += [LOG_WINDOW_PATTERN, EVENT_TYPE_PATTERN, WARNINGS_PATTERN, RELATED_TO_PATTERN]
+        for pattern in patterns:
+            rest = pattern.sub(' ', rest)
+        rest = self.resource_pattern.sub(' ', rest)
+        words = WORD_PATTERN.findall(rest)
+        return [word for word in words if word not in FILLER_WORDS]
+
+
+def run_corpus(path, llm_latency):
+    """
+    Runs the rule parser over a labelled corpus and reports the fast-path hit
+    rate, accuracy on hits and the estimated LLM latency saved.
+    """
+    from nlp_parser import PLURAL_RULES
+
+    parser = RuleParser(PLURAL_RULES)
+    total = hits = correct = 0
+    elapsed = 0.0
+    with open(path) as corpus:
+        for line in corpus:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            total += 1
+            start = time.perf_counter()
+            parsed = parser.parse(entry['query'])
+            elapsed += time.perf_counter() - start
+            if parsed is None:
+                continue
+            hits += 1
+            if parsed == entry['expected']:
+                correct += 1
+            else:
+                print(f"MISMATCH {entry['query']!r}: got {parsed}, expected {entry['expected']}")
+
+    if not total:
+        print("No queries in corpus.")
+        return
+    print(f"Queries:             {total}")
+    print(f"Fast-path hits:      {hits} ({hits / total:.1%})")
+    print(f"Accuracy on hits:    {correct}/{hits}")
+    print(f"Mean rule latency:   {elapsed / total * 1e6:.1f} us")
+    print(f"Est. latency saved:  {hits * llm_latency - elapsed:.1f} s "
+          f"(assuming {llm_latency:.1f} s per LLM call)")
+
+
+if __name__ == "__main__":
+    # Usage: python rule_parser.py [corpus.jsonl] [llm_latency_seconds]
+    corpus_path = sys.argv[1] if len(sys.argv) > 1 else 'corpus/queries.jsonl'
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    run_corpus(corpus_path, latency)
@@ -0,0 +1,30 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+
+class LogOptions(BaseModel):
+    container: Optional[str] = None
+    since_seconds: Optional[int] = Field(default=None, gt=0)
+    limit_bytes: Optional[int] = Field(default=None, gt=0)
+    tail_lines: Optional[int] = Field(default=None, gt=0)
+    grep: Optional[str] = None
+    follow: bool = False
+
+class QueryRequest(BaseModel):
+    query: str
+    stream: bool = False
+    log_options: Optional[LogOptions] = None
+    cache_control: Optional[str] = None
+
+class SubscriptionRequest(BaseModel):
+    query: str
+
+class QueryResponse(BaseModel):
+    query: str
+    answer: str
+
+class BatchQueryRequest(BaseModel):
+    queries: list[str]
+    cache_control: Optional[str] = None
+
+class BatchQueryResponse(BaseModel):
+    results: list[dict]
@@ -0,0 +1,69 @@
+import sqlite3
+import threading
+import time
+
+# Seconds a writer waits for another process to release the database lock
+SQLITE_BUSY_TIMEOUT = 5.0
+
+# Expired rows are purged once every this many writes
+PURGE_EVERY_WRITES = 256
+
+
+class SharedStore:
+    """
+    Key/value table in a SQLite file with per-row expiry. Several worker
+    processes can open the same file: it runs in WAL mode, so readers never
+    block on a writer and each process sees the others' entries.
+    """
+
+    def __init__(self, path, table):
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._db = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(f"CREATE TABLE IF NOT EXISTS {table} "
+                         "(key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+        self._db.commit()
+        self.purge()
+
+    def get(self, key):
+        """
+        Returns (value, expires_at) for an unexpired key, or None.
+        """
+        with self._lock:
+            row = self._db.execute(f"SELECT value, expires_at FROM {self.table} WHERE key = ?",
+                                   (key,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._db.execute(f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                             (key, value, expires_at))
+            self._db.commit()
+            self._writes += 1
+            purge = self._writes % PURGE_EVERY_WRITES == 0
+        if purge:
+            self.purge()
+
+    def delete(self, key):
+        with self._lock:
+            self._db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._db.commit()
+
+    def purge(self):
+        """
+        Deletes expired rows.
+        """
+        with self._lock:
+            self._db.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute(f"DELETE FROM {self.table}")
+            self._db.commit()
@@ -0,0 +1,289 @@
+import sys
+from collections import namedtuple
+from datetime import datetime
+from types import MappingProxyType
+import paging
+
+# Nested values of records. They are hashable, so equal values (the same
+# container image, condition or owner) are stored once and shared.
+Container = namedtuple('Container', ['name', 'image'])
+ContainerStatus = namedtuple('ContainerStatus', ['name', 'restart_count', 'ready'])
+Condition = namedtuple('Condition', ['type', 'status'])
+OwnerReference = namedtuple('OwnerReference', ['kind', 'name', 'uid', 'controller'])
+IngressRule = namedtuple('IngressRule', ['host'])
+LoadBalancerIngress = namedtuple('LoadBalancerIngress', ['ip', 'hostname'])
+ObjectReference = namedtuple('ObjectReference', ['kind', 'name'])
+EndpointAddress = namedtuple('EndpointAddress', ['ip', 'node_name', 'target_ref'])
+EndpointSubset = namedtuple('EndpointSubset', ['addresses'])
+
+# Shared copies of repeated values: label maps and nested tuples. Strings go
+# through sys.intern. Entries are never evicted; they grow with the number of
+# distinct values (label sets, images), not with the number of objects.
+_labels = {}
+_values = {}
+
+
+def intern_string(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def intern_labels(labels):
+    """
+    Returns a shared, read-only copy of a label (or selector) map, or None if it is empty.
+    """
+    if not labels:
+        return None
+    key = tuple(sorted(labels.items()))
+    shared = _labels.get(key)
+    if shared is None:
+        shared = _labels[key] = MappingProxyType({intern_string(k): intern_string(v) for k, v in key})
+    return shared
+
+
+def intern_value(value):
+    """
+    Returns a shared copy of a hashable value.
+    """
+    return _values.setdefault(value, value)
+
+
+def intern_tuple(values):
+    """
+    Returns a shared tuple of shared values, or None if there are none.
+    """
+    return intern_value(tuple(intern_value(value) for value in values)) if values else None
+
+
+def _conditions(status):
+    return intern_tuple([Condition(intern_string(c.get('type')), intern_string(c.get('status')))
+                         for c in status.get('conditions') or []])
+
+
+def _containers(spec):
+    return intern_tuple([Container(intern_string(c.get('name')), intern_string(c.get('image')))
+                         for c in spec.get('containers') or []])
+
+
+class Record:
+    """
+    Compact snapshot of one Kubernetes object: a flat __slots__ record with
+    only the fields the executor, aggregates and relation index read, and
+    repeated values shared across records. `metadata`, `spec` and `status`
+    return the record itself, so code written against the client models
+    (pod.metadata.name, pod.status.phase) reads records unchanged.
+    """
+
+    __slots__ = ('name', 'namespace', 'uid', 'resource_version', 'labels', 'owner_references')
+
+    def __init__(self, obj):
+        metadata = obj.get('metadata') or {}
+        self.name = metadata.get('name')
+        self.namespace = intern_string(metadata.get('namespace'))
+        self.uid = metadata.get('uid')
+        self.resource_version = metadata.get('resourceVersion')
+        self.labels = intern_labels(metadata.get('labels'))
+        self.owner_references = intern_tuple([
+            OwnerReference(intern_string(ref.get('kind')), ref.get('name'), ref.get('uid'), ref.get('controller'))
+            for ref in metadata.get('ownerReferences') or []])
+
+    @property
+    def metadata(self):
+        return self
+
+    spec = status = metadata
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.namespace}/{self.name}@{self.resource_version})"
+
+
+class PodRecord(Record):
+    __slots__ = ('node_name', 'phase', 'containers', 'container_statuses')
+
+    def __init__(self, obj):
+        super().__init__(obj)
+        spec, status = obj.get('spec') or {}, obj.get('status') or {}
+        self.node_name = intern_string(spec.get('nodeName'))
+        self.phase = intern_string(status.get('phase'))
+        self.containers = _containers(spec)
+        self.container_statuses = intern_tuple([
+            ContainerStatus(intern_string(cs.get('name')), cs.get('restartCount') or 0, cs.get('ready'))
+            for cs in status.get('containerStatuses') or []])
+
+
+class DeploymentRecord(Record):
+    __slots__ = ('replicas', 'containers', 'match_labels', 'conditions', 'available_replicas', 'ready_replicas')
+
+    def __init__(self, obj):
+        super().__init__(obj)
+        spec, status = obj.get('spec') or {}, obj.get('status') or {}
+        self.replicas = spec.get('replicas')
+        self.containers = _containers(((spec.get('template') or {}).get('spec')) or {})
+        self.match_labels = intern_labels((spec.get('selector') or {}).get('matchLabels'))
+        self.conditions = _conditions(status)
+        self.available_replicas = status.get('availableReplicas')
+        self.ready_replicas = status.get('readyReplicas')
+
+    # deployment.spec.template.spec.containers and deployment.spec.selector.match_labels
+    template = selector = Record.metadata
+
+
+class ReplicaSetRecord(Record):
+    __slots__ = ('replicas', 'match_labels', 'ready_replicas')
+
+    def __init__(self, obj):
+        super().__init__(obj)
+        spec, status = obj.get('spec') or {}, obj.get('status') or {}
+        self.replicas = spec.get('replicas')
+        self.match_labels = intern_labels((spec.get('selector') or {}).get('matchLabels'))
+        self.ready_replicas = status.get('readyReplicas')
+
+    selector = Record.metadata
+
+
+class ServiceRecord(Record):
+    __slots__ = ('type', 'cluster_ip', 'external_ips', 'selector', 'ingress')
+
+    def __init__(self, obj):
+        super().__init__(obj)
+        spec, status = obj.get('spec') or {}, obj.get('status') or {}
+        self.type = intern_string(spec.get('type'))
+        self.cluster_ip = spec.get('clusterIP')
+        self.external_ips = spec.get('externalIPs')
+        self.selector = intern_labels(spec.get('selector'))
+        self.ingress = intern_tuple([LoadBalancerIngress(i.get('ip'), i.get('hostname'))
+                                     for i in (status.get('loadBalancer') or {}).get('ingress') or []])
+
+    # service.status.load_balancer.ingress
+    load_balancer = Record.metadata
+
+
+class NodeRecord(Record):
+    __slots__ = ('conditions',)
+
+    def __init__(self, obj):
+        super().__init__(obj)
+        self.conditions = _conditions(obj.get('status') or {})
+
+
+class NamespaceRecord(Record):
+    __slots__ = ('phase',)
+
+    def __init__(self, obj):
+        super().__init__(obj)
+        self.phase = intern_string((obj.get('status') or {}).get('phase'))
+
+
+class JobRecord(Record):
+    __slots__ = ('completions', 'succeeded', 'active', 'failed', 'conditions')
+
+    def __init__(self, obj):
+        super().__init__(obj)
+        spec, status = obj.get('spec') or {}, obj.get('status') or {}
+        self.completions = spec.get('completions')
+        self.succeeded = status.get('succeeded')
+        self.active = status.get('active')
+        self.failed = status.get('failed')
+        self.conditions = _conditions(status)
+
+
+class CronJobRecord(Record):
+    __slots__ = ('schedule',)
+
+    def __init__(self, obj):
+        super().__init__(obj)
+        self.schedule = intern_string((obj.get('spec') or {}).get('schedule'))
+
+
+class IngressRecord(Record):
+    __slots__ = ('rules',)
+
+    def __init__(self, obj):
+        super().__init__(obj)
+        self.rules = intern_tuple([IngressRule(rule.get('host'))
+                                   for rule in (obj.get('spec') or {}).get('rules') or []])
+
+
+class EndpointsRecord(Record):
+    __slots__ = ('subsets',)
+
+    def __init__(self, obj):
+        super().__init__(obj)
+        subsets = []
+        for subset in obj.get('subsets') or []:
+            addresses = []
+            for address in subset.get('addresses') or []:
+                ref = address.get('targetRef')
+                addresses.append(EndpointAddress(
+                    address.get('ip'), intern_string(address.get('nodeName')),
+                    ObjectReference(intern_string(ref.get('kind')), ref.get('name')) if ref else None))
+            subsets.append(EndpointSubset(tuple(addresses)))
+        self.subsets = tuple(subsets) or None
+
+
+# Longest event message kept; longer ones are cut, which bounds the size of an event record
+EVENT_MESSAGE_MAX_CHARS = 512
+
+
+def parse_timestamp(value):
+    """
+    Returns the epoch seconds of an RFC 3339 timestamp, or None.
+    """
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+class EventRecord(Record):
+    __slots__ = ('type', 'reason', 'message', 'count', 'involved_kind', 'involved_name', 'timestamp', 'superseded')
+
+    def __init__(self, obj):
+        super().__init__(obj)
+        involved = obj.get('involvedObject') or obj.get('regarding') or {}
+        series = obj.get('series') or {}
+        message = obj.get('message') or obj.get('note') or ''
+        self.type = intern_string(obj.get('type'))
+        self.reason = intern_string(obj.get('reason'))
+        self.message = message[:EVENT_MESSAGE_MAX_CHARS]
+        self.count = series.get('count') or obj.get('count') or 1
+        self.involved_kind = intern_string(involved.get('kind'))
+        self.involved_name = involved.get('name')
+        # When the event last occurred, in epoch seconds
+        self.timestamp = (parse_timestamp(series.get('lastObservedTime')) or parse_timestamp(obj.get('lastTimestamp'))
+                          or parse_timestamp(obj.get('eventTime'))
+                          or parse_timestamp((obj.get('metadata') or {}).get('creationTimestamp')))
+        # Set by the event buffer when a newer version of the event arrives
+        self.superseded = False
+
+
+# Record type of each resource with a compact representation; others keep client models
+RECORD_TYPES = {
+    'pods': PodRecord,
+    'deployments': DeploymentRecord,
+    'replicasets': ReplicaSetRecord,
+    'services': ServiceRecord,
+    'nodes': NodeRecord,
+    'namespaces': NamespaceRecord,
+    'jobs': JobRecord,
+    'cronjobs': CronJobRecord,
+    'ingresses': IngressRecord,
+    'endpoints': EndpointsRecord,
+    'events': EventRecord
+}
+
+
+def load_list(api_client, path, resource, page_size=None, label_selector=None, field_selector=None):
+    """
+    Bulk loader: lists a resource type through paged JSON responses and
+    builds its records page by page, without creating client model objects.
+    Returns the records and the resourceVersion of the list.
+    """
+    record_type = RECORD_TYPES[resource]
+    records, resource_version = [], None
+    for page in paging.iter_list_pages(api_client, path, metadata_only=False, page_size=page_size,
+                                       label_selector=label_selector, field_selector=field_selector):
+        records.extend(record_type(item) for item in page.get('items') or [])
+        resource_version = (page.get('metadata') or {}).get('resourceVersion')
+    return records, resource_version
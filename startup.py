@@ -0,0 +1,129 @@
+import logging
+import os
+import threading
+import time
+import metrics
+
+# Create the Kubernetes and OpenAI clients in the background as soon as the
+# app starts, instead of on the first request
+WARM_UP = os.getenv("WARM_UP", "1") == "1"
+
+# Seconds between attempts to reach the API server while it is unreachable
+# during warm-up; the worker stays unready until one succeeds
+WARM_UP_RETRY_SECONDS = float(os.getenv("WARM_UP_RETRY_SECONDS", "5"))
+
+# Module import time, the fallback when the process start time is unknown
+_imported_at = time.time()
+
+_milestones = {}
+_milestones_lock = threading.Lock()
+_warmed_up = threading.Event()
+_kubernetes_error = None
+
+
+def process_start_time():
+    """
+    Returns the wall-clock time the process started, read from /proc on
+    Linux, or the time this module was imported elsewhere.
+    """
+    try:
+        with open('/proc/self/stat') as stat:
+            # Fields after the parenthesized command name; starttime is field 22
+            start_ticks = int(stat.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as uptime:
+            seconds_since_boot = float(uptime.read().split()[0])
+        return time.time() - seconds_since_boot + start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return _imported_at
+
+
+_process_started_at = process_start_time()
+
+
+def mark(milestone):
+    """
+    Records the seconds from process start to a milestone ('app_imported',
+    'warmed_up', 'first_request') the first time it is reached.
+    """
+    if milestone in _milestones:
+        return
+    with _milestones_lock:
+        if milestone in _milestones:
+            return
+        _milestones[milestone] = elapsed = time.time() - _process_started_at
+    metrics.STARTUP_SECONDS.set(round(elapsed, 4), milestone=milestone)
+    logging.info("Startup milestone %s after %.3f s", milestone, elapsed)
+
+
+def warm_up():
+    """
+    Creates the Kubernetes and OpenAI clients, importing their SDKs, opens a
+    first connection to the API server and builds the local parser's index
+    when it is enabled, so that the first request does not pay for them.
+    Failures are logged; the request path retries. Warm-up only finishes
+    once the API server has been reached, retried every WARM_UP_RETRY_SECONDS.
+    """
+    import nlp_parser
+    if nlp_parser.LOCAL_PARSER_MODE != 'off':
+        try:
+            import local_parser
+            local_parser.get_parser()
+        except Exception as e:
+            logging.warning("Local parser warm-up failed: %s", e)
+    if nlp_parser.LOCAL_PARSER_MODE != 'only':
+        try:
+            nlp_parser.get_openai_client()
+            nlp_parser.get_openai_client(use_async=True)
+        except Exception as e:
+            logging.warning("OpenAI client warm-up failed: %s", e)
+    while not warm_up_kubernetes():
+        time.sleep(WARM_UP_RETRY_SECONDS)
+    _warmed_up.set()
+    mark('warmed_up')
+
+
+def warm_up_kubernetes():
+    """
+    Creates the Kubernetes client and opens a first connection to the API
+    server. Returns False, recording the error for startup_status, on failure.
+    """
+    global _kubernetes_error
+    import k8s_client
+    import k8s_executor
+    try:
+        k8s_executor.apis()
+        resp = k8s_client.get_api_client().call_api('/version', 'GET', auth_settings=['BearerToken'],
+                                                    _preload_content=False, _return_http_data_only=True)
+        resp.release_conn()
+    except Exception as e:
+        if _kubernetes_error is None:
+            logging.warning("Kubernetes client warm-up failed, retrying every %.0f s: %s", WARM_UP_RETRY_SECONDS, e)
+        _kubernetes_error = str(e) or type(e).__name__
+        return False
+    _kubernetes_error = None
+    return True
+
+
+def start_warm_up():
+    """
+    Runs warm_up on a daemon thread when WARM_UP is enabled.
+    """
+    if WARM_UP:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+
+def is_warm():
+    """
+    Returns True once warm-up has finished, or when it is disabled.
+    """
+    return not WARM_UP or _warmed_up.is_set()
+
+
+def startup_status():
+    """
+    Reports whether warm-up has finished, why the API server could not be
+    reached if it has not, and the startup milestones reached so far.
+    """
+    with _milestones_lock:
+        milestones = {name: round(seconds, 4) for name, seconds in _milestones.items()}
+    return {'warm': is_warm(), 'kubernetes_error': _kubernetes_error, 'milestones_seconds': milestones}
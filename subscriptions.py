@@ -0,0 +1,386 @@
+import asyncio
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import informer
+import k8s_executor
+import metrics
+import query_engine
+
+# Seconds between keepalive heartbeats on an idle subscription
+SUBSCRIPTION_HEARTBEAT_SECONDS = float(os.getenv("SUBSCRIPTION_HEARTBEAT_SECONDS", "15"))
+
+# Seconds a subscription stays open before the client has to subscribe again
+SUBSCRIPTION_MAX_SECONDS = float(os.getenv("SUBSCRIPTION_MAX_SECONDS", "3600"))
+
+# Maximum number of subscriptions open at once in this process
+SUBSCRIPTION_MAX = int(os.getenv("SUBSCRIPTION_MAX", "100"))
+
+# Maximum number of subscriptions iterated synchronously at once in this
+# process. Each holds a server thread for as long as it is open, so this stays
+# below the threads of a gthread worker to leave threads for other requests
+SUBSCRIPTION_MAX_BLOCKING = int(os.getenv("SUBSCRIPTION_MAX_BLOCKING", str(int(os.getenv("WORKER_THREADS", "8")) // 2)))
+
+# Events held for a slow client; past that its pending events are replaced
+# by one snapshot of the current answer
+SUBSCRIPTION_QUEUE_SIZE = int(os.getenv("SUBSCRIPTION_QUEUE_SIZE", "1000"))
+
+# Seconds to wait for an informer started by a subscription to finish its initial list
+SUBSCRIPTION_SYNC_TIMEOUT = float(os.getenv("SUBSCRIPTION_SYNC_TIMEOUT", "30"))
+
+_CAMEL_HUMP = re.compile(r'(?<!^)(?=[A-Z])')
+
+_lock = threading.Lock()
+_open = 0
+_blocking = 0
+
+
+def parse_label_selector(selector: str) -> list:
+    """
+    Parses an equality-based label selector such as "app=web,tier!=db,canary"
+    into (key, operator, value) triples with operator one of '=', '!=',
+    'exists' and '!exists'. Raises ValueError for set-based requirements.
+    """
+    terms = []
+    for term in filter(None, (part.strip() for part in (selector or '').split(','))):
+        if ' in ' in term or ' notin ' in term or '(' in term:
+            raise ValueError(f"Set-based label selectors cannot be subscribed to: {term}")
+        if '!=' in term:
+            key, _, value = term.partition('!=')
+            terms.append((key.strip(), '!=', value.strip()))
+        elif '=' in term:
+            key, _, value = term.partition('=')
+            terms.append((key.strip(), '=', value.lstrip('=').strip()))
+        elif term.startswith('!'):
+            terms.append((term[1:].strip(), '!exists', None))
+        else:
+            terms.append((term, 'exists', None))
+    return terms
+
+
+def parse_field_selector(selector: str) -> list:
+    """
+    Parses a field selector such as "status.phase=Running,spec.nodeName!=node-1"
+    into (attribute path, equal, value) triples read from the stored objects:
+    "spec.nodeName" reads obj.spec.node_name.
+    """
+    terms = []
+    for term in filter(None, (part.strip() for part in (selector or '').split(','))):
+        key, operator, value = term.partition('!=') if '!=' in term else term.partition('=')
+        if not operator:
+            raise ValueError(f"Invalid field selector: {term}")
+        path = [_CAMEL_HUMP.sub('_', part).lower() for part in key.strip().split('.')]
+        terms.append((path, operator == '=', value.lstrip('=').strip()))
+    return terms
+
+
+def _read_path(obj, path):
+    for attribute in path:
+        obj = getattr(obj, attribute, None)
+        if obj is None:
+            return ''
+    return str(obj)
+
+
+def _label_matches(labels, key, operator, value):
+    labels = labels or {}
+    if operator == 'exists':
+        return key in labels
+    if operator == '!exists':
+        return key not in labels
+    return (labels.get(key) == value) == (operator == '=')
+
+
+class Subscription:
+    """
+    An open query subscription: a listener on the informer store of the
+    queried resource type that turns each watch delta into the change it
+    makes to the answer, instead of recomputing and resending the answer.
+
+    The answer is held as a map from object name ("namespace/name" when the
+    query spans every namespace) to the value asked about, or None when only
+    names are listed. The first event is a snapshot of the answer; after it
+    come 'added', 'removed' and 'changed' events (a status flip, a restart),
+    or 'count' events for count queries, and only when the answer changes.
+    A relist after a broken watch is diffed against the held answer, so it
+    sends deltas too. Events queue up to SUBSCRIPTION_QUEUE_SIZE; a client
+    that falls further behind gets a fresh snapshot instead.
+
+    Without an event loop the events are read by iterating the subscription,
+    which blocks a thread. With one, they are handed to an asyncio.Queue on
+    that loop and read with async for.
+    """
+
+    def __init__(self, mapped_action, store, loop=None):
+        self.mapped_action = mapped_action
+        self.store = store
+        self.loop = loop
+        self.resource = mapped_action['resource']
+        self.entry = k8s_executor.resource_type(self.resource)
+        self.field = mapped_action.get('field')
+        self.target_name = mapped_action.get('target_name') if mapped_action.get('action_type') == 'get' else None
+        namespace = mapped_action.get('namespace') or 'default'
+        self.scope = None if namespace == k8s_executor.ALL_NAMESPACES else self.entry.scope(namespace)
+        self.qualify = self.entry.namespaced and self.scope is None
+        self.counting = self.field == 'count' and self.target_name is None
+        self.valued = self.target_name is not None or \
+            self.field in k8s_executor.SUMMARY_FIELDS.get(self.resource, ())
+
+        filters = mapped_action.get('filters') or {}
+        self.labels = parse_label_selector(filters.get('label_selector'))
+        self.fields = parse_field_selector(filters.get('field_selector'))
+        self.where = query_engine.parse_where(filters['where']) if filters.get('where') else []
+        if self.where:
+            if self.resource not in query_engine.COLUMNS:
+                raise ValueError(f"Filters on {self.resource} are not supported")
+            query_engine.check_predicates(query_engine.COLUMNS[self.resource], self.where)
+
+        self.state = {}
+        if loop is None:
+            self.events = queue.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+        else:
+            # Bounded by the count of events handed to the loop and not yet read
+            self.events = asyncio.Queue()
+            self.pending = 0
+            self._pending_lock = threading.Lock()
+        self.started = False
+        self.closed = False
+
+    def key(self, obj):
+        return f"{obj.metadata.namespace}/{obj.metadata.name}" if self.qualify else obj.metadata.name
+
+    def selects(self, obj):
+        """
+        Returns True if the object is part of the answer.
+        """
+        metadata = obj.metadata
+        if self.scope is not None and metadata.namespace != self.scope:
+            return False
+        if self.target_name is not None and metadata.name != self.target_name:
+            return False
+        if not all(_label_matches(metadata.labels, *term) for term in self.labels):
+            return False
+        if not all((_read_path(obj, path) == value) == equal for path, equal, value in self.fields):
+            return False
+        return not self.where or query_engine.matches(self.resource, obj, self.where)
+
+    def value(self, obj):
+        return self.entry.describe(obj, self.field) if self.valued else None
+
+    def snapshot(self, **extra):
+        """
+        Returns the snapshot event of the held answer.
+        """
+        if self.counting:
+            return 'snapshot', dict(extra, count=len(self.state))
+        return 'snapshot', dict(extra, count=len(self.state), items=dict(sorted(self.state.items())))
+
+    def emit(self, event_type, data):
+        """
+        Queues an event. Returns False if the queue was full and a snapshot
+        of the current answer, which supersedes the event, was queued instead.
+        """
+        if self.loop is not None:
+            return self._emit_threadsafe(event_type, data)
+        try:
+            self.events.put_nowait((event_type, data))
+            return True
+        except queue.Full:
+            # The client fell behind: its pending deltas are replaced by the answer as it is now
+            while True:
+                try:
+                    self.events.get_nowait()
+                except queue.Empty:
+                    break
+            self.events.put_nowait(self.snapshot(resync=True))
+            return False
+
+    def _emit_threadsafe(self, event_type, data):
+        with self._pending_lock:
+            overflow = self.pending >= SUBSCRIPTION_QUEUE_SIZE
+            self.pending = 1 if overflow else self.pending + 1
+        # The snapshot is taken here, in order with the deltas, not on the loop
+        event = self.snapshot(resync=True) if overflow else (event_type, data)
+        try:
+            self.loop.call_soon_threadsafe(self._resync if overflow else self.events.put_nowait, event)
+        except RuntimeError:
+            # The loop has closed; the stream is gone and close() is on its way
+            pass
+        return not overflow
+
+    def _resync(self, event):
+        while not self.events.empty():
+            self.events.get_nowait()
+        self.events.put_nowait(event)
+
+    def on_replace(self, items, resource_version):
+        if self.closed:
+            return
+        previous = self.state
+        self.state = {self.key(obj): self.value(obj) for obj in items if self.selects(obj)}
+        if not self.started:
+            self.started = True
+            self.emit(*self.snapshot())
+        else:
+            self.changed(previous, self.state)
+
+    def on_update(self, old, new):
+        if self.closed:
+            return
+        # Only the entries of the object that changed are compared, not the whole answer
+        previous = {}
+        for obj in (old, new):
+            if obj is not None and self.key(obj) in self.state:
+                previous[self.key(obj)] = self.state.pop(self.key(obj))
+        current = {}
+        if new is not None and self.selects(new):
+            current[self.key(new)] = self.state[self.key(new)] = self.value(new)
+        self.changed(previous, current)
+
+    def changed(self, previous, current):
+        """
+        Emits the difference between the previous and current entries of the
+        objects that changed; the held answer is already updated.
+        """
+        count = len(self.state)
+        if self.counting:
+            if len(previous) != len(current):
+                self.emit('count', {'count': count, 'previous': count - len(current) + len(previous)})
+            return
+        events = [('removed', {'name': name, 'value': previous[name], 'count': count})
+                  for name in sorted(previous.keys() - current.keys())]
+        events += [('added', {'name': name, 'value': current[name], 'count': count})
+                   for name in sorted(current.keys() - previous.keys())]
+        events += [('changed', {'name': name, 'value': current[name], 'previous': previous[name]})
+                   for name in sorted(current.keys() & previous.keys()) if current[name] != previous[name]]
+        for event in events:
+            # A resync snapshot already holds the rest of the change
+            if not self.emit(*event):
+                return
+
+    def __iter__(self):
+        """
+        Yields (event type, data) pairs until the subscription is closed or
+        SUBSCRIPTION_MAX_SECONDS have passed, and ('heartbeat', None) every
+        SUBSCRIPTION_HEARTBEAT_SECONDS without an event. Closes the
+        subscription when the consumer stops.
+        """
+        deadline = time.monotonic() + SUBSCRIPTION_MAX_SECONDS
+        try:
+            while not self.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    yield 'expired', {'after_seconds': SUBSCRIPTION_MAX_SECONDS}
+                    return
+                try:
+                    event_type, data = self.events.get(timeout=min(SUBSCRIPTION_HEARTBEAT_SECONDS, remaining))
+                except queue.Empty:
+                    yield 'heartbeat', None
+                    continue
+                metrics.SUBSCRIPTION_EVENTS_TOTAL.inc(type=event_type)
+                yield event_type, data
+        finally:
+            self.close()
+
+    async def __aiter__(self):
+        """
+        Async counterpart of __iter__ for subscriptions opened with an event
+        loop; waiting for events does not hold a thread.
+        """
+        deadline = time.monotonic() + SUBSCRIPTION_MAX_SECONDS
+        try:
+            while not self.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    yield 'expired', {'after_seconds': SUBSCRIPTION_MAX_SECONDS}
+                    return
+                try:
+                    event_type, data = await asyncio.wait_for(
+                        self.events.get(), timeout=min(SUBSCRIPTION_HEARTBEAT_SECONDS, remaining))
+                except asyncio.TimeoutError:
+                    yield 'heartbeat', None
+                    continue
+                with self._pending_lock:
+                    # A resync may have reset the count under an event read just before it
+                    self.pending = max(0, self.pending - 1)
+                metrics.SUBSCRIPTION_EVENTS_TOTAL.inc(type=event_type)
+                yield event_type, data
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Stops listening to the store. Safe to call more than once.
+        """
+        with _lock:
+            if self.closed:
+                return
+            self.closed = True
+            _count(self.loop is None, -1)
+        self.store.remove_listener(self)
+        logging.info("Closed subscription to %s", self.resource)
+
+
+def _count(blocking, step):
+    # Called with _lock held
+    global _open, _blocking
+    _open += step
+    if blocking:
+        _blocking += step
+    metrics.SUBSCRIPTIONS_ACTIVE.set(_open)
+
+
+def subscribe(mapped_action: dict, loop=None) -> Subscription:
+    """
+    Opens a subscription to a mapped get or list action, starting and
+    syncing an informer for its resource type if none is running. Events
+    are delivered on the given event loop, if any (see Subscription).
+    Raises ValueError for actions that cannot be subscribed to, RuntimeError
+    when SUBSCRIPTION_MAX subscriptions, or SUBSCRIPTION_MAX_BLOCKING
+    without a loop, are open and TimeoutError when the informer does not
+    sync within SUBSCRIPTION_SYNC_TIMEOUT seconds.
+    """
+    resource = mapped_action.get('resource')
+    action_type = mapped_action.get('action_type')
+    related_to = mapped_action.get('related_to') or {}
+    query = mapped_action.get('query') or {}
+    entry = k8s_executor.resource_type(resource)
+    if entry is None or entry.list_all is None or entry.describe is None or resource == 'events':
+        raise ValueError(f"Unsupported resource type: {resource}" if entry is None else
+                         f"Queries about {resource} cannot be subscribed to")
+    if action_type not in ('get', 'list'):
+        raise ValueError("Only get and list queries can be subscribed to")
+    if related_to.get('resource'):
+        raise ValueError("Queries about related resources cannot be subscribed to")
+    if mapped_action.get('group_by') or query.get('limit'):
+        raise ValueError("Grouped and top-k queries cannot be subscribed to")
+    if action_type == 'get' and not mapped_action.get('target_name'):
+        raise ValueError(f"{entry.kind} name not specified.")
+    if action_type == 'get' and mapped_action.get('namespace') == k8s_executor.ALL_NAMESPACES:
+        raise ValueError("Please specify a namespace for this query.")
+
+    with _lock:
+        if _open >= SUBSCRIPTION_MAX:
+            raise RuntimeError(f"At most {SUBSCRIPTION_MAX} subscriptions can be open at once")
+        if loop is None and _blocking >= SUBSCRIPTION_MAX_BLOCKING:
+            raise RuntimeError(f"At most {SUBSCRIPTION_MAX_BLOCKING} subscriptions can be open at once "
+                               f"in a threaded worker")
+        _count(loop is None, 1)
+    try:
+        subscription = Subscription(mapped_action, None, loop)
+        k8s_executor.start_informers([resource])
+        running = informer.get_informer(resource)
+        if not running.wait_for_sync(SUBSCRIPTION_SYNC_TIMEOUT):
+            raise TimeoutError(f"The {resource} informer did not sync within {SUBSCRIPTION_SYNC_TIMEOUT:.0f}s")
+    except Exception:
+        with _lock:
+            _count(loop is None, -1)
+        raise
+    subscription.store = running.store
+    # A synced store replays its contents, which queues the first snapshot
+    running.store.add_listener(subscription)
+    logging.info("Opened subscription to %s (%d open)", resource, _open)
+    return subscription
@@ -0,0 +1,106 @@
+import threading
+from types import SimpleNamespace
+import informer
+import k8s_client
+
+
+def make_pod(name, resource_version, namespace='default', phase='Running'):
+    metadata = SimpleNamespace(name=name, namespace=namespace, resource_version=resource_version)
+    return SimpleNamespace(metadata=metadata, status=SimpleNamespace(phase=phase))
+
+
+def make_list(items, resource_version):
+    return SimpleNamespace(items=items, metadata=SimpleNamespace(resource_version=resource_version))
+
+
+class FakeWatch:
+    """
+    Watch stand-in that replays one scripted stream per watch request. A
+    stream is a list of events, or an exception raised when it is opened.
+    """
+
+    def __init__(self, streams, requests):
+        self.streams = streams
+        self.requests = requests
+
+    def stream(self, func, **kwargs):
+        self.requests.append(kwargs)
+        script = self.streams.pop(0)
+        if isinstance(script, Exception):
+            raise script
+        yield from script
+
+    def stop(self):
+        pass
+
+
+def make_informer(streams, lists):
+    requests = []
+    listed = iter(lists)
+    fake = informer.Informer('pods', lambda **kwargs: next(listed),
+                             watch_factory=lambda: FakeWatch(streams, requests))
+    return fake, requests
+
+
+def test_watch_events_update_store():
+    pod = make_pod('web-1', '10')
+    streams = [[
+        {'type': 'ADDED', 'object': make_pod('web-2', '11')},
+        {'type': 'MODIFIED', 'object': make_pod('web-1', '12', phase='Failed')},
+        {'type': 'DELETED', 'object': make_pod('web-2', '13')},
+        {'type': 'BOOKMARK', 'object': None, 'raw_object': {'metadata': {'resourceVersion': '20'}}},
+    ]]
+    fake, requests = make_informer(streams, [make_list([pod], '10')])
+    fake.list_and_replace()
+    fake.watch_once()
+
+    assert requests[0]['resource_version'] == '10'
+    assert [obj.metadata.name for obj in fake.store.list()] == ['web-1']
+    assert fake.store.get('web-1', 'default').status.phase == 'Failed'
+    assert fake.store.resource_version == '20'
+
+
+def test_only_delivered_events_make_the_store_current():
+    store = informer.Store()
+    store.replace([], '1')
+    store.last_sync -= 600
+    seen = []
+
+    class HangingWatch(FakeWatch):
+        def stream(self, func, **kwargs):
+            # Nothing arrives: the watch may never have connected
+            seen.append((store.watching, store.staleness()))
+            yield from ()
+
+    fake = informer.Informer('pods', None, watch_factory=lambda: HangingWatch([], []), store=store)
+    fake.watch_once()
+    assert not seen[0][0] and seen[0][1] >= 600
+    assert store.staleness() >= 600
+
+    bookmark = {'type': 'BOOKMARK', 'object': None, 'raw_object': {'metadata': {'resourceVersion': '2'}}}
+    fake.watch_factory = lambda: FakeWatch([[bookmark]], [])
+    fake.watch_once()
+    assert store.staleness() < 1
+    assert not store.watching
+
+
+def test_expired_resource_version_relists():
+    streams = [
+        k8s_client.ApiException(status=410, reason='Gone'),
+        [{'type': 'ADDED', 'object': make_pod('web-3', '31')}],
+    ]
+    lists = [make_list([make_pod('web-1', '10')], '10'), make_list([make_pod('web-2', '30')], '30')]
+    fake, requests = make_informer(streams, lists)
+
+    def stop_after_second_watch(event, handle=fake.handle_event):
+        handle(event)
+        fake.stop()
+
+    fake.handle_event = stop_after_second_watch
+    thread = threading.Thread(target=fake.run, daemon=True)
+    thread.start()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert [kwargs['resource_version'] for kwargs in requests] == ['10', '30']
+    assert sorted(obj.metadata.name for obj in fake.store.list()) == ['web-2', 'web-3']
@@ -0,0 +1,77 @@
+import threading
+import time
+from types import SimpleNamespace
+import informer
+import k8s_executor
+import result_cache
+
+
+def test_concurrent_callers_start_one_informer(monkeypatch):
+    entry = SimpleNamespace(list_all=lambda **kwargs: None, decode=None)
+    monkeypatch.setattr(k8s_executor, 'apis', lambda: SimpleNamespace(resources={'configmaps': entry}))
+    monkeypatch.setattr(informer, '_informers', {})
+    started = []
+
+    def start_informer(resource, list_func, **kwargs):
+        # Slow enough for every caller to reach the check before the first registers
+        time.sleep(0.05)
+        started.append(resource)
+        running = SimpleNamespace(store=informer.Store())
+        informer._informers[resource] = running
+        return running
+
+    monkeypatch.setattr(informer, 'start_informer', start_informer)
+    threads = [threading.Thread(target=k8s_executor.start_informers, args=(['configmaps'],)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert started == ['configmaps']
+
+
+def test_job_logs_are_capped(monkeypatch):
+    fetched = []
+
+    def get_pod_logs(name, namespace):
+        fetched.append(name)
+        return 'x' * 100
+
+    monkeypatch.setattr(k8s_executor, 'get_job_pod_names', lambda job, namespace: [f'pod-{i}' for i in range(50)])
+    monkeypatch.setattr(k8s_executor, 'get_pod_logs', get_pod_logs)
+    monkeypatch.setattr(k8s_executor, 'JOB_LOG_WORKERS', 1)
+    monkeypatch.setattr(k8s_executor, 'LOG_ANSWER_MAX_BYTES', 500)
+
+    logs = k8s_executor.get_logs_from_job('backup', 'default')
+
+    assert len(logs.encode()) <= 500
+    assert logs.startswith("Logs for pod 'pod-0':\n")
+    assert len(fetched) < 10
+
+
+def test_answers_stating_their_age_are_not_cached(monkeypatch):
+    entry = SimpleNamespace(name='pods', namespaced=True, scope=lambda namespace: namespace)
+    index = SimpleNamespace(totals=lambda scope: {'count': 3}, groups=lambda prefix, scope: {'Running': 3},
+                            staleness=lambda: 12.0)
+    monkeypatch.setattr(k8s_executor, 'apis', lambda: SimpleNamespace(resources={'pods': entry}))
+    monkeypatch.setattr(k8s_executor.aggregates, 'get_index', lambda resource, max_staleness=None: index)
+    monkeypatch.setattr(k8s_executor, 'result_cache', result_cache.ResultCache(ttls={'pods': 60}))
+    action = {'action_type': 'list', 'resource': 'pods', 'namespace': 'default', 'field': 'status'}
+
+    assert k8s_executor.execute_with_prefetched(action) == "Running: 3 (as of 12s ago)"
+    index.staleness = lambda: 40.0
+    assert k8s_executor.execute_with_prefetched(action) == "Running: 3 (as of 40s ago)"
+
+
+def test_object_unchanged_compares_resource_versions(monkeypatch):
+    entry = SimpleNamespace(name='pods', namespaced=True, scope=lambda namespace: namespace)
+    monkeypatch.setattr(k8s_executor, 'apis', lambda: SimpleNamespace(resources={'pods': entry}))
+    store = informer.Store()
+    pod = SimpleNamespace(metadata=SimpleNamespace(name='web-1', namespace='default', resource_version='42'))
+    store.replace([pod], '42')
+    monkeypatch.setattr(informer, 'get_store', lambda resource, max_staleness=None: store)
+
+    assert k8s_executor.object_unchanged(('pods', 'default', 'web-1', '42'))
+    assert not k8s_executor.object_unchanged(('pods', 'default', 'web-1', '41'))
+    assert not k8s_executor.object_unchanged(('pods', 'default', 'web-2', '42'))
+    assert not k8s_executor.object_unchanged(('pods', 'default', 'web-1', None))
@@ -0,0 +1,27 @@
+import local_parser
+from nlp_parser import PLURAL_RULES
+
+entries = local_parser.load_entries([local_parser.LOCAL_PARSER_CORPUS])
+
+
+def parse_held_out(query):
+    others = [entry for entry in entries if entry['query'] != query]
+    return local_parser.LocalParser(others, PLURAL_RULES).parse(query)
+
+
+def test_held_out_parses_are_correct():
+    # Every held-out query the parser answers must match its label
+    for entry in entries:
+        parsed = parse_held_out(entry['query'])
+        assert parsed is None or parsed == entry['expected'], entry['query']
+
+
+def test_parses_contradicting_the_query_are_refused():
+    cluster_wide = {'action': 'list', 'resource': 'ingresses', 'target_name': None, 'namespace': None,
+                    'field': None, 'related_to': {'resource': None, 'name': None}}
+    assert not local_parser.agrees_with_rules("List all ingresses in the cluster.", cluster_wide)
+    image = {'action': 'get', 'resource': 'deployments', 'target_name': 'web', 'namespace': None,
+             'field': 'containers', 'related_to': {'resource': None, 'name': None}}
+    assert not local_parser.agrees_with_rules("What is the container image of deployment 'web'?", image)
+    assert local_parser.agrees_with_rules("What is the container image of deployment 'web'?",
+                                          dict(image, field='image'))
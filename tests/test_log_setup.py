@@ -0,0 +1,35 @@
+import io
+import json
+import logging
+import logging.handlers
+import queue
+import log_setup
+
+
+def test_message_is_rendered_when_queued():
+    log_queue = queue.Queue()
+    logger = logging.getLogger('test_log_setup')
+    logger.propagate = False
+    handler = log_setup.DroppingQueueHandler(log_queue)
+    logger.addHandler(handler)
+    try:
+        parsed = {'resource': 'pods'}
+        try:
+            raise RuntimeError('boom')
+        except RuntimeError:
+            logger.exception('failed %s', parsed)
+    finally:
+        logger.removeHandler(handler)
+
+    # The caller changes its arguments right after logging
+    parsed['log_options'] = {}
+    record = log_queue.get_nowait()
+    assert (record.msg, record.args, record.exc_info) == ("failed {'resource': 'pods'}", None, None)
+
+    output = io.StringIO()
+    writer = logging.StreamHandler(output)
+    writer.setFormatter(log_setup.JsonFormatter())
+    writer.handle(record)
+    entry = json.loads(output.getvalue())
+    assert entry['message'] == "failed {'resource': 'pods'}"
+    assert 'RuntimeError: boom' in entry['exception']
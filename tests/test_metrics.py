@@ -0,0 +1,28 @@
+import os
+import metrics
+
+
+def test_series_of_all_workers_are_summed(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path))
+    counter = metrics.Counter('test_requests_total', 'Requests', ['source'])
+    histogram = metrics.Histogram('test_seconds', 'Latency', buckets=(0.1, 1.0))
+    gauge = metrics.Gauge('test_open', 'Open things')
+    try:
+        counter.inc(2, source='api')
+        histogram.observe(0.05)
+        gauge.set(3)
+        # An exited worker's dump: its counts stay, its gauge is dropped
+        (tmp_path / 'metrics.999999999.json').write_text(
+            '{"test_requests_total": [[["api"], 5]], "test_seconds": [[[], [[0, 1, 0], 0.5]]],'
+            ' "test_open": [[[], 7]]}')
+
+        rendered = metrics.render()
+    finally:
+        for metric in (counter, histogram, gauge):
+            metrics._registry.remove(metric)
+
+    assert 'test_requests_total{source="api"} 7' in rendered
+    assert 'test_seconds_bucket{le="1.0"} 2' in rendered
+    assert 'test_seconds_count 2' in rendered
+    assert f'test_open{{worker="{os.getpid()}"}} 3' in rendered
+    assert 'test_open{worker="999999999"}' not in rendered
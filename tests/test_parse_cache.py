@@ -0,0 +1,47 @@
+import parse_cache
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(parse_cache.time, 'time', lambda: now[0])
+    cache = parse_cache.ParseCache(ttl=60)
+    cache.set('v1|how many pods', {'resource': 'pods'})
+
+    now[0] += 59
+    assert cache.get('v1|how many pods') == {'resource': 'pods'}
+    now[0] += 2
+    assert cache.get('v1|how many pods') is None
+    assert cache.stats()['size'] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = parse_cache.ParseCache(max_size=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    # Reading "a" makes "b" the least recently used
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+
+
+def test_hits_return_copies():
+    cache = parse_cache.ParseCache()
+    cache.set('k', {'filters': {}})
+    cache.get('k')['filters']['where'] = 'restarts>3'
+    assert cache.get('k') == {'filters': {}}
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    path = str(tmp_path / 'parse_cache.sqlite')
+    parse_cache.ParseCache(path=path).set('k', {'resource': 'pods'})
+    restarted = parse_cache.ParseCache(path=path)
+
+    assert restarted.get('k') == {'resource': 'pods'}
+    assert restarted.stats()['disk_hits'] == 1
+
+
+def test_trivially_different_queries_share_a_key():
+    assert parse_cache.make_cache_key("How many pods in 'default'?", 'v1') == \
+        parse_cache.make_cache_key("how many  pods in default", 'v1')
+    assert parse_cache.make_cache_key("pods", 'v1') != parse_cache.make_cache_key("pods", 'v2')
@@ -0,0 +1,82 @@
+import pytest
+import query_engine
+import snapshot
+
+
+def make_pod(name, namespace='default', node='node-1', phase='Running', restarts=0, ready=True, version='1'):
+    return snapshot.PodRecord({
+        'metadata': {'name': name, 'namespace': namespace, 'resourceVersion': version},
+        'spec': {'nodeName': node, 'containers': [{'name': 'app', 'image': 'app:1'}]},
+        'status': {'phase': phase,
+                   'containerStatuses': [{'name': 'app', 'restartCount': restarts, 'ready': ready}]}
+    })
+
+
+PODS = [
+    make_pod('web-1', restarts=5),
+    make_pod('web-2', node='node-2', restarts=1),
+    make_pod('db-1', namespace='data', node='node-2', phase='Pending', restarts=9, ready=False),
+    make_pod('Web-3', node=None, phase='Failed', restarts=3, ready=False),
+]
+
+
+def query(where='', index=None, **kwargs):
+    index = index or query_engine.from_items('pods', PODS)
+    return index.query(query_engine.parse_where(where) if where else [], **kwargs)
+
+
+def test_filters():
+    assert query('restarts>2')[1] == 3
+    assert query('restarts>2, ready=false')[1] == 2
+    assert query('phase=running')[1] == 2
+    assert query('phase!=Running', namespace='default')[1] == 1
+    assert query('node=<none>')[1] == 1
+    assert query('restarts>=containers and ready=true')[1] == 2
+
+
+@pytest.mark.parametrize('where', ['bogus=1', 'restarts>many', 'phase<Running', 'ready=maybe', 'name>x'])
+def test_unsupported_filters_raise(where):
+    with pytest.raises(ValueError):
+        query(where)
+
+
+def test_group_by():
+    rows, total = query(group_by='phase')
+    assert rows == [('Running', 2), ('Failed', 1), ('Pending', 1)]
+    assert total == 4
+    rows, total = query(group_by='node', metric='sum', column='restarts')
+    assert rows == [('node-2', 10), ('node-1', 5), ('<none>', 3)]
+    assert total == 18
+    assert query(group_by='ready')[0] == [('NotReady', 2), ('Ready', 2)]
+
+
+def test_top_k():
+    rows, total = query(metric='list', column='restarts', limit=2)
+    assert rows == [('data/db-1', 9), ('default/web-1', 5)]
+    assert total == 4
+    rows, _ = query(metric='list', column='restarts', limit=2, sort='asc', namespace='default')
+    assert rows == [('web-2', 1), ('Web-3', 3)]
+
+
+def test_freed_rows_are_reused():
+    index = query_engine.from_items('pods', PODS)
+    index.update(PODS[0], None)
+    assert query('restarts>2', index=index)[1] == 2
+    added = make_pod('web-4', restarts=7, version='2')
+    index.update(None, added)
+    # The deleted pod's row is reused rather than growing the columns
+    assert index._size == len(PODS)
+    assert query(metric='list', column='restarts', limit=1, index=index)[0] == [('data/db-1', 9)]
+    assert query('restarts=7', index=index, metric='list')[0] == [('default/web-4', None)]
+    for i in range(20):
+        index.update(None, make_pod(f'extra-{i}'))
+    assert len(index) == len(PODS) + 20
+    assert query('name=extra-19', index=index)[1] == 1
+
+
+@pytest.mark.parametrize('where', ['name=Web-3', 'name=web-3', 'phase=FAILED', 'restarts>2, ready=false',
+                                   'node=<none>', 'restarts>=containers'])
+def test_per_object_matching_agrees_with_the_index(where):
+    predicates = query_engine.parse_where(where)
+    expected = sum(query_engine.matches('pods', pod, predicates) for pod in PODS)
+    assert query(where)[1] == expected
@@ -0,0 +1,29 @@
+from types import SimpleNamespace
+import pytest
+import resource_registry
+
+
+class FakeCustomObjectsApi:
+    def get_api_resources(self, group, version):
+        return SimpleNamespace(resources=[SimpleNamespace(name='virtualservices', kind='VirtualService'),
+                                          SimpleNamespace(name='virtualservices/status', kind='VirtualService')])
+
+
+def test_parse_custom_resources():
+    assert resource_registry.parse_custom_resources(
+        'certificates.cert-manager.io/v1, clusterissuers.cert-manager.io/v1:cluster=ClusterIssuer') == [
+        ('certificates', 'cert-manager.io', 'v1', True, None),
+        ('clusterissuers', 'cert-manager.io', 'v1', False, 'ClusterIssuer'),
+    ]
+    with pytest.raises(ValueError):
+        resource_registry.parse_custom_resources('certificates/v1')
+
+
+def test_custom_resource_kind_comes_from_spec_or_discovery():
+    api = FakeCustomObjectsApi()
+    entry = resource_registry.custom_resource_type(api, 'virtualservices', 'networking.istio.io', 'v1beta1')
+    assert entry.kind == 'VirtualService'
+    entry = resource_registry.custom_resource_type(api, 'policies', 'example.io', 'v1', kind='Policy')
+    assert entry.kind == 'Policy'
+    with pytest.raises(ValueError):
+        resource_registry.custom_resource_type(api, 'gateways', 'networking.istio.io', 'v1beta1')
@@ -0,0 +1,96 @@
+import pytest
+import result_cache
+
+ACTION = {'action_type': 'get', 'resource': 'pods', 'target_name': 'web-1', 'namespace': 'default', 'field': 'status'}
+VALIDATOR = ('pods', 'default', 'web-1', '42')
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, 'time', lambda: now[0])
+    return now
+
+
+def make_execute(answers, validator=VALIDATOR, cacheable=True):
+    calls = []
+
+    def execute():
+        calls.append(1)
+        return answers[len(calls) - 1], validator, cacheable
+    return execute, calls
+
+
+def test_fresh_answer_is_served_without_executing(clock):
+    cache = result_cache.ResultCache(ttls={'pods': 2})
+    execute, calls = make_execute(['Running', 'Failed'])
+
+    assert cache.get_or_execute(ACTION, execute) == 'Running'
+    clock[0] += 1
+    assert cache.get_or_execute(ACTION, execute) == 'Running'
+    assert len(calls) == 1
+
+
+def test_expired_answer_is_renewed_while_the_object_is_unchanged(clock):
+    cache = result_cache.ResultCache(ttls={'pods': 2})
+    execute, calls = make_execute(['Running', 'Failed'])
+    current = {'version': '42'}
+
+    def revalidate(validator):
+        return validator[3] == current['version']
+
+    cache.get_or_execute(ACTION, execute, revalidate)
+    clock[0] += 3
+    assert cache.get_or_execute(ACTION, execute, revalidate) == 'Running'
+    assert (len(calls), cache.stats()['revalidated']) == (1, 1)
+
+    # Renewed for another TTL: served without revalidating
+    clock[0] += 1
+    assert cache.get_or_execute(ACTION, execute, lambda validator: pytest.fail('revalidated')) == 'Running'
+
+    current['version'] = '43'
+    clock[0] += 3
+    assert cache.get_or_execute(ACTION, execute, revalidate) == 'Failed'
+    assert len(calls) == 2
+
+
+def test_answers_without_a_validator_are_not_revalidated(clock):
+    cache = result_cache.ResultCache(ttls={'pods': 2})
+    execute, calls = make_execute(['3 pods', '4 pods'], validator=None)
+
+    cache.get_or_execute(ACTION, execute, lambda validator: True)
+    clock[0] += 3
+    assert cache.get_or_execute(ACTION, execute, lambda validator: True) == '4 pods'
+
+
+def test_max_age_and_no_cache(clock):
+    cache = result_cache.ResultCache(ttls={'pods': 30})
+    execute, calls = make_execute(['a', 'b', 'c'])
+
+    cache.get_or_execute(ACTION, execute)
+    clock[0] += 10
+    assert cache.get_or_execute(ACTION, execute, cache_control='max-age=5') == 'b'
+    assert cache.get_or_execute(ACTION, execute, cache_control='no-cache') == 'c'
+
+
+def test_uncacheable_answers_and_uncached_resources_always_execute():
+    cache = result_cache.ResultCache(ttls={'pods': 30})
+    execute, calls = make_execute(['API Error: Forbidden', 'Running'], cacheable=False)
+    cache.get_or_execute(ACTION, execute)
+    cache.get_or_execute(ACTION, execute)
+    assert len(calls) == 2
+
+    execute, calls = make_execute(['x', 'y'])
+    for action in (dict(ACTION, resource='secrets'), dict(ACTION, action_type='logs')):
+        cache.get_or_execute(action, execute)
+    assert len(calls) == 2
+
+
+def test_answers_are_shared_across_workers(tmp_path):
+    path = str(tmp_path / 'result_cache.sqlite')
+    execute, calls = make_execute(['Running'])
+    result_cache.ResultCache(ttls={'pods': 30}, path=path).get_or_execute(ACTION, execute)
+
+    other = result_cache.ResultCache(ttls={'pods': 30}, path=path)
+    assert other.get_or_execute(ACTION, execute) == 'Running'
+    assert (len(calls), other.stats()['shared_hits']) == (1, 1)
@@ -0,0 +1,58 @@
+import pytest
+from nlp_parser import PLURAL_RULES
+from rule_parser import RuleParser
+
+parser = RuleParser(PLURAL_RULES)
+
+
+@pytest.mark.parametrize('query', [
+    # An unrecognized word: "failing"
+    "How many pods are failing in prod?",
+    # An inline filter the rules do not read
+    "List pods in namespace bench where phase=pending",
+    # "node-001" names a node, not a pod
+    "list pods in namespace bench on node node-001",
+])
+def test_partly_understood_queries_fall_back(query):
+    assert parser.parse(query) is None
+
+
+def test_count_in_namespace():
+    parsed = parser.parse("How many pods are in namespace bench?")
+    assert parsed['action'] == 'list'
+    assert parsed['field'] == 'count'
+    assert parsed['namespace'] == 'bench'
+
+
+@pytest.mark.parametrize('query, expected', [
+    ("how many pods in default", ('list', 'count', None, 'default')),
+    ("status of deployment nginx in production", ('get', 'status', 'nginx', 'production')),
+    ("logs of pod web-1 in the staging namespace", ('logs', 'logs', 'web-1', 'staging')),
+])
+def test_bare_in_names_the_namespace(query, expected):
+    parsed = parser.parse(query)
+    assert (parsed['action'], parsed['field'], parsed['target_name'], parsed['namespace']) == expected
+
+
+def test_in_phase_is_not_a_namespace():
+    parsed = parser.parse("list pods in bench that are not in running")
+    assert parsed['namespace'] == 'bench'
+    assert parsed['filters'] == {'field_selector': 'status.phase!=Running'}
+
+
+def test_phase_filter():
+    parsed = parser.parse("list pods in namespace bench that are not running")
+    assert parsed['namespace'] == 'bench'
+    assert parsed['filters'] == {'field_selector': 'status.phase!=Running'}
+
+
+def test_named_object():
+    parsed = parser.parse("What is the status of the pod named 'example-pod'?")
+    assert (parsed['action'], parsed['target_name'], parsed['field']) == ('get', 'example-pod', 'status')
+
+
+def test_events_of_another_object():
+    parsed = parser.parse("warnings in the last 10 minutes for deployment web")
+    assert parsed['resource'] == 'events'
+    assert parsed['related_to'] == {'resource': 'deployments', 'name': 'web'}
+    assert parsed['filters'] == {'field_selector': 'type=Warning', 'since_seconds': 600}
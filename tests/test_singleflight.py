@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import time
+import pytest
+from singleflight import SingleFlight, AsyncSingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'answer'
+
+    leader = threading.Thread(target=lambda: results.append(flight.do('k', fn)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do('k', fn))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    # Let the followers reach the in-flight call before it finishes
+    time.sleep(0.05)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert results == ['answer'] * 4
+    assert calls == [1]
+
+
+def test_error_reaches_every_caller_and_is_not_kept():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise RuntimeError('API server unreachable')
+
+    def call():
+        try:
+            flight.do('k', failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call)]
+    threads[0].start()
+    started.wait(5)
+    threads += [threading.Thread(target=call) for _ in range(2)]
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert errors == ['API server unreachable'] * 3
+    # The failed call is forgotten: the next caller runs the function again
+    assert flight.do('k', lambda: 'recovered') == 'recovered'
+
+
+def test_async_callers_share_one_call_and_its_error():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'answer'
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError('bad query')
+
+    async def run():
+        results = await asyncio.gather(*(flight.do('k', fn) for _ in range(4)))
+        errors = await asyncio.gather(*(flight.do('e', failing) for _ in range(3)), return_exceptions=True)
+        return results, errors
+
+    results, errors = asyncio.run(run())
+    assert results == ['answer'] * 4
+    assert calls == [1]
+    assert [str(error) for error in errors] == ['bad query'] * 3
+    assert not flight._calls
+
+
+def test_cancelled_async_caller_does_not_cancel_the_shared_call():
+    flight = AsyncSingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.05)
+        return 'answer'
+
+    async def run():
+        first = asyncio.ensure_future(flight.do('k', fn))
+        second = asyncio.ensure_future(flight.do('k', fn))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == 'answer'
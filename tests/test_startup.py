@@ -0,0 +1,13 @@
+import k8s_executor
+import startup
+
+
+def test_unreachable_api_server_is_reported(monkeypatch):
+    def unreachable():
+        raise ConnectionError('no kubeconfig')
+
+    monkeypatch.setattr(k8s_executor, 'apis', unreachable)
+    monkeypatch.setattr(startup, '_kubernetes_error', None)
+
+    assert not startup.warm_up_kubernetes()
+    assert startup.startup_status()['kubernetes_error'] == 'no kubeconfig'
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+import pytest
+import informer
+import k8s_executor
+import subscriptions
+
+ACTION = {'resource': 'configmaps', 'action_type': 'list', 'namespace': 'default'}
+
+
+def make_configmap(name):
+    return SimpleNamespace(metadata=SimpleNamespace(name=name, namespace='default', labels=None, resource_version='2'))
+
+
+@pytest.fixture
+def store(monkeypatch):
+    entry = SimpleNamespace(list_all=lambda **kwargs: None, describe=lambda obj, field: None,
+                            kind='ConfigMap', namespaced=True, scope=lambda namespace: namespace)
+    monkeypatch.setattr(k8s_executor, 'apis', lambda: SimpleNamespace(resources={'configmaps': entry}))
+    store = informer.Store()
+    store.replace([make_configmap('a')], '1')
+    running = SimpleNamespace(store=store, wait_for_sync=lambda timeout=None: True)
+    monkeypatch.setattr(informer, '_informers', {'configmaps': running})
+    monkeypatch.setattr(subscriptions, '_open', 0)
+    monkeypatch.setattr(subscriptions, '_blocking', 0)
+    return store
+
+
+def in_thread(func, *args):
+    thread = threading.Thread(target=func, args=args)
+    thread.start()
+    thread.join()
+
+
+def test_events_reach_the_event_loop(store, monkeypatch):
+    monkeypatch.setattr(subscriptions, 'SUBSCRIPTION_HEARTBEAT_SECONDS', 0.05)
+
+    async def read():
+        subscription = subscriptions.subscribe(ACTION, asyncio.get_running_loop())
+        events = subscription.__aiter__()
+        received = [await events.__anext__()]
+        in_thread(store.upsert, make_configmap('b'))
+        received += [await events.__anext__(), await events.__anext__()]
+        await events.aclose()
+        return subscription, received
+
+    subscription, received = asyncio.run(read())
+
+    assert received == [('snapshot', {'count': 1, 'items': {'a': None}}),
+                        ('added', {'name': 'b', 'value': None, 'count': 2}),
+                        ('heartbeat', None)]
+    assert subscription.closed
+    assert subscription not in store._listeners
+    assert subscriptions._open == 0
+
+
+def test_slow_async_reader_gets_a_resync_snapshot(store, monkeypatch):
+    monkeypatch.setattr(subscriptions, 'SUBSCRIPTION_QUEUE_SIZE', 2)
+
+    async def read():
+        subscription = subscriptions.subscribe(ACTION, asyncio.get_running_loop())
+        for name in 'bcd':
+            in_thread(store.upsert, make_configmap(name))
+        events = subscription.__aiter__()
+        received = [await events.__anext__(), await events.__anext__()]
+        await events.aclose()
+        return received
+
+    assert asyncio.run(read()) == [
+        ('snapshot', {'resync': True, 'count': 3, 'items': {'a': None, 'b': None, 'c': None}}),
+        ('added', {'name': 'd', 'value': None, 'count': 4}),
+    ]
+
+
+def test_blocking_subscriptions_are_capped(store, monkeypatch):
+    monkeypatch.setattr(subscriptions, 'SUBSCRIPTION_MAX_BLOCKING', 1)
+    loop = asyncio.new_event_loop()
+    try:
+        blocking = subscriptions.subscribe(ACTION)
+        with pytest.raises(RuntimeError):
+            subscriptions.subscribe(ACTION)
+        # Subscriptions read on an event loop do not hold a thread
+        looped = subscriptions.subscribe(ACTION, loop)
+        blocking.close()
+        subscriptions.subscribe(ACTION).close()
+        looped.close()
+    finally:
+        loop.close()
+
+    assert (subscriptions._open, subscriptions._blocking) == (0, 0)